@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Admission Control for the CrewAI API
+Adaptive per-route-class concurrency limits with fast 429 load shedding
+"""
+
+import json
+import math
+import time
+from typing import Callable, Dict, Optional, Union
+
+from prometheus_client import REGISTRY, Counter, Gauge
+
+# Never limited: probes, scrapes, debug profiles and process status reads
+CRITICAL = "critical"
+
+
+def classify_route(method: str, path: str) -> str:
+    """Route class of a request for the CrewAI API"""
+    if path in ("/health", "/ready", "/metrics", "/debug/profile") or \
+            (method == "GET" and path.startswith("/processes/")):
+        return CRITICAL
+    if method == "POST" and path == "/process":
+        return "launch"
+    if method in ("GET", "HEAD"):
+        return "read"
+    return "write"
+
+
+class GradientLimit:
+    """
+    Concurrency limit adjusted from observed latency
+
+    Gradient-style: the limit shrinks in proportion to how far recent
+    latency rises above the baseline latency, and grows by about
+    sqrt(limit) per round trip while latency holds. Samples taken while less
+    than half the limit is in use do not raise it, so an idle service
+    does not accumulate an unbounded limit.
+    """
+
+    __slots__ = ("limit", "min_limit", "max_limit", "tolerance", "smoothing",
+                 "short_rtt", "long_rtt", "_short_alpha", "_long_alpha")
+
+    def __init__(self,
+                 initial: int = 20,
+                 min_limit: int = 1,
+                 max_limit: int = 200,
+                 tolerance: float = 1.5,
+                 smoothing: float = 0.2,
+                 short_window: int = 10,
+                 long_window: int = 500):
+        """
+        Initialize the limit
+
+        Args:
+            initial: Starting concurrency limit
+            min_limit: Lowest limit the gradient may reach
+            max_limit: Highest limit
+            tolerance: Latency increase over the baseline accepted before backing off
+            smoothing: Weight of each new limit estimate
+            short_window: Samples in the recent latency average
+            long_window: Samples in the baseline latency average
+        """
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.short_rtt = 0.0
+        self.long_rtt = 0.0
+        self._short_alpha = 2.0 / (short_window + 1)
+        self._long_alpha = 2.0 / (long_window + 1)
+
+    def update(self, rtt: float, inflight: int) -> float:
+        """Fold in one request latency observed with inflight requests running"""
+        if self.long_rtt == 0.0:
+            self.short_rtt = self.long_rtt = rtt
+            return self.limit
+        self.short_rtt += self._short_alpha * (rtt - self.short_rtt)
+        congested = inflight * 2 >= self.limit
+        # The baseline follows faster samples at once but slower ones only
+        # when uncongested, so sustained queueing cannot become the baseline
+        if rtt < self.long_rtt or not congested:
+            self.long_rtt += self._long_alpha * (rtt - self.long_rtt)
+
+        if not congested:
+            return self.limit
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        estimate = self.limit * gradient + math.sqrt(self.limit)
+        # About limit samples complete per round trip; together they make
+        # one smoothed step, so the limit moves at most once per round trip
+        weight = self.smoothing / self.limit
+        limit = (1 - weight) * self.limit + weight * estimate
+        self.limit = max(self.min_limit, min(self.max_limit, limit))
+        return self.limit
+
+    def on_drop(self):
+        """Multiplicative decrease after a timeout or server error"""
+        self.limit = max(self.min_limit, self.limit * 0.9)
+
+
+class Limiter:
+    """
+    Admission for one route class: a fixed or adaptive number of concurrent requests
+
+    ``gauge``, when set, is a Prometheus gauge child kept at the current
+    limit. It is set explicitly whenever the limit moves: function-backed
+    gauges are not supported by the multiprocess collector.
+    """
+
+    __slots__ = ("name", "adaptive", "fixed", "inflight", "rejected", "gauge", "_duration")
+
+    def __init__(self, name: str, limit: Union[int, GradientLimit]):
+        self.name = name
+        self.adaptive = limit if isinstance(limit, GradientLimit) else None
+        self.fixed = None if self.adaptive else int(limit)
+        self.inflight = 0
+        self.rejected = 0
+        self.gauge = None
+        self._duration = 0.0
+
+    @property
+    def limit(self) -> int:
+        if self.adaptive:
+            return int(self.adaptive.limit)
+        return self.fixed
+
+    def try_acquire(self) -> bool:
+        if self.inflight >= self.limit:
+            self.rejected += 1
+            return False
+        self.inflight += 1
+        return True
+
+    def release(self, duration: Optional[float] = None, dropped: bool = False):
+        """
+        Give the slot back
+
+        Args:
+            duration: How long the admitted work took; None if not measured
+            dropped: The work failed in a way that signals overload
+        """
+        self.inflight -= 1
+        before = self.limit
+        if duration is not None:
+            self._duration = duration if not self._duration else 0.9 * self._duration + 0.1 * duration
+            if self.adaptive:
+                self.adaptive.update(duration, self.inflight + 1)
+        if dropped and self.adaptive:
+            self.adaptive.on_drop()
+        if self.gauge is not None and self.limit != before:
+            self.gauge.set(self.limit)
+
+    def retry_after(self) -> int:
+        """Whole seconds until a slot is likely to be free, at least 1"""
+        return max(1, math.ceil(self._duration * max(1, self.inflight) / max(1, self.limit)))
+
+
+def default_limiters() -> Dict[str, Limiter]:
+    return {
+        "launch": Limiter("launch", GradientLimit(initial=8, max_limit=64)),
+        "write": Limiter("write", GradientLimit(initial=16, max_limit=128)),
+        "read": Limiter("read", GradientLimit(initial=32, max_limit=256)),
+    }
+
+
+class AdmissionControlMiddleware:
+    """
+    Pure ASGI middleware shedding load per route class
+
+    A request over its class limit gets an immediate 429 with Retry-After
+    and never reaches the application. Critical routes bypass admission
+    entirely, so probes keep answering while the service sheds. Latency
+    is measured to the last response body chunk, and 5xx responses count
+    as drops.
+    """
+
+    def __init__(self,
+                 app: Callable,
+                 limiters: Optional[Dict[str, Limiter]] = None,
+                 classify: Callable[[str, str], str] = classify_route,
+                 registry=REGISTRY,
+                 clock: Callable[[], float] = time.perf_counter):
+        """
+        Initialize the middleware
+
+        Args:
+            app: Wrapped ASGI application
+            limiters: Limiter per route class; classes without one are admitted
+            classify: Maps (method, path) to a route class
+            registry: Prometheus registry for the admission metrics
+            clock: Time source for latency samples
+        """
+        self.app = app
+        self.limiters = default_limiters() if limiters is None else limiters
+        self.classify = classify
+        self.clock = clock
+
+        self.rejected = Counter("crewai_admission_rejected_total", "Requests shed by admission control",
+                                ["route_class"], registry=registry)
+        self.limit_gauge = Gauge("crewai_admission_limit", "Concurrency limit per route class",
+                                 ["route_class"], registry=registry, multiprocess_mode="livesum")
+        for name, limiter in self.limiters.items():
+            limiter.gauge = self.limit_gauge.labels(name)
+            limiter.gauge.set(limiter.limit)
+
+    async def _reject(self, limiter: Limiter, send):
+        self.rejected.labels(limiter.name).inc()
+        body = json.dumps({"detail": f"Too many {limiter.name} requests, retry later"}).encode()
+        await send({"type": "http.response.start", "status": 429,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(body)).encode()),
+                                (b"retry-after", str(limiter.retry_after()).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiters.get(self.classify(scope["method"], scope["path"]))
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        if not limiter.try_acquire():
+            await self._reject(limiter, send)
+            return
+
+        start = self.clock()
+        state = {"status": 500, "released": False}
+
+        def release():
+            state["released"] = True
+            limiter.release(self.clock() - start, dropped=state["status"] >= 500)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            await send(message)
+            if (message["type"] == "http.response.body" and not message.get("more_body", False)
+                    and not state["released"]):
+                release()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not state["released"]:
+                release()
+
+
+# Benchmark
+def main():
+    """Simulated overload: a backend that slows with concurrency, with and without admission"""
+    import asyncio
+    from prometheus_client import CollectorRegistry
+
+    capacity = 16
+    service_time = 0.01
+
+    class Backend:
+        def __init__(self):
+            self.active = 0
+
+        async def __call__(self, scope, receive, send):
+            self.active += 1
+            try:
+                if scope["path"] != "/health":
+                    # Latency grows once concurrency exceeds what the backend can serve
+                    await asyncio.sleep(service_time * max(1.0, self.active / capacity))
+            finally:
+                self.active -= 1
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"{}"})
+
+    async def run(handler, clients, requests_per_client):
+        statuses, latencies, health = {}, [], []
+
+        async def client(i):
+            path = "/health" if i % 10 == 0 else "/agents"
+
+            for _ in range(requests_per_client):
+                status = {}
+
+                async def send(message):
+                    if message["type"] == "http.response.start":
+                        status["code"] = message["status"]
+
+                start = time.perf_counter()
+                await handler({"type": "http", "method": "GET", "path": path}, None, send)
+                elapsed = time.perf_counter() - start
+                statuses[status["code"]] = statuses.get(status["code"], 0) + 1
+                if path == "/health":
+                    health.append(status["code"])
+                elif status["code"] == 200:
+                    latencies.append(elapsed)
+                if status["code"] == 429:
+                    await asyncio.sleep(0.005)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(clients)))
+        throughput = statuses.get(200, 0) / (time.perf_counter() - start)
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+        return statuses, p99, all(code == 200 for code in health), throughput
+
+    bare = asyncio.run(run(Backend(), 400, 20))
+    limited = AdmissionControlMiddleware(Backend(), registry=CollectorRegistry())
+    shed = asyncio.run(run(limited, 400, 20))
+    for label, (statuses, p99, health_ok, throughput) in (("no admission", bare), ("admission", shed)):
+        print(f"{label:>12}: statuses {statuses}, {throughput:.0f} ok/s, "
+              f"p99 of admitted reads {p99 * 1e3:.1f} ms, health never shed: {health_ok}")
+    print(f"read limit settled at {limited.limiters['read'].limit}")
+
+
+if __name__ == "__main__":
+    main()
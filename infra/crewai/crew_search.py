@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Crew Search Queries
+Index-backed lookups of crews by agent tool, agent role and task text
+"""
+
+import os
+import time
+from typing import List, Optional, Tuple
+
+from psycopg2.extras import Json
+
+# Same expression as idx_crews_task_text, otherwise the planner cannot use the index
+TASK_TEXT = "to_tsvector('english', jsonb_path_query_array(tasks, '$[*].description'))"
+
+CREW_COLUMNS = "id, name, description, agents, tasks, status, result, created_at, updated_at"
+
+
+def crew_search_query(tool: Optional[str] = None,
+                      role: Optional[str] = None,
+                      task: Optional[str] = None,
+                      limit: int = 100,
+                      table: str = "crews") -> Tuple[str, List]:
+    """
+    SQL and parameters for crews matching every given criterion
+
+    Tool and role are JSONB containment tests served by idx_crews_agents;
+    they may be satisfied by different agents of the crew. Task text is a
+    full-text match on task descriptions served by idx_crews_task_text.
+    """
+    conditions = []
+    params: List = []
+    if tool:
+        conditions.append("agents @> %s")
+        params.append(Json([{"tools": [tool]}]))
+    if role:
+        conditions.append("agents @> %s")
+        params.append(Json([{"role": role}]))
+    if task:
+        conditions.append(f"{TASK_TEXT} @@ plainto_tsquery('english', %s)")
+        params.append(task)
+    if not conditions:
+        raise ValueError("At least one of tool, role or task is required")
+
+    params.append(limit)
+    sql = (f"SELECT {CREW_COLUMNS} FROM {table} WHERE {' AND '.join(conditions)} "
+           f"ORDER BY created_at DESC LIMIT %s")
+    return sql, params
+
+
+# Benchmark
+# Literal modulo is written %% because the statement takes a parameter
+SEED_SQL = """
+INSERT INTO {table} (name, description, agents, tasks, created_at)
+SELECT 'crew-' || i,
+       'benchmark crew ' || i,
+       jsonb_build_array(
+           jsonb_build_object('name', 'lead', 'role', 'role-' || (i %% 50),
+                              'tools', jsonb_build_array('tool-' || (i %% 200), 'tool-' || ((i * 7) %% 200))),
+           jsonb_build_object('name', 'worker', 'role', 'role-' || ((i * 3) %% 50),
+                              'tools', jsonb_build_array('tool-' || ((i * 13) %% 200)))),
+       jsonb_build_array(
+           jsonb_build_object('description', 'review ' || (ARRAY['billing', 'imaging', 'triage', 'pharmacy'])[i %% 4 + 1]
+                                             || ' pipeline batch ' || i),
+           jsonb_build_object('description', 'write report ' || i)),
+       now() - make_interval(secs => i)
+FROM generate_series(1, %s) AS i
+"""
+
+
+def _time_query(cursor, sql, params, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    """Query latency at 10^5 crews, with the indexes and with sequential scans"""
+    import psycopg2
+
+    crews = int(os.getenv("BENCH_CREWS", "100000"))
+    conn = psycopg2.connect(
+        host=os.getenv("DATABASE_HOST", "crewai-postgresql"),
+        database=os.getenv("DATABASE_NAME", "crewai"),
+        user=os.getenv("DATABASE_USER", "crewai"),
+        password=os.getenv("DATABASE_PASSWORD", "crewai_password"),
+    )
+    cursor = conn.cursor()
+    # Copies the columns, constraints and GIN indexes of the migrated table
+    cursor.execute("CREATE TEMP TABLE bench_crews (LIKE crews INCLUDING ALL)")
+    cursor.execute(SEED_SQL.format(table="bench_crews"), (crews,))
+    cursor.execute("ANALYZE bench_crews")
+
+    cases = [
+        ("tool", {"tool": "tool-17"}),
+        ("role", {"role": "role-3"}),
+        ("tool+role", {"tool": "tool-17", "role": "role-17"}),
+        ("task text", {"task": "imaging pipeline"}),
+    ]
+    print(f"{crews} crews, latency p50/p99 in ms")
+    for label, criteria in cases:
+        sql, params = crew_search_query(table="bench_crews", **criteria)
+        indexed = _time_query(cursor, sql, params, 50)
+        cursor.execute("SET enable_bitmapscan = off")
+        cursor.execute("SET enable_indexscan = off")
+        scanned = _time_query(cursor, sql, params, 10)
+        cursor.execute("RESET enable_bitmapscan")
+        cursor.execute("RESET enable_indexscan")
+        print(f"{label:>10}: indexed {indexed[0] * 1e3:7.2f}/{indexed[1] * 1e3:7.2f}  "
+              f"seq scan {scanned[0] * 1e3:7.2f}/{scanned[1] * 1e3:7.2f}")
+
+    conn.rollback()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+HTTP Instrumentation for the CrewAI API
+ASGI middleware recording per-route latency, in-flight requests, payload sizes and DB time
+"""
+
+import contextvars
+import glob
+import os
+import re
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Gauge, Histogram,
+                               ProcessCollector, generate_latest, multiprocess)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def multiprocess_enabled() -> bool:
+    """Whether metrics are shared between worker processes through PROMETHEUS_MULTIPROC_DIR"""
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+_METRIC_FILE_PID = re.compile(r"_(\d+)\.db$")
+
+
+class WorkerProcessCollector:
+    """
+    process_* metrics summed over the server's worker processes
+
+    Multiprocess mode has no process metrics of its own. Workers are found
+    through their metric files in the multiprocess directory, plus the
+    supervisor that spawned them; pids without a /proc entry have exited
+    and are skipped. Memory, CPU and descriptors are summed, the start
+    time is the earliest and max_fds the lowest limit.
+    """
+
+    def __init__(self, path: Optional[str] = None, proc: str = "/proc"):
+        self.path = path or os.environ.get("PROMETHEUS_MULTIPROC_DIR", "")
+        self.proc = proc
+
+    def pids(self) -> List[int]:
+        pids = {os.getpid(), os.getppid()}
+        for name in glob.glob(os.path.join(self.path, "*.db")):
+            match = _METRIC_FILE_PID.search(name)
+            if match:
+                pids.add(int(match.group(1)))
+        return sorted(pid for pid in pids if os.path.isdir(os.path.join(self.proc, str(pid))))
+
+    def collect(self):
+        totals: Dict[str, float] = {}
+        docs: Dict[str, str] = {}
+        for pid in self.pids():
+            for family in ProcessCollector(pid=lambda: pid, proc=self.proc, registry=None).collect():
+                value = family.samples[0].value
+                docs[family.name] = family.documentation
+                if family.name not in totals:
+                    totals[family.name] = value
+                elif family.name in ("process_start_time_seconds", "process_max_fds"):
+                    totals[family.name] = min(totals[family.name], value)
+                else:
+                    totals[family.name] += value
+        for name, value in totals.items():
+            if name == "process_cpu_seconds":
+                yield CounterMetricFamily(name, docs[name], value=value)
+            else:
+                yield GaugeMetricFamily(name, docs[name], value=value)
+
+
+def render_metrics(registry=REGISTRY) -> Tuple[bytes, str]:
+    """
+    Exposition payload and content type for a scrape
+
+    With several workers the payload aggregates the metric files of all of
+    them, so any worker answering /metrics reports the whole server,
+    including the process metrics of every worker.
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(WorkerProcessCollector())
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid: Optional[int] = None):
+    """Drop the live gauges of an exiting worker from the aggregate"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+class _DbClock:
+    __slots__ = ("seconds",)
+
+    def __init__(self):
+        self.seconds = 0.0
+
+
+# DB time of the request being served; threadpool endpoints inherit the
+# context, and share the same accumulator object
+_db_clock: contextvars.ContextVar = contextvars.ContextVar("crewai_db_clock", default=None)
+
+
+@contextmanager
+def track_db():
+    """Count the enclosed block as database time of the current request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        clock = _db_clock.get()
+        if clock is not None:
+            clock.seconds += time.perf_counter() - start
+
+
+def timed_cursor(base: type) -> type:
+    """psycopg2 cursor class whose execute/executemany count as DB time"""
+
+    class TimedCursor(base):
+        def execute(self, query, vars=None):
+            with track_db():
+                return super().execute(query, vars)
+
+        def executemany(self, query, vars_list):
+            with track_db():
+                return super().executemany(query, vars_list)
+
+    TimedCursor.__name__ = f"Timed{base.__name__}"
+    return TimedCursor
+
+
+def starlette_route_resolver(scope: Dict[str, Any]) -> str:
+    """
+    Route template (e.g. "/processes/{process_id}") for a request
+
+    Matches against the routes of the Starlette/FastAPI app in the scope. A
+    path that matches but with another method keeps its template; anything
+    else is UNMATCHED_ROUTE, so label cardinality stays bounded by the
+    number of routes.
+    """
+    from starlette.routing import Match
+
+    app = scope.get("app")
+    partial = None
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+        if match == Match.PARTIAL and partial is None:
+            partial = getattr(route, "path", UNMATCHED_ROUTE)
+    return partial or UNMATCHED_ROUTE
+
+
+class _RequestState:
+    __slots__ = ("start", "status", "request_bytes", "response_bytes", "db", "finished")
+
+    def __init__(self, start: float, db: _DbClock):
+        self.start = start
+        self.status = 500
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.db = db
+        self.finished = False
+
+
+class HTTPMetricsMiddleware:
+    """
+    Pure ASGI middleware for per-route HTTP metrics
+
+    Labels use the route template rather than the raw path. Latency and
+    DB time stop at the last response body chunk, so background tasks that
+    run after the response are not charged to the request. Metric children
+    are cached per label set and route templates per (method, path), so
+    the per-request cost is a few dict lookups and observations.
+    """
+
+    def __init__(self,
+                 app: Callable,
+                 registry=REGISTRY,
+                 request_counter: Optional[Any] = None,
+                 route_resolver: Callable[[Dict[str, Any]], str] = starlette_route_resolver,
+                 max_cached_paths: int = 4096):
+        """
+        Initialize the middleware
+
+        Args:
+            app: Wrapped ASGI application
+            registry: Prometheus registry for the new metrics
+            request_counter: Existing Counter with (method, endpoint) labels to
+                increment for every request
+            route_resolver: Maps an ASGI scope to a route template
+            max_cached_paths: Raw paths remembered by the template cache
+        """
+        self.app = app
+        self.request_counter = request_counter
+        self.route_resolver = route_resolver
+        self.max_cached_paths = max_cached_paths
+
+        self.latency = Histogram("crewai_http_request_duration_seconds", "HTTP request latency",
+                                 ["method", "route", "status"], buckets=LATENCY_BUCKETS, registry=registry)
+        self.db_latency = Histogram("crewai_http_db_duration_seconds", "Database time per HTTP request",
+                                    ["method", "route"], buckets=LATENCY_BUCKETS, registry=registry)
+        self.in_flight = Gauge("crewai_http_requests_in_flight", "HTTP requests being served",
+                               ["method", "route"], registry=registry, multiprocess_mode="livesum")
+        self.request_size = Histogram("crewai_http_request_size_bytes", "HTTP request body size",
+                                      ["method", "route"], buckets=SIZE_BUCKETS, registry=registry)
+        self.response_size = Histogram("crewai_http_response_size_bytes", "HTTP response body size",
+                                       ["method", "route", "status"], buckets=SIZE_BUCKETS, registry=registry)
+
+        self._routes: Dict[Tuple[str, str], str] = {}
+        self._route_children: Dict[Tuple[str, str], tuple] = {}
+        self._status_children: Dict[Tuple[str, str, int], tuple] = {}
+
+    def _route(self, scope: Dict[str, Any]) -> str:
+        key = (scope["method"], scope["path"])
+        route = self._routes.get(key)
+        if route is None:
+            route = self.route_resolver(scope)
+            if len(self._routes) >= self.max_cached_paths:
+                self._routes.clear()
+            self._routes[key] = route
+        return route
+
+    def _children_for(self, method: str, route: str) -> tuple:
+        key = (method, route)
+        children = self._route_children.get(key)
+        if children is None:
+            children = self._route_children[key] = (
+                self.in_flight.labels(method, route),
+                self.request_size.labels(method, route),
+                self.db_latency.labels(method, route),
+                self.request_counter.labels(method=method, endpoint=route) if self.request_counter else None,
+            )
+        return children
+
+    def _status_children_for(self, method: str, route: str, status: int) -> tuple:
+        key = (method, route, status)
+        children = self._status_children.get(key)
+        if children is None:
+            children = self._status_children[key] = (
+                self.latency.labels(method, route, str(status)),
+                self.response_size.labels(method, route, str(status)),
+            )
+        return children
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route(scope)
+        in_flight, request_size, db_latency, counter = self._children_for(method, route)
+        db = _DbClock()
+        token = _db_clock.set(db)
+        state = _RequestState(time.perf_counter(), db)
+        in_flight.inc()
+        if counter is not None:
+            counter.inc()
+
+        def finish():
+            state.finished = True
+            duration = time.perf_counter() - state.start
+            latency, response_size = self._status_children_for(method, route, state.status)
+            latency.observe(duration)
+            response_size.observe(state.response_bytes)
+            request_size.observe(state.request_bytes)
+            db_latency.observe(state.db.seconds)
+            in_flight.dec()
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                state.request_bytes += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            message_type = message["type"]
+            if message_type == "http.response.start":
+                state.status = message["status"]
+                await send(message)
+            elif message_type == "http.response.body":
+                state.response_bytes += len(message.get("body", b""))
+                await send(message)
+                if not message.get("more_body", False) and not state.finished:
+                    finish()
+            else:
+                await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            if not state.finished:
+                finish()
+            _db_clock.reset(token)
+
+
+# Benchmark
+def main():
+    """Measure middleware overhead per request against a bare ASGI app"""
+    import asyncio
+    import re
+    from prometheus_client import CollectorRegistry, Counter
+
+    routes = [("/health", re.compile(r"^/health$")), ("/agents", re.compile(r"^/agents$")),
+              ("/processes/{process_id}", re.compile(r"^/processes/[^/]+$"))]
+
+    def resolver(scope):
+        for template, pattern in routes:
+            if pattern.match(scope["path"]):
+                return template
+        return UNMATCHED_ROUTE
+
+    async def app(scope, receive, send):
+        await receive()
+        with track_db():
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b'{"status": "healthy"}'})
+
+    registry = CollectorRegistry()
+    counter = Counter("crewai_requests_total", "Total requests", ["method", "endpoint"], registry=registry)
+    instrumented = HTTPMetricsMiddleware(app, registry=registry, request_counter=counter, route_resolver=resolver)
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    async def bench(handler, n):
+        paths = ["/health", "/agents"] + [f"/processes/{i}" for i in range(100)]
+        scopes = [{"type": "http", "method": "GET", "path": p, "headers": []} for p in paths]
+        start = time.perf_counter()
+        for i in range(n):
+            await handler(scopes[i % len(scopes)], receive, send)
+        return (time.perf_counter() - start) / n
+
+    n = 100_000
+    bare = asyncio.run(bench(app, n))
+    measured = asyncio.run(bench(instrumented, n))
+    print(f"bare app: {bare * 1e6:.2f} µs/request, instrumented: {measured * 1e6:.2f} µs/request, "
+          f"overhead {(measured - bare) * 1e6:.2f} µs/request")
+
+
+if __name__ == "__main__":
+    main()
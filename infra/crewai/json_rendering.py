@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Database-side JSON Rendering
+List endpoints rendered to JSON by Postgres and returned as raw bytes
+"""
+
+import os
+import time
+from typing import Optional, Sequence
+
+import psycopg2.extensions
+from fastapi import Response
+
+from instrumentation import track_db
+from tracing import db_span
+
+
+class RawJSONResponse(Response):
+    """Response for a body that already is encoded JSON; no validation or re-encoding"""
+
+    media_type = "application/json"
+
+
+def json_array_query(table: str, order_by: str) -> str:
+    """
+    Query returning every row of a table as one JSON array text
+
+    Rows are rendered with row_to_json semantics, so timestamps come out in
+    ISO 8601 like FastAPI's encoder and JSONB columns are embedded as-is.
+    """
+    return f"SELECT COALESCE(json_agg(t ORDER BY t.{order_by}), '[]')::text FROM {table} t"
+
+
+def fetch_json_array(conn, query: str, params: Optional[Sequence] = None) -> bytes:
+    """Run a json_array_query and return the body bytes"""
+    # A plain cursor: the single text column needs no per-row dict
+    with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+        with track_db(), db_span("SELECT", query):
+            cursor.execute(query, params)
+        return cursor.fetchone()[0].encode("utf-8")
+
+
+# Benchmark
+SEED_SQL = """
+INSERT INTO bench_agents (name, role, goal, backstory, tools)
+SELECT 'agent-' || i, 'role-' || (i %% 20), 'goal of agent ' || i, repeat('backstory ', 20),
+       jsonb_build_array('web_search', 'tool-' || (i %% 50))
+FROM generate_series(1, %s) AS i
+"""
+
+
+def main():
+    """Client CPU per list request: per-row dicts and FastAPI encoding vs Postgres-rendered JSON"""
+    import json
+
+    import psycopg2
+    from fastapi.encoders import jsonable_encoder
+    from psycopg2.extras import RealDictCursor
+
+    conn = psycopg2.connect(
+        host=os.getenv("DATABASE_HOST", "crewai-postgresql"),
+        database=os.getenv("DATABASE_NAME", "crewai"),
+        user=os.getenv("DATABASE_USER", "crewai"),
+        password=os.getenv("DATABASE_PASSWORD", "crewai_password"),
+        cursor_factory=RealDictCursor,
+    )
+    cursor = conn.cursor()
+    cursor.execute("CREATE TEMP TABLE bench_agents (LIKE agents INCLUDING ALL)")
+
+    def row_path():
+        cursor.execute("SELECT * FROM bench_agents ORDER BY created_at DESC")
+        rows = [dict(row) for row in cursor.fetchall()]
+        return json.dumps(jsonable_encoder(rows)).encode("utf-8")
+
+    query = json_array_query("bench_agents", "created_at DESC")
+
+    def json_path():
+        return fetch_json_array(conn, query)
+
+    seeded = 0
+    for rows in (1_000, 10_000):
+        cursor.execute(SEED_SQL, (rows - seeded,))
+        seeded = rows
+        repeat = 20
+        results = {}
+        for label, render in (("rows + FastAPI encoding", row_path), ("json_agg raw bytes", json_path)):
+            render()
+            cpu, wall = time.process_time(), time.perf_counter()
+            for _ in range(repeat):
+                body = render()
+            results[label] = ((time.process_time() - cpu) / repeat, (time.perf_counter() - wall) / repeat, len(body))
+        for label, (cpu, wall, size) in results.items():
+            print(f"{rows:>6} rows, {label:>24}: {cpu * 1e3:8.2f} ms CPU, {wall * 1e3:8.2f} ms wall, {size} bytes")
+
+    conn.rollback()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
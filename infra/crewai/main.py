@@ -4,24 +4,37 @@ CrewAI FastAPI Application
 Multi-agent orchestration platform for MedinovAI
 """
 
+import asyncio
 import os
 import yaml
 import logging
-from typing import Dict, List, Optional
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from typing import Dict, List, Literal, Optional
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import psycopg2
-from psycopg2.extras import RealDictCursor
-import prometheus_client
+from psycopg2.extras import Json, RealDictCursor
 from prometheus_client import Counter, Histogram, Gauge
+from opentelemetry import trace
+from opentelemetry.trace import Status, StatusCode
 import time
+from datetime import datetime
+
+from admission import AdmissionControlMiddleware, Limiter
+from crew_search import crew_search_query
+from process_partitions import process_lookup, run_maintenance
+from json_rendering import RawJSONResponse, fetch_json_array, json_array_query
+from profiling import MAX_SECONDS, ProfilerBusy, profile, token_matches
+from instrumentation import HTTPMetricsMiddleware, mark_worker_dead, render_metrics, timed_cursor, track_db
+from tracing import TracingMiddleware, configure_tracing, db_span, traced_cursor
 
 # Prometheus metrics
 REQUEST_COUNT = Counter('crewai_requests_total', 'Total requests', ['method', 'endpoint'])
 REQUEST_LATENCY = Histogram('crewai_request_duration_seconds', 'Request latency')
-ACTIVE_AGENTS = Gauge('crewai_active_agents', 'Number of active agents')
-ACTIVE_CREWS = Gauge('crewai_active_crews', 'Number of active crews')
+# Derived from the database, so every worker reports the same value
+ACTIVE_AGENTS = Gauge('crewai_active_agents', 'Number of active agents', multiprocess_mode='mostrecent')
+ACTIVE_CREWS = Gauge('crewai_active_crews', 'Number of active crews', multiprocess_mode='mostrecent')
+STATE_GAUGE_REFRESH_SECONDS = float(os.getenv("STATE_GAUGE_REFRESH_SECONDS", "15"))
 
 # Configure logging
 logging.basicConfig(
@@ -29,6 +42,7 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+tracer = trace.get_tracer(__name__)
 
 app = FastAPI(
     title="CrewAI API",
@@ -45,6 +59,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Server span per admitted request, continuing the caller's trace; DB
+# queries and crew runs become its children
+app.add_middleware(TracingMiddleware)
+
+# Sheds requests over the adaptive per-route-class limits with 429; health,
+# readiness, metrics and process status are never shed
+app.add_middleware(AdmissionControlMiddleware)
+
+# Per-route latency, sizes, in-flight and DB time; also counts REQUEST_COUNT
+app.add_middleware(HTTPMetricsMiddleware, request_counter=REQUEST_COUNT)
+
 # Pydantic models
 class Agent(BaseModel):
     name: str
@@ -73,17 +98,24 @@ class ProcessRequest(BaseModel):
     memory: bool = True
     cache: bool = True
 
+# List queries rendered to JSON by Postgres
+LIST_AGENTS_QUERY = json_array_query("agents", "created_at DESC")
+LIST_CREWS_QUERY = json_array_query("crews", "created_at DESC")
+
 # Database connection
+InstrumentedRealDictCursor = traced_cursor(timed_cursor(RealDictCursor))
+
 def get_db_connection():
     """Get database connection"""
     try:
-        conn = psycopg2.connect(
-            host=os.getenv("DATABASE_HOST", "crewai-postgresql"),
-            database=os.getenv("DATABASE_NAME", "crewai"),
-            user=os.getenv("DATABASE_USER", "crewai"),
-            password=os.getenv("DATABASE_PASSWORD", "crewai_password"),
-            cursor_factory=RealDictCursor
-        )
+        with track_db(), db_span("connect"):
+            conn = psycopg2.connect(
+                host=os.getenv("DATABASE_HOST", "crewai-postgresql"),
+                database=os.getenv("DATABASE_NAME", "crewai"),
+                user=os.getenv("DATABASE_USER", "crewai"),
+                password=os.getenv("DATABASE_PASSWORD", "crewai_password"),
+                cursor_factory=InstrumentedRealDictCursor
+            )
         return conn
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
@@ -106,18 +138,110 @@ async def readiness_check():
         logger.error(f"Readiness check failed: {e}")
         raise HTTPException(status_code=503, detail="Service not ready")
 
+# Database-derived gauges
+def refresh_state_gauges():
+    """Set the agent and crew gauges from the row counts in the database"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT (SELECT count(*) FROM agents) AS agents, (SELECT count(*) FROM crews) AS crews")
+        counts = cursor.fetchone()
+        cursor.close()
+    finally:
+        conn.close()
+
+    ACTIVE_AGENTS.set(counts['agents'])
+    ACTIVE_CREWS.set(counts['crews'])
+
+async def refresh_state_gauges_periodically():
+    """Keep the state gauges current; they survive restarts and agree across workers"""
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            await loop.run_in_executor(None, refresh_state_gauges)
+        except Exception as e:
+            logger.warning(f"Failed to refresh state gauges: {e}")
+        await asyncio.sleep(STATE_GAUGE_REFRESH_SECONDS)
+
+# Process partition maintenance
+PROCESS_RETENTION_DAYS = int(os.getenv("PROCESS_RETENTION_DAYS", "30"))
+PROCESS_ARCHIVE_DIR = os.getenv("PROCESS_ARCHIVE_DIR", "/app/archive/processes")
+PARTITION_MAINTENANCE_SECONDS = float(os.getenv("PARTITION_MAINTENANCE_SECONDS", "3600"))
+
+def maintain_process_partitions():
+    """Create upcoming processes partitions and archive expired ones"""
+    conn = get_db_connection()
+    try:
+        result = run_maintenance(conn, retention_days=PROCESS_RETENTION_DAYS, archive_dir=PROCESS_ARCHIVE_DIR)
+    finally:
+        conn.close()
+    if result.get("created") or result.get("archived"):
+        logger.info(f"Process partition maintenance: {result}")
+
+async def maintain_process_partitions_periodically():
+    """Partition maintenance loop; the first pass runs before startup completes"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(PARTITION_MAINTENANCE_SECONDS)
+        try:
+            await loop.run_in_executor(None, maintain_process_partitions)
+        except Exception as e:
+            logger.warning(f"Process partition maintenance failed: {e}")
+
+@app.on_event("startup")
+async def start_background_jobs():
+    # Per worker: each has its own span batching thread and exporters
+    app.state.tracer_provider = configure_tracing("crewai")
+    # Inserts fail without a partition for today, so create it before serving
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, maintain_process_partitions)
+    except Exception as e:
+        logger.warning(f"Process partition maintenance failed: {e}")
+    app.state.background_jobs = [
+        asyncio.create_task(refresh_state_gauges_periodically()),
+        asyncio.create_task(maintain_process_partitions_periodically()),
+    ]
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    for task in app.state.background_jobs:
+        task.cancel()
+    mark_worker_dead()
+    app.state.tracer_provider.shutdown()
+
 # Metrics endpoint
 @app.get("/metrics")
 async def metrics():
-    """Prometheus metrics endpoint"""
-    return prometheus_client.generate_latest()
+    """Prometheus metrics endpoint, aggregated over all workers"""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+# On-demand profiling; disabled unless DEBUG_PROFILE_TOKEN is set
+DEBUG_PROFILE_TOKEN = os.getenv("DEBUG_PROFILE_TOKEN")
+
+@app.get("/debug/profile")
+async def debug_profile(seconds: float = Query(10.0, gt=0, le=MAX_SECONDS),
+                        format: Literal["json", "collapsed"] = "json",
+                        x_debug_token: Optional[str] = Header(None)):
+    """Sample the worker serving the request for seconds; collapsed stacks for flamegraphs"""
+    if not DEBUG_PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token_matches(DEBUG_PROFILE_TOKEN, x_debug_token):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+    try:
+        result = await profile(seconds)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running in this worker")
+    
+    if format == "collapsed":
+        return Response(content=result["collapsed"], media_type="text/plain")
+    result["worker_pid"] = os.getpid()
+    return result
 
 # Agent management
 @app.post("/agents", response_model=Dict)
 async def create_agent(agent: Agent):
     """Create a new agent"""
-    REQUEST_COUNT.labels(method="POST", endpoint="/agents").inc()
-    
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -127,36 +251,30 @@ async def create_agent(agent: Agent):
             VALUES (%s, %s, %s, %s, %s, %s, %s)
             RETURNING id
         """, (agent.name, agent.role, agent.goal, agent.backstory, 
-              agent.verbose, agent.allow_delegation, agent.tools))
+              agent.verbose, agent.allow_delegation, Json(agent.tools)))
         
         agent_id = cursor.fetchone()['id']
         conn.commit()
         cursor.close()
         conn.close()
         
-        ACTIVE_AGENTS.inc()
         return {"id": agent_id, "message": "Agent created successfully"}
         
     except Exception as e:
         logger.error(f"Failed to create agent: {e}")
         raise HTTPException(status_code=500, detail="Failed to create agent")
 
-@app.get("/agents", response_model=List[Dict])
+@app.get("/agents", response_model=List[Dict], response_class=RawJSONResponse)
 async def list_agents():
     """List all agents"""
-    REQUEST_COUNT.labels(method="GET", endpoint="/agents").inc()
-    
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM agents ORDER BY created_at DESC")
-        agents = cursor.fetchall()
-        
-        cursor.close()
+        # Postgres renders the JSON; no per-row Python objects or re-encoding
+        body = fetch_json_array(conn, LIST_AGENTS_QUERY)
         conn.close()
         
-        return [dict(agent) for agent in agents]
+        return RawJSONResponse(content=body)
         
     except Exception as e:
         logger.error(f"Failed to list agents: {e}")
@@ -166,8 +284,6 @@ async def list_agents():
 @app.post("/crews", response_model=Dict)
 async def create_crew(crew: Crew):
     """Create a new crew"""
-    REQUEST_COUNT.labels(method="POST", endpoint="/crews").inc()
-    
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -177,47 +293,72 @@ async def create_crew(crew: Crew):
             VALUES (%s, %s, %s, %s)
             RETURNING id
         """, (crew.name, crew.description, 
-              [agent.dict() for agent in crew.agents],
-              [task.dict() for task in crew.tasks]))
+              Json([agent.dict() for agent in crew.agents]),
+              Json([task.dict() for task in crew.tasks])))
         
         crew_id = cursor.fetchone()['id']
         conn.commit()
         cursor.close()
         conn.close()
         
-        ACTIVE_CREWS.inc()
         return {"id": crew_id, "message": "Crew created successfully"}
         
     except Exception as e:
         logger.error(f"Failed to create crew: {e}")
         raise HTTPException(status_code=500, detail="Failed to create crew")
 
-@app.get("/crews", response_model=List[Dict])
+@app.get("/crews", response_model=List[Dict], response_class=RawJSONResponse)
 async def list_crews():
     """List all crews"""
-    REQUEST_COUNT.labels(method="GET", endpoint="/crews").inc()
-    
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM crews ORDER BY created_at DESC")
-        crews = cursor.fetchall()
-        
-        cursor.close()
+        body = fetch_json_array(conn, LIST_CREWS_QUERY)
         conn.close()
         
-        return [dict(crew) for crew in crews]
+        return RawJSONResponse(content=body)
         
     except Exception as e:
         logger.error(f"Failed to list crews: {e}")
         raise HTTPException(status_code=500, detail="Failed to list crews")
 
+@app.get("/crews/search", response_model=List[Dict])
+async def search_crews(tool: Optional[str] = None,
+                       role: Optional[str] = None,
+                       task: Optional[str] = None,
+                       limit: int = Query(100, ge=1, le=1000)):
+    """Crews with an agent using a tool, an agent with a role, and/or matching task text"""
+    if not (tool or role or task):
+        raise HTTPException(status_code=400, detail="Specify at least one of tool, role or task")
+
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+        sql, params = crew_search_query(tool=tool, role=role, task=task, limit=limit)
+        cursor.execute(sql, params)
+        crews = cursor.fetchall()
+
+        cursor.close()
+        conn.close()
+
+        return [dict(crew) for crew in crews]
+
+    except Exception as e:
+        logger.error(f"Failed to search crews: {e}")
+        raise HTTPException(status_code=500, detail="Failed to search crews")
+
 # Process execution
+# Crew processes running in the background of this worker; the launch route
+# class only limits the requests that start them
+RUNNING_PROCESSES = Limiter("process", int(os.getenv("MAX_RUNNING_PROCESSES", "16")))
+
 @app.post("/process", response_model=Dict)
 async def execute_process(request: ProcessRequest, background_tasks: BackgroundTasks):
     """Execute a crew process"""
-    REQUEST_COUNT.labels(method="POST", endpoint="/process").inc()
+    if not RUNNING_PROCESSES.try_acquire():
+        raise HTTPException(status_code=429, detail="Too many running processes",
+                            headers={"Retry-After": str(RUNNING_PROCESSES.retry_after())})
     
     try:
         conn = get_db_connection()
@@ -234,17 +375,18 @@ async def execute_process(request: ProcessRequest, background_tasks: BackgroundT
         cursor.execute("""
             INSERT INTO processes (crew_id, process_type, verbose, memory, cache)
             VALUES (%s, %s, %s, %s, %s)
-            RETURNING id
+            RETURNING id, created_at
         """, (request.crew_id, request.process_type, 
               request.verbose, request.memory, request.cache))
         
-        process_id = cursor.fetchone()['id']
+        process = cursor.fetchone()
+        process_id = process['id']
         conn.commit()
         cursor.close()
         conn.close()
         
         # Execute process in background
-        background_tasks.add_task(execute_crew_process, process_id, crew)
+        background_tasks.add_task(execute_crew_process, process_id, process['created_at'], crew)
         
         return {
             "process_id": process_id,
@@ -253,12 +395,16 @@ async def execute_process(request: ProcessRequest, background_tasks: BackgroundT
         }
         
     except Exception as e:
+        RUNNING_PROCESSES.release()
         logger.error(f"Failed to execute process: {e}")
         raise HTTPException(status_code=500, detail="Failed to execute process")
 
-async def execute_crew_process(process_id: int, crew: Dict):
+@tracer.start_as_current_span("crew.process")
+async def execute_crew_process(process_id: int, created_at: datetime, crew: Dict):
     """Execute crew process in background"""
     start_time = time.time()
+    span = trace.get_current_span()
+    span.set_attributes({"crew.id": crew['id'], "crew.name": crew['name'], "process.id": process_id})
     
     try:
         # Simulate CrewAI process execution
@@ -271,20 +417,20 @@ async def execute_crew_process(process_id: int, crew: Dict):
         cursor.execute("""
             UPDATE processes 
             SET status = 'running', updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-        """, (process_id,))
+            WHERE id = %s AND created_at = %s
+        """, (process_id, created_at))
         
         # Simulate work
-        import asyncio
-        await asyncio.sleep(5)  # Simulate processing time
+        with tracer.start_as_current_span("crew.execute"):
+            await asyncio.sleep(5)  # Simulate processing time
         
         # Update with result
         result = f"Process completed successfully for crew {crew['name']}"
         cursor.execute("""
             UPDATE processes 
             SET status = 'completed', result = %s, updated_at = CURRENT_TIMESTAMP
-            WHERE id = %s
-        """, (result, process_id))
+            WHERE id = %s AND created_at = %s
+        """, (result, process_id, created_at))
         
         conn.commit()
         cursor.close()
@@ -297,6 +443,8 @@ async def execute_crew_process(process_id: int, crew: Dict):
         
     except Exception as e:
         logger.error(f"Process {process_id} failed: {e}")
+        span.record_exception(e)
+        span.set_status(Status(StatusCode.ERROR, str(e)))
         
         # Update process status to failed
         try:
@@ -306,25 +454,27 @@ async def execute_crew_process(process_id: int, crew: Dict):
             cursor.execute("""
                 UPDATE processes 
                 SET status = 'failed', result = %s, updated_at = CURRENT_TIMESTAMP
-                WHERE id = %s
-            """, (str(e), process_id))
+                WHERE id = %s AND created_at = %s
+            """, (str(e), process_id, created_at))
             
             conn.commit()
             cursor.close()
             conn.close()
         except Exception as update_error:
             logger.error(f"Failed to update process status: {update_error}")
+    finally:
+        RUNNING_PROCESSES.release(time.time() - start_time)
 
 @app.get("/processes/{process_id}", response_model=Dict)
 async def get_process_status(process_id: int):
     """Get process status"""
-    REQUEST_COUNT.labels(method="GET", endpoint="/processes").inc()
-    
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM processes WHERE id = %s", (process_id,))
+        # Bounds created_at so only the partition holding the id is scanned
+        where, params = process_lookup(conn, process_id)
+        cursor.execute(f"SELECT * FROM processes WHERE {where}", params)
         process = cursor.fetchone()
         
         cursor.close()
@@ -356,5 +506,8 @@ async def root():
     }
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # Workers re-import the launching script, which must not be this module
+    # or its metrics would be registered twice; serve.py sizes and starts them
+    import sys
+    serve = os.path.join(os.path.dirname(os.path.abspath(__file__)), "serve.py")
+    os.execv(sys.executable, [sys.executable, serve] + sys.argv[1:]) 
\ No newline at end of file
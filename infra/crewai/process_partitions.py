@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Processes Partition Maintenance
+Daily created_at partitions of processes, id-range pruning, retention and gzip NDJSON archival
+"""
+
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import psycopg2.extensions
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "processes_p"
+# Only one worker of one replica runs maintenance at a time
+MAINTENANCE_LOCK_KEY = 0x63726577_70617274
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def _cursor(conn):
+    # Plain tuple rows whatever cursor_factory the connection was opened with
+    return conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    if value in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def _db_now(conn) -> datetime:
+    # created_at defaults to CURRENT_TIMESTAMP in the session time zone
+    with _cursor(conn) as cursor:
+        cursor.execute("SELECT LOCALTIMESTAMP")
+        return cursor.fetchone()[0]
+
+
+def attached_partitions(conn) -> List[Tuple[str, Optional[datetime], Optional[datetime]]]:
+    """(name, lower, upper) of every partition of processes; None for MINVALUE/MAXVALUE"""
+    with _cursor(conn) as cursor:
+        cursor.execute("""
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'processes'::regclass
+        """)
+        partitions = []
+        for name, bound in cursor.fetchall():
+            match = _BOUND_RE.search(bound)
+            if match:
+                partitions.append((name, _parse_bound(match.group(1)), _parse_bound(match.group(2))))
+    return sorted(partitions, key=lambda p: p[2] or datetime.max)
+
+
+def ensure_partitions(conn, days_ahead: int = 3, now: Optional[datetime] = None) -> List[str]:
+    """Create the daily partitions from today through days_ahead that no partition covers yet"""
+    now = now or _db_now(conn)
+    partitions = attached_partitions(conn)
+    created = []
+    with _cursor(conn) as cursor:
+        for offset in range(days_ahead + 1):
+            start = datetime.combine(now.date() + timedelta(days=offset), datetime.min.time())
+            end = start + timedelta(days=1)
+            if any((lower is None or lower < end) and (upper is None or upper > start)
+                   for _, lower, upper in partitions):
+                continue
+            name = partition_name(start.date())
+            cursor.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} PARTITION OF processes "
+                                   "FOR VALUES FROM (%s) TO (%s)").format(sql.Identifier(name)),
+                           (start, end))
+            created.append(name)
+    conn.commit()
+    return created
+
+
+def record_closed_partitions(conn, grace: timedelta = timedelta(hours=1),
+                             now: Optional[datetime] = None) -> int:
+    """
+    Remember the id range of every partition that stopped receiving rows
+
+    A partition is closed once its upper bound is grace in the past, which
+    covers transactions that started before midnight and inserted after.
+    """
+    now = now or _db_now(conn)
+    recorded = 0
+    with _cursor(conn) as cursor:
+        cursor.execute("SELECT name FROM process_partitions")
+        known = {row[0] for row in cursor.fetchall()}
+        for name, lower, upper in attached_partitions(conn):
+            if name in known or upper is None or upper > now - grace:
+                continue
+            cursor.execute(sql.SQL("""
+                INSERT INTO process_partitions (name, starts_at, ends_at, min_id, max_id)
+                SELECT %s, %s, %s, min(id), max(id) FROM {}
+            """).format(sql.Identifier(name)), (name, lower, upper))
+            recorded += 1
+    conn.commit()
+    return recorded
+
+
+def process_lookup(conn, process_id: int) -> Tuple[str, List]:
+    """
+    WHERE clause and parameters selecting one process with partition pruning
+
+    Closed partitions have known id ranges; any other id can only be in a
+    partition that is still open. The created_at bounds are literals, so
+    the planner scans one or two partitions however long the history is.
+    """
+    with _cursor(conn) as cursor:
+        cursor.execute("""
+            SELECT count(*),
+                   CASE WHEN bool_or(starts_at IS NULL) THEN NULL ELSE min(starts_at) END,
+                   max(ends_at)
+            FROM process_partitions WHERE %s BETWEEN min_id AND max_id
+        """, (process_id,))
+        matched, lower, upper = cursor.fetchone()
+        if not matched:
+            cursor.execute("SELECT max(ends_at) FROM process_partitions")
+            lower, upper = cursor.fetchone()[0], None
+
+    conditions, params = ["id = %s"], [process_id]
+    if lower is not None:
+        conditions.append("created_at >= %s")
+        params.append(lower)
+    if upper is not None:
+        conditions.append("created_at < %s")
+        params.append(upper)
+    return " AND ".join(conditions), params
+
+
+def _pending_detach(conn) -> List[str]:
+    # Left attached by a DETACH ... CONCURRENTLY whose session died between
+    # its two transactions; it can only be finished with FINALIZE
+    with _cursor(conn) as cursor:
+        cursor.execute("""
+            SELECT c.relname
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'processes'::regclass AND i.inhdetachpending
+        """)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _detached_partitions(conn) -> List[str]:
+    # Left behind by a run that died between detaching and dropping
+    with _cursor(conn) as cursor:
+        cursor.execute("""
+            SELECT relname FROM pg_class
+            WHERE relkind = 'r' AND NOT relispartition
+              AND (relname LIKE %s OR relname = 'processes_legacy')
+              AND relnamespace = 'public'::regnamespace
+        """, (PARTITION_PREFIX.replace("_", r"\_") + "%",))
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _export(conn, name: str, archive_dir: str) -> str:
+    path = os.path.join(archive_dir, f"{name}.ndjson.gz")
+    tmp = path + ".tmp"
+    # Server-side cursor, so a large partition is never held in memory
+    with conn.cursor(name=f"archive_{name}", cursor_factory=psycopg2.extensions.cursor) as rows:
+        rows.itersize = 10000
+        rows.execute(sql.SQL("SELECT row_to_json(p)::text FROM {} p ORDER BY id").format(sql.Identifier(name)))
+        with open(tmp, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as out:
+                for (line,) in rows:
+                    out.write(line.encode("utf-8"))
+                    out.write(b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+    conn.commit()
+    os.replace(tmp, path)
+    return path
+
+
+def archive_expired_partitions(conn, retention_days: int, archive_dir: str,
+                               now: Optional[datetime] = None) -> List[str]:
+    """
+    Detach partitions older than the retention period, archive and drop them
+
+    Each partition is detached first so queries stop seeing it, written to
+    <archive_dir>/<partition>.ndjson.gz, and only dropped once the archive
+    is on disk. Partitions an interrupted run left pending detach or
+    detached are finished.
+    """
+    now = now or _db_now(conn)
+    cutoff = now - timedelta(days=retention_days)
+    os.makedirs(archive_dir, exist_ok=True)
+
+    pending = _pending_detach(conn)
+    expired = [name for name, _, upper in attached_partitions(conn)
+               if upper is not None and upper <= cutoff and name not in pending]
+    conn.commit()
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with _cursor(conn) as cursor:
+            for name in pending:
+                cursor.execute(sql.SQL("ALTER TABLE processes DETACH PARTITION {} FINALIZE")
+                               .format(sql.Identifier(name)))
+            for name in expired:
+                cursor.execute(sql.SQL("ALTER TABLE processes DETACH PARTITION {} CONCURRENTLY")
+                               .format(sql.Identifier(name)))
+    finally:
+        conn.autocommit = autocommit
+
+    archived = []
+    for name in _detached_partitions(conn):
+        path = _export(conn, name, archive_dir)
+        with _cursor(conn) as cursor:
+            cursor.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+            cursor.execute("DELETE FROM process_partitions WHERE name = %s", (name,))
+        conn.commit()
+        logger.info(f"Archived partition {name} to {path}")
+        archived.append(name)
+    return archived
+
+
+def run_maintenance(conn, retention_days: int = 30, archive_dir: str = "/app/archive/processes",
+                    days_ahead: int = 3) -> Dict[str, object]:
+    """Create upcoming partitions, record closed ones and archive expired ones"""
+    with _cursor(conn) as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (MAINTENANCE_LOCK_KEY,))
+        locked = cursor.fetchone()[0]
+    conn.commit()
+    if not locked:
+        return {"skipped": True}
+
+    try:
+        return {
+            "created": ensure_partitions(conn, days_ahead),
+            "recorded": record_closed_partitions(conn),
+            "archived": archive_expired_partitions(conn, retention_days, archive_dir),
+        }
+    finally:
+        with _cursor(conn) as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MAINTENANCE_LOCK_KEY,))
+        conn.commit()
+
+
+# Benchmark
+def main():
+    """Partitions scanned by a status lookup with and without id-range pruning"""
+    import json
+    import time
+
+    conn = psycopg2.connect(
+        host=os.getenv("DATABASE_HOST", "crewai-postgresql"),
+        database=os.getenv("DATABASE_NAME", "crewai"),
+        user=os.getenv("DATABASE_USER", "crewai"),
+        password=os.getenv("DATABASE_PASSWORD", "crewai_password"),
+    )
+    cursor = _cursor(conn)
+    cursor.execute("SELECT min(id), max(id) FROM processes")
+    low, high = cursor.fetchone()
+    if low is None:
+        print("processes is empty")
+        return
+    print(f"{len(attached_partitions(conn))} partitions")
+
+    def scanned(where, params):
+        cursor.execute(f"EXPLAIN (FORMAT JSON) SELECT * FROM processes WHERE {where}", params)
+        return json.dumps(cursor.fetchone()[0]).count('"Relation Name"')
+
+    for process_id in (low, (low + high) // 2, high):
+        start = time.perf_counter()
+        where, params = process_lookup(conn, process_id)
+        cursor.execute(f"SELECT * FROM processes WHERE {where}", params)
+        cursor.fetchall()
+        elapsed = time.perf_counter() - start
+        print(f"id {process_id}: pruned lookup scans {scanned(where, params)} partition(s) in "
+              f"{elapsed * 1e3:.2f} ms, id-only lookup scans {scanned('id = %s', [process_id])}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+On-demand Sampling Profiler
+Collapsed stacks of every thread, asyncio task dumps and event-loop lag for a running process
+
+proto/profiling.py is the source; infra/crewai/profiling.py is a
+vendored copy kept identical by tests/test_vendored_modules.py.
+"""
+
+import asyncio
+import hmac
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_SECONDS = 60.0
+TRUNCATED = "[truncated]"
+
+
+class ProfilerBusy(RuntimeError):
+    """A profile is already running in this process"""
+
+
+# One profile per process: a second sampler would double the overhead and
+# the two would see each other's stacks
+_running = threading.Lock()
+
+
+def token_matches(expected: Optional[str], given: Optional[str]) -> bool:
+    """Constant-time debug token check; never matches when no token is configured"""
+    return bool(expected) and hmac.compare_digest(expected.encode(), (given or "").encode())
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the Python stack of every thread from a background thread
+
+    Each tick reads sys._current_frames() and counts the stack as a tuple
+    of code objects; labels are only formatted once per distinct stack
+    when the profile is rendered. The number of distinct stacks is capped,
+    so memory stays bounded however long or varied the profile.
+    """
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 128, max_stacks: int = 20_000):
+        """
+        Initialize the sampler
+
+        Args:
+            interval: Seconds between samples
+            max_depth: Innermost frames kept per stack
+            max_stacks: Distinct stacks kept; further ones count as TRUNCATED
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self._names: Dict[int, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self, own_ident: int):
+        counts = self.counts
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            key = (ident, tuple(stack))
+            if key in counts or len(counts) < self.max_stacks:
+                counts[key] += 1
+            else:
+                counts[(ident, TRUNCATED)] += 1
+        self.samples += 1
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        start = time.perf_counter()
+        next_tick = start
+        while not self._stop.is_set():
+            self._sample(own_ident)
+            next_tick += self.interval
+            delay = next_tick - time.perf_counter()
+            if delay < 0:
+                # Fell behind (GIL contention); skip ticks rather than burst
+                next_tick = time.perf_counter()
+                delay = 0
+            self._stop.wait(delay)
+        self.elapsed = time.perf_counter() - start
+
+    def start(self):
+        self._names = {thread.ident: thread.name for thread in threading.enumerate()}
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._names.update({thread.ident: thread.name for thread in threading.enumerate()})
+
+    def collapsed(self) -> str:
+        """Stacks in the collapsed format of flamegraph.pl, speedscope and inferno"""
+        labels: Dict[Any, str] = {}
+        lines = []
+        for (ident, stack), count in self.counts.most_common():
+            thread = self._names.get(ident, f"thread-{ident}")
+            if stack == TRUNCATED:
+                frames = TRUNCATED
+            else:
+                for code in stack:
+                    if code not in labels:
+                        labels[code] = _frame_label(code).replace(";", ":")
+                frames = ";".join(labels[code] for code in reversed(stack))
+            lines.append(f"{thread};{frames} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+async def event_loop_lag(seconds: float, interval: float = 0.05) -> Dict[str, Any]:
+    """
+    How late the running loop wakes a sleeping coroutine, sampled for seconds
+
+    The lag is the time callbacks wait behind other work on the loop, so
+    blocking calls in coroutines show up here rather than in the stacks.
+    """
+    loop = asyncio.get_running_loop()
+    lags: List[float] = []
+    deadline = loop.time() + seconds
+    while loop.time() < deadline:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - start - interval))
+    lags.sort()
+    if not lags:
+        return {"samples": 0}
+    return {
+        "samples": len(lags),
+        "interval": interval,
+        "mean": sum(lags) / len(lags),
+        "p50": lags[len(lags) // 2],
+        "p99": lags[min(len(lags) - 1, int(len(lags) * 0.99))],
+        "max": lags[-1],
+    }
+
+
+def task_dump(limit: int = 1000, frames: int = 20) -> Dict[str, Any]:
+    """Pending asyncio tasks of the running loop with where each is suspended"""
+    tasks = asyncio.all_tasks()
+    current = asyncio.current_task()
+    dumped = []
+    for task in list(tasks)[:limit]:
+        if task is current:
+            continue
+        coro = task.get_coro()
+        dumped.append({
+            "name": task.get_name(),
+            "coro": getattr(coro, "__qualname__", repr(coro)),
+            "stack": [f"{frame.f_code.co_name} ({frame.f_code.co_filename}:{frame.f_lineno})"
+                      for frame in task.get_stack(limit=frames)],
+        })
+    by_coro = Counter(task["coro"] for task in dumped)
+    return {"count": len(tasks), "by_coro": dict(by_coro.most_common()), "tasks": dumped}
+
+
+async def profile(seconds: float = 10.0, interval: float = 0.01) -> Dict[str, Any]:
+    """
+    Profile this process for seconds without blocking the event loop
+
+    Returns collapsed stacks of all threads, the event-loop lag over the
+    same window and a dump of the pending tasks at its end. Raises
+    ProfilerBusy if a profile is already running.
+    """
+    seconds = min(max(seconds, interval), MAX_SECONDS)
+    if not _running.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        sampler = StackSampler(interval=interval)
+        sampler.start()
+        try:
+            lag = await event_loop_lag(seconds)
+        finally:
+            # Joining takes at most one interval
+            sampler.stop()
+        logger.info(f"Profiled {sampler.samples} samples over {sampler.elapsed:.1f}s")
+        return {
+            "seconds": sampler.elapsed,
+            "interval": interval,
+            "samples": sampler.samples,
+            "collapsed": sampler.collapsed(),
+            "event_loop_lag": lag,
+            "tasks": task_dump(),
+        }
+    finally:
+        _running.release()
+
+
+# Benchmark
+def main():
+    """Throughput of a CPU-bound thread with and without the sampler running"""
+
+    def fib(n):
+        return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+    def work():
+        start = time.perf_counter()
+        fib(27)
+        return time.perf_counter() - start
+
+    work()
+    bare = min(work() for _ in range(5))
+    print(f"unprofiled: {bare * 1e3:.1f} ms")
+    for interval in (0.01, 0.001):
+        sampler = StackSampler(interval=interval)
+        sampler.start()
+        sampled = min(work() for _ in range(5))
+        sampler.stop()
+        print(f"every {interval * 1e3:4.0f} ms: {sampled * 1e3:.1f} ms, overhead {(sampled - bare) / bare:+.1%}, "
+              f"{sampler.samples / sampler.elapsed:.0f} samples/s, {len(sampler.counts)} distinct stacks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+CrewAI API Server
+Runs the API with one uvicorn worker per usable core and cross-process Prometheus metrics
+"""
+
+import argparse
+import logging
+import math
+import os
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MULTIPROC_DIR = "/tmp/crewai-prometheus"
+
+
+def usable_cores() -> int:
+    """CPUs this process may run on, capped by the cgroup CPU quota"""
+    if hasattr(os, "sched_getaffinity"):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+
+    # cgroup v2 quota, e.g. "150000 100000" for a 1.5 CPU limit
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cores)
+
+
+def worker_count() -> int:
+    """WEB_CONCURRENCY if set, otherwise one worker per usable core"""
+    configured = os.getenv("WEB_CONCURRENCY")
+    if configured:
+        return max(1, int(configured))
+    return usable_cores()
+
+
+def prepare_multiprocess_dir(path: str):
+    """Create the Prometheus multiprocess directory and drop files left by earlier runs"""
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the CrewAI API")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: WEB_CONCURRENCY or usable cores)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    workers = args.workers or worker_count()
+    if workers > 1:
+        # Must be in the environment before the workers import prometheus_client
+        multiproc_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", DEFAULT_MULTIPROC_DIR)
+        prepare_multiprocess_dir(multiproc_dir)
+        logger.info(f"Starting {workers} workers, metrics aggregated in {multiproc_dir}")
+
+    # This module defines no metrics, so the workers re-importing it is harmless
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
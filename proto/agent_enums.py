@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Enum values shared by the AI Agent Service engines
+Mirrors the enums in ai_agent_service.proto so the engines work on plain ints
+"""
+
+from enum import IntEnum
+
+
+class AgentType(IntEnum):
+    UNSPECIFIED = 0
+    CODING = 1
+    TESTING = 2
+    SECURITY = 3
+    COMPLIANCE = 4
+    DOCUMENTATION = 5
+    ORCHESTRATOR = 6
+    DISCOVERY = 7
+    MONITORING = 8
+    ANALYTICS = 9
+
+    @property
+    def label(self) -> str:
+        """Label value used by the ai_agent_* Prometheus metrics, e.g. "coding" """
+        return self.name.lower()
+
+
+class AgentStatus(IntEnum):
+    UNSPECIFIED = 0
+    IDLE = 1
+    BUSY = 2
+    ERROR = 3
+    OFFLINE = 4
+    INITIALIZING = 5
+    TERMINATING = 6
+
+
+class TaskType(IntEnum):
+    UNSPECIFIED = 0
+    CODE_REVIEW = 1
+    UNIT_TEST = 2
+    INTEGRATION_TEST = 3
+    SECURITY_SCAN = 4
+    COMPLIANCE_CHECK = 5
+    DOCUMENTATION_UPDATE = 6
+    PERFORMANCE_ANALYSIS = 7
+    BUG_FIX = 8
+    FEATURE_IMPLEMENTATION = 9
+
+
+class TaskStatus(IntEnum):
+    UNSPECIFIED = 0
+    PENDING = 1
+    RUNNING = 2
+    COMPLETED = 3
+    FAILED = 4
+    CANCELLED = 5
+    TIMEOUT = 6
+
+
+class TaskPriority(IntEnum):
+    UNSPECIFIED = 0
+    LOW = 1
+    NORMAL = 2
+    HIGH = 3
+    CRITICAL = 4
+
+
+class MessageType(IntEnum):
+    UNSPECIFIED = 0
+    TASK_ASSIGNMENT = 1
+    TASK_COMPLETION = 2
+    HEARTBEAT = 3
+    ERROR = 4
+    WARNING = 5
+    INFO = 6
+    COMMAND = 7
+    RESPONSE = 8
+
+
+# Which agent type handles each task type
+TASK_TYPE_AGENT = {
+    TaskType.CODE_REVIEW: AgentType.CODING,
+    TaskType.BUG_FIX: AgentType.CODING,
+    TaskType.FEATURE_IMPLEMENTATION: AgentType.CODING,
+    TaskType.UNIT_TEST: AgentType.TESTING,
+    TaskType.INTEGRATION_TEST: AgentType.TESTING,
+    TaskType.SECURITY_SCAN: AgentType.SECURITY,
+    TaskType.COMPLIANCE_CHECK: AgentType.COMPLIANCE,
+    TaskType.DOCUMENTATION_UPDATE: AgentType.DOCUMENTATION,
+    TaskType.PERFORMANCE_ANALYSIS: AgentType.ANALYTICS,
+}
+
+TERMINAL_TASK_STATUSES = frozenset({
+    TaskStatus.COMPLETED,
+    TaskStatus.FAILED,
+    TaskStatus.CANCELLED,
+    TaskStatus.TIMEOUT,
+})
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Agent Placement Engine for AssignTask
+Capability- and load-aware routing with consistent-hash affinity
+"""
+
+import bisect
+import hashlib
+import logging
+import random
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from agent_enums import AgentStatus, AgentType
+
+logger = logging.getLogger(__name__)
+
+# Agents in these states can take new work
+PLACEABLE_STATUSES = frozenset({AgentStatus.IDLE, AgentStatus.BUSY})
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class _AgentSlot:
+    __slots__ = ("agent_id", "agent_type", "status", "capabilities", "tags", "active_tasks",
+                 "cpu_percent", "memory_percent", "pool_index")
+
+    def __init__(self, agent_id: str, agent_type: AgentType):
+        self.agent_id = agent_id
+        self.agent_type = agent_type
+        self.status = AgentStatus.INITIALIZING
+        self.capabilities: Dict[str, str] = {}
+        self.tags: Set[str] = set()
+        self.active_tasks = 0
+        self.cpu_percent = 0.0
+        self.memory_percent = 0.0
+        self.pool_index = -1
+
+    @property
+    def load(self) -> float:
+        # One running task weighs as much as a fully busy CPU
+        return self.active_tasks + max(self.cpu_percent, self.memory_percent) / 100.0
+
+
+class _HashRing:
+    """
+    Consistent-hash ring of agent IDs with virtual nodes
+
+    Adding or removing an agent inserts or deletes only its own points, so
+    churn costs O(replicas * log n) searches plus the list moves, never a
+    re-sort of the whole ring.
+    """
+
+    def __init__(self, replicas: int):
+        self.replicas = replicas
+        self.members: Set[str] = set()
+        self._points: List[int] = []
+        self._owners: List[str] = []
+
+    def _agent_points(self, agent_id: str) -> List[int]:
+        return [_hash(f"{agent_id}#{i}") for i in range(self.replicas)]
+
+    def add(self, agent_id: str):
+        if agent_id in self.members:
+            return
+        self.members.add(agent_id)
+        for point in self._agent_points(agent_id):
+            index = bisect.bisect_left(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, agent_id)
+
+    def remove(self, agent_id: str):
+        if agent_id not in self.members:
+            return
+        self.members.discard(agent_id)
+        for point in self._agent_points(agent_id):
+            index = bisect.bisect_left(self._points, point)
+            # Points can collide; find this agent's among equal ones
+            while self._owners[index] != agent_id:
+                index += 1
+            del self._points[index]
+            del self._owners[index]
+
+    def walk(self, key: str) -> Iterable[str]:
+        """Distinct agents clockwise from the key's position"""
+        if not self._points:
+            return
+        start = bisect.bisect(self._points, _hash(key))
+        seen = set()
+        n = len(self._points)
+        for offset in range(n):
+            owner = self._owners[(start + offset) % n]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+                if len(seen) == len(self.members):
+                    return
+
+
+class AgentPlacement:
+    """
+    Pick an agent for a task
+
+    Eligible agents match the agent type, are IDLE or BUSY, and carry every
+    required capability and tag. Among them the engine takes the less loaded
+    of two random picks (power-of-two-choices). With an affinity key (for
+    example the repository) it prefers the agent that owns the key on a
+    consistent-hash ring, so warm caches are reused, unless that agent is
+    more than ``affinity_slack`` tasks busier than the power-of-two pick.
+    """
+
+    def __init__(self,
+                 affinity_slack: float = 2.0,
+                 ring_replicas: int = 16,
+                 max_samples: int = 16,
+                 max_affinity_walk: int = 8,
+                 rng: Optional[random.Random] = None):
+        """
+        Initialize the placement engine
+
+        Args:
+            affinity_slack: Extra load the affinity agent may carry before the
+                task is placed elsewhere
+            ring_replicas: Virtual nodes per agent on the hash ring
+            max_samples: Random draws before falling back to a filtered scan
+            max_affinity_walk: Ring successors to try for an eligible owner
+            rng: Random source, injectable for tests
+        """
+        self.affinity_slack = affinity_slack
+        self.ring_replicas = ring_replicas
+        self.max_samples = max_samples
+        self.max_affinity_walk = max_affinity_walk
+        self.rng = rng or random.Random()
+
+        self._agents: Dict[str, _AgentSlot] = {}
+        # agent type -> placeable agent IDs, array-backed for O(1) random picks
+        self._pools: Dict[AgentType, List[str]] = {}
+        self._rings: Dict[AgentType, _HashRing] = {}
+        self._tag_index: Dict[str, Set[str]] = {}
+
+    # Registry maintenance
+
+    def register(self,
+                 agent_id: str,
+                 agent_type: AgentType,
+                 status: AgentStatus = AgentStatus.IDLE,
+                 capabilities: Optional[Mapping[str, str]] = None,
+                 tags: Iterable[str] = ()):
+        """Add or replace an agent"""
+        agent_type = AgentType(agent_type)
+        existing = self._agents.get(agent_id)
+        # A refresh that keeps the type keeps the agent's ring points
+        if existing is not None:
+            self._unlink(existing, ring=existing.agent_type != agent_type)
+
+        slot = _AgentSlot(agent_id, agent_type)
+        slot.capabilities = dict(capabilities or {})
+        slot.tags = set(tags)
+        self._agents[agent_id] = slot
+        for tag in slot.tags:
+            self._tag_index.setdefault(tag, set()).add(agent_id)
+
+        ring = self._rings.get(slot.agent_type)
+        if ring is None:
+            ring = self._rings[slot.agent_type] = _HashRing(self.ring_replicas)
+        ring.add(agent_id)
+        self.set_status(agent_id, status)
+
+    def register_agent(self, agent: Any):
+        """Add an agent from an Agent protobuf"""
+        self.register(agent.id, agent.type, agent.status, agent.capabilities, agent.tags)
+        if agent.HasField("current_resources"):
+            self.update_load(agent.id,
+                             cpu_percent=agent.current_resources.cpu_usage_percent,
+                             memory_percent=agent.current_resources.memory_usage_percent,
+                             active_tasks=len(agent.active_tasks))
+
+    def deregister(self, agent_id: str) -> bool:
+        """Remove an agent"""
+        slot = self._agents.get(agent_id)
+        if slot is None:
+            return False
+        self._unlink(slot, ring=True)
+        return True
+
+    def _unlink(self, slot: _AgentSlot, ring: bool):
+        agent_id = slot.agent_id
+        self._pool_remove(slot)
+        if ring:
+            self._rings[slot.agent_type].remove(agent_id)
+        for tag in slot.tags:
+            members = self._tag_index.get(tag)
+            if members is not None:
+                members.discard(agent_id)
+                if not members:
+                    del self._tag_index[tag]
+        del self._agents[agent_id]
+
+    def _pool_add(self, slot: _AgentSlot):
+        if slot.pool_index >= 0:
+            return
+        pool = self._pools.setdefault(slot.agent_type, [])
+        slot.pool_index = len(pool)
+        pool.append(slot.agent_id)
+
+    def _pool_remove(self, slot: _AgentSlot):
+        if slot.pool_index < 0:
+            return
+        pool = self._pools[slot.agent_type]
+        # Swap with the last entry so removal is O(1)
+        last_id = pool.pop()
+        if last_id != slot.agent_id:
+            pool[slot.pool_index] = last_id
+            self._agents[last_id].pool_index = slot.pool_index
+        slot.pool_index = -1
+
+    def set_status(self, agent_id: str, status: AgentStatus):
+        """Update an agent's status; only IDLE and BUSY agents are placeable"""
+        slot = self._agents[agent_id]
+        slot.status = AgentStatus(status)
+        if slot.status in PLACEABLE_STATUSES:
+            self._pool_add(slot)
+        else:
+            self._pool_remove(slot)
+
+    def update_load(self,
+                    agent_id: str,
+                    cpu_percent: Optional[float] = None,
+                    memory_percent: Optional[float] = None,
+                    active_tasks: Optional[int] = None):
+        """Update live load from a heartbeat or ResourceUsage report"""
+        slot = self._agents.get(agent_id)
+        if slot is None:
+            return
+        if cpu_percent is not None:
+            slot.cpu_percent = cpu_percent
+        if memory_percent is not None:
+            slot.memory_percent = memory_percent
+        if active_tasks is not None:
+            slot.active_tasks = active_tasks
+
+    def task_finished(self, agent_id: str):
+        """Release the load a placement added to an agent"""
+        slot = self._agents.get(agent_id)
+        if slot is not None and slot.active_tasks > 0:
+            slot.active_tasks -= 1
+
+    # Placement
+
+    def _eligible(self, slot: _AgentSlot, capabilities: Mapping[str, str], tags: Set[str]) -> bool:
+        if slot.pool_index < 0:
+            return False
+        if tags and not tags <= slot.tags:
+            return False
+        for key, value in capabilities.items():
+            if slot.capabilities.get(key) != value:
+                return False
+        return True
+
+    def _candidates(self, agent_type: AgentType, capabilities: Mapping[str, str],
+                    tags: Set[str]) -> List[_AgentSlot]:
+        """Up to two distinct eligible agents, sampled at random"""
+        pool = self._pools.get(agent_type)
+        if not pool:
+            return []
+
+        picked: List[_AgentSlot] = []
+        for _ in range(self.max_samples):
+            slot = self._agents[pool[self.rng.randrange(len(pool))]]
+            if self._eligible(slot, capabilities, tags) and slot not in picked:
+                picked.append(slot)
+                if len(picked) == 2:
+                    return picked
+
+        # Selective filters: narrow with the smallest tag set, then scan
+        if tags:
+            smallest = min((self._tag_index.get(tag, set()) for tag in tags), key=len)
+            scan = (self._agents[a] for a in smallest)
+        else:
+            scan = (self._agents[a] for a in pool)
+        eligible = [s for s in scan if s.agent_type == agent_type and self._eligible(s, capabilities, tags)]
+        if len(eligible) <= 2:
+            return eligible
+        return self.rng.sample(eligible, 2)
+
+    def _affinity_agent(self, agent_type: AgentType, key: str, capabilities: Mapping[str, str],
+                        tags: Set[str]) -> Optional[_AgentSlot]:
+        ring = self._rings.get(agent_type)
+        if ring is None:
+            return None
+        for i, agent_id in enumerate(ring.walk(key)):
+            if i >= self.max_affinity_walk:
+                break
+            slot = self._agents[agent_id]
+            if self._eligible(slot, capabilities, tags):
+                return slot
+        return None
+
+    def place(self,
+              agent_type: AgentType,
+              capabilities: Optional[Mapping[str, str]] = None,
+              tags: Iterable[str] = (),
+              affinity_key: Optional[str] = None) -> Optional[str]:
+        """
+        Choose an agent for a task and count the task against its load
+
+        Returns None when no agent is eligible.
+        """
+        agent_type = AgentType(agent_type)
+        capabilities = capabilities or {}
+        tags = set(tags)
+
+        candidates = self._candidates(agent_type, capabilities, tags)
+        if not candidates:
+            return None
+        choice = min(candidates, key=lambda s: s.load)
+
+        if affinity_key:
+            owner = self._affinity_agent(agent_type, affinity_key, capabilities, tags)
+            if owner is not None and owner.load <= choice.load + self.affinity_slack:
+                choice = owner
+
+        choice.active_tasks += 1
+        return choice.agent_id
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+
+# Benchmark
+def main():
+    """Benchmark placement latency with 10k registered agents"""
+    n_agents = 10_000
+    n_placements = 100_000
+    placement = AgentPlacement()
+    agent_types = [AgentType.CODING, AgentType.TESTING, AgentType.SECURITY, AgentType.DOCUMENTATION]
+
+    for i in range(n_agents):
+        placement.register(
+            f"agent-{i}",
+            agent_types[i % len(agent_types)],
+            status=AgentStatus.IDLE if i % 10 else AgentStatus.OFFLINE,
+            capabilities={"language": "python" if i % 3 else "go"},
+            tags=["gpu"] if i % 50 == 0 else [],
+        )
+        placement.update_load(f"agent-{i}", cpu_percent=random.uniform(0, 100))
+
+    repositories = [f"medinovai/repo-{i}" for i in range(500)]
+    scenarios = [
+        ("type only", {}, {}),
+        ("capability", {"capabilities": {"language": "python"}}, {}),
+        ("rare tag", {"tags": ["gpu"]}, {}),
+        ("affinity", {}, {"affinity": True}),
+    ]
+    for name, kwargs, options in scenarios:
+        start = time.perf_counter()
+        for i in range(n_placements):
+            key = repositories[i % len(repositories)] if options.get("affinity") else None
+            agent_id = placement.place(agent_types[i % len(agent_types)], affinity_key=key, **kwargs)
+            placement.task_finished(agent_id)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {elapsed / n_placements * 1e6:.2f} µs/placement")
+
+    # Churn: an agent joins and leaves, another re-registers, between placements
+    n_churn = 10_000
+    start = time.perf_counter()
+    for i in range(n_churn):
+        agent_type = agent_types[i % len(agent_types)]
+        placement.register(f"churn-{i}", agent_type)
+        placement.deregister(f"churn-{i}")
+        placement.register(f"agent-{i}", agent_types[i % len(agent_types)])
+        placement.task_finished(placement.place(agent_type, affinity_key=repositories[i % len(repositories)]))
+    elapsed = time.perf_counter() - start
+    print(f"{'churn':>10}: {elapsed / n_churn * 1e6:.2f} µs per join, leave, refresh and affinity placement")
+
+
+if __name__ == "__main__":
+    main()
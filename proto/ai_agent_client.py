@@ -13,6 +13,30 @@ import grpc
 from grpc import aio
 import ai_agent_service_pb2
 import ai_agent_service_pb2_grpc
+from payload_codec import WireStats, encode_chunks
+from profiling import profile
+from request_coalescing import BatchLoader
+from tracing import client_interceptors
+
+_COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+_TASK_RESULT_FIELDS = ("success", "message", "errors", "warnings")
+
+
+def _task_result(result: Dict[str, Any]) -> ai_agent_service_pb2.TaskResult:
+    """TaskResult for a result dict; keys other than its fields go to data, JSON-encoded unless strings"""
+    return ai_agent_service_pb2.TaskResult(
+        success=bool(result.get("success", True)),
+        message=str(result.get("message", "")),
+        errors=[str(error) for error in result.get("errors", ())],
+        warnings=[str(warning) for warning in result.get("warnings", ())],
+        data={key: value if isinstance(value, str) else json.dumps(value)
+              for key, value in result.items() if key not in _TASK_RESULT_FIELDS},
+    )
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -31,7 +55,17 @@ class AIAgentClient:
                  port: int = 9090,
                  use_xds: bool = True,
                  max_retries: int = 3,
-                 timeout: float = 30.0):
+                 timeout: float = 30.0,
+                 batch_window: float = 0.002,
+                 max_batch_size: int = 500,
+                 compression: str = "gzip",
+                 compression_threshold: int = 8 * 1024,
+                 channel_compression: Optional[str] = None,
+                 max_send_message_length: int = 64 * 1024 * 1024,
+                 max_receive_message_length: int = 64 * 1024 * 1024,
+                 chunked_upload_threshold: int = 4 * 1024 * 1024,
+                 upload_chunk_size: int = 1024 * 1024,
+                 tracing: bool = True):
         """
         Initialize the AI Agent client
         
@@ -42,6 +76,19 @@ class AIAgentClient:
             use_xds: Whether to use xDS for service discovery
             max_retries: Maximum number of retries
             timeout: Request timeout in seconds
+            batch_window: Seconds get_agent/get_task calls are gathered into one batch
+            max_batch_size: Most ids per BatchGetAgents/BatchGetTasks call
+            compression: Algorithm ("gzip", "deflate", "none") for requests of at
+                least compression_threshold serialized bytes
+            compression_threshold: Request size from which calls are compressed
+            channel_compression: Default algorithm for every call on the channel
+            max_send_message_length: Largest message the client sends
+            max_receive_message_length: Largest message the client accepts
+            chunked_upload_threshold: CompleteTask requests larger than this are
+                sent through UploadTaskResult instead
+            upload_chunk_size: Bytes per UploadTaskResult chunk
+            tracing: Record a span per call and propagate trace context
+                (needs opentelemetry-sdk; see tracing.configure_tracing)
         """
         self.service_name = service_name
         self.namespace = namespace
@@ -49,6 +96,14 @@ class AIAgentClient:
         self.use_xds = use_xds
         self.max_retries = max_retries
         self.timeout = timeout
+        self.compression = _COMPRESSION[compression]
+        self.compression_threshold = compression_threshold
+        self.channel_compression = _COMPRESSION[channel_compression] if channel_compression else None
+        self.max_send_message_length = max_send_message_length
+        self.max_receive_message_length = max_receive_message_length
+        self.chunked_upload_threshold = chunked_upload_threshold
+        self.upload_chunk_size = upload_chunk_size
+        self.interceptors = client_interceptors() if tracing else []
         
         # xDS configuration
         if use_xds:
@@ -61,10 +116,15 @@ class AIAgentClient:
         self._stub = None
         self._lock = asyncio.Lock()
         
+        # Concurrent lookups share in-flight requests and go out in batches
+        self._agent_loader = BatchLoader(self._batch_get_agents, batch_window, max_batch_size)
+        self._task_loader = BatchLoader(self._batch_get_tasks, batch_window, max_batch_size)
+        
         # Metrics
         self.request_count = 0
         self.error_count = 0
         self.latency_sum = 0.0
+        self.wire_stats = WireStats()
         
     async def _get_channel(self) -> aio.Channel:
         """Get or create gRPC channel with xDS support"""
@@ -82,7 +142,11 @@ class AIAgentClient:
                         ('grpc.http2.max_pings_without_data', 0),
                         ('grpc.http2.min_time_between_pings_ms', 10000),
                         ('grpc.http2.min_ping_interval_without_data_ms', 300000),
-                    ]
+                        ('grpc.max_send_message_length', self.max_send_message_length),
+                        ('grpc.max_receive_message_length', self.max_receive_message_length),
+                    ],
+                    compression=self.channel_compression,
+                    interceptors=self.interceptors
                 )
             else:
                 # Direct connection
@@ -93,7 +157,11 @@ class AIAgentClient:
                         ('grpc.keepalive_time_ms', 30000),
                         ('grpc.keepalive_timeout_ms', 5000),
                         ('grpc.keepalive_permit_without_calls', True),
-                    ]
+                        ('grpc.max_send_message_length', self.max_send_message_length),
+                        ('grpc.max_receive_message_length', self.max_receive_message_length),
+                    ],
+                    compression=self.channel_compression,
+                    interceptors=self.interceptors
                 )
         return self._channel
     
@@ -108,6 +176,14 @@ class AIAgentClient:
         """Execute operation with retry logic"""
         last_exception = None
         
+        # Compress large requests only; small ones cost more CPU than they save
+        request_size = args[0].ByteSize() if args and hasattr(args[0], "ByteSize") else 0
+        if request_size >= self.compression_threshold:
+            kwargs.setdefault("compression", self.compression)
+        if kwargs.get("compression", self.channel_compression) not in (None, grpc.Compression.NoCompression):
+            self.wire_stats.compressed_calls += 1
+        self.wire_stats.payload_sent += request_size
+        
         for attempt in range(self.max_retries):
             try:
                 start_time = time.time()
@@ -117,6 +193,8 @@ class AIAgentClient:
                 # Update metrics
                 self.request_count += 1
                 self.latency_sum += latency
+                if hasattr(result, "ByteSize"):
+                    self.wire_stats.payload_received += result.ByteSize()
                 
                 logger.info(f"Request completed in {latency:.3f}s (attempt {attempt + 1})")
                 return result
@@ -148,12 +226,25 @@ class AIAgentClient:
             )
             return await self._execute_with_retry(stub.CreateAgent, request, timeout=self.timeout)
     
-    async def get_agent(self, agent_id: str) -> ai_agent_service_pb2.Agent:
-        """Get agent by ID"""
+    async def _batch_get_agents(self, agent_ids: List[str]) -> Dict[str, ai_agent_service_pb2.Agent]:
         async with self._lock:
             stub = await self._get_stub()
-            request = ai_agent_service_pb2.GetAgentRequest(id=agent_id)
-            return await self._execute_with_retry(stub.GetAgent, request, timeout=self.timeout)
+        request = ai_agent_service_pb2.BatchGetAgentsRequest(agent_ids=agent_ids)
+        response = await self._execute_with_retry(stub.BatchGetAgents, request, timeout=self.timeout)
+        return {agent.id: agent for agent in response.agents}
+    
+    async def get_agent(self, agent_id: str) -> ai_agent_service_pb2.Agent:
+        """
+        Get agent by ID
+        
+        Concurrent calls are coalesced into BatchGetAgents requests; raises
+        KeyError if the agent does not exist.
+        """
+        return await self._agent_loader.load(agent_id)
+    
+    async def get_agents(self, agent_ids: List[str]) -> List[ai_agent_service_pb2.Agent]:
+        """Get agents by ID, in order, in as few BatchGetAgents calls as possible"""
+        return await self._agent_loader.load_many(agent_ids)
     
     async def list_agents(self, agent_type: Optional[str] = None) -> List[ai_agent_service_pb2.Agent]:
         """List all agents, optionally filtered by type"""
@@ -203,22 +294,43 @@ class AIAgentClient:
             response = await self._execute_with_retry(stub.DeregisterAgent, request, timeout=self.timeout)
             return response.success
     
-    async def assign_task(self, agent_id: str, task_data: Dict[str, Any]) -> ai_agent_service_pb2.Task:
-        """Assign a task to an agent"""
+    async def assign_task(self, agent_id: Optional[str], task_data: Dict[str, Any],
+                          affinity_key: Optional[str] = None) -> ai_agent_service_pb2.Task:
+        """
+        Assign a task to an agent
+        
+        With no agent_id the service places the task on an eligible agent;
+        affinity_key (e.g. the repository) keeps related tasks on the same agent.
+        """
         async with self._lock:
             stub = await self._get_stub()
             request = ai_agent_service_pb2.AssignTaskRequest(
-                agent_id=agent_id,
+                agent_id=agent_id or "",
                 task_data=json.dumps(task_data)
             )
+            if affinity_key:
+                request.metadata["affinity_key"] = affinity_key
             return await self._execute_with_retry(stub.AssignTask, request, timeout=self.timeout)
     
-    async def get_task(self, task_id: str) -> ai_agent_service_pb2.Task:
-        """Get task by ID"""
+    async def _batch_get_tasks(self, task_ids: List[str]) -> Dict[str, ai_agent_service_pb2.Task]:
         async with self._lock:
             stub = await self._get_stub()
-            request = ai_agent_service_pb2.GetTaskRequest(id=task_id)
-            return await self._execute_with_retry(stub.GetTask, request, timeout=self.timeout)
+        request = ai_agent_service_pb2.BatchGetTasksRequest(task_ids=task_ids)
+        response = await self._execute_with_retry(stub.BatchGetTasks, request, timeout=self.timeout)
+        return {task.id: task for task in response.tasks}
+    
+    async def get_task(self, task_id: str) -> ai_agent_service_pb2.Task:
+        """
+        Get task by ID
+        
+        Concurrent calls are coalesced into BatchGetTasks requests; raises
+        KeyError if the task does not exist.
+        """
+        return await self._task_loader.load(task_id)
+    
+    async def get_tasks(self, task_ids: List[str]) -> List[ai_agent_service_pb2.Task]:
+        """Get tasks by ID, in order, in as few BatchGetTasks calls as possible"""
+        return await self._task_loader.load_many(task_ids)
     
     async def update_task(self, task_id: str, status: str, result: Optional[Dict[str, Any]] = None) -> ai_agent_service_pb2.Task:
         """Update task status and result"""
@@ -232,16 +344,35 @@ class AIAgentClient:
                 request.result = json.dumps(result)
             return await self._execute_with_retry(stub.UpdateTask, request, timeout=self.timeout)
     
-    async def complete_task(self, task_id: str, result: Dict[str, Any]) -> ai_agent_service_pb2.Task:
-        """Complete a task with result"""
+    async def complete_task(self, task_id: str, result: Dict[str, Any]) -> ai_agent_service_pb2.TaskResult:
+        """Complete a task with result; very large results are uploaded in chunks"""
+        request = ai_agent_service_pb2.CompleteTaskRequest(
+            task_id=task_id,
+            result=_task_result(result)
+        )
+        if request.ByteSize() > self.chunked_upload_threshold:
+            return await self.upload_task_result(task_id, request.result.SerializeToString())
+        
         async with self._lock:
             stub = await self._get_stub()
-            request = ai_agent_service_pb2.CompleteTaskRequest(
-                id=task_id,
-                result=json.dumps(result)
-            )
             return await self._execute_with_retry(stub.CompleteTask, request, timeout=self.timeout)
     
+    async def upload_task_result(self, task_id: str, payload: bytes) -> ai_agent_service_pb2.TaskResult:
+        """
+        Complete a task with a serialized TaskResult of any size
+        
+        The payload is compressed once (zstd when available, else gzip) and
+        streamed in upload_chunk_size pieces, so no single message comes near
+        the size limits. gRPC compression is off for the already compressed chunks.
+        """
+        chunks = [ai_agent_service_pb2.TaskResultChunk(**fields)
+                  for fields in encode_chunks(task_id, payload, self.upload_chunk_size, stats=self.wire_stats)]
+        async with self._lock:
+            stub = await self._get_stub()
+        # A list, so every retry attempt streams the chunks from the start
+        return await self._execute_with_retry(stub.UploadTaskResult, chunks, timeout=self.timeout,
+                                              compression=grpc.Compression.NoCompression)
+    
     async def cancel_task(self, task_id: str) -> bool:
         """Cancel a task"""
         async with self._lock:
@@ -346,10 +477,26 @@ class AIAgentClient:
             "error_count": self.error_count,
             "error_rate": error_rate,
             "average_latency": avg_latency,
+            "agent_lookups": dict(self._agent_loader.stats),
+            "task_lookups": dict(self._task_loader.stats),
+            "wire": self.wire_stats.to_dict(),
             "target": self.target,
             "use_xds": self.use_xds
         }
     
+    async def profile(self, seconds: float = 10.0, interval: float = 0.01) -> Dict[str, Any]:
+        """
+        Sample the process running this client for seconds
+        
+        Returns collapsed stacks of every thread (for flamegraph tools), the
+        event-loop lag, a dump of pending asyncio tasks and the client
+        metrics at the end of the window. Raises profiling.ProfilerBusy if a
+        profile is already running in this process.
+        """
+        result = await profile(seconds, interval)
+        result["client_metrics"] = self.get_client_metrics()
+        return result
+    
     async def close(self):
         """Close the client connection"""
         if self._channel:
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Broadcast Fan-out Engine for BroadcastMessage
+Inverted type/tag indexes, shared payloads and batched mailbox delivery
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+
+from agent_enums import AgentType
+from agent_mailbox import MailboxStore, SharedMessage
+
+logger = logging.getLogger(__name__)
+
+
+def agent_type_label(agent_type: Union[AgentType, int, str]) -> str:
+    """Normalise AgentType values and names ("AGENT_TYPE_CODING", "coding") to a label"""
+    if isinstance(agent_type, str):
+        name = agent_type.strip()
+        if name.upper().startswith("AGENT_TYPE_"):
+            name = name[len("AGENT_TYPE_"):]
+        return name.lower()
+    return AgentType(agent_type).label
+
+
+class AgentIndex:
+    """Inverted indexes from agent type and tag to agent IDs"""
+
+    def __init__(self):
+        self._by_type: Dict[str, Set[str]] = {}
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._agents: Dict[str, tuple] = {}
+
+    def add(self, agent_id: str, agent_type: Union[AgentType, int, str], tags: Iterable[str] = ()):
+        """Index an agent, replacing any previous entry"""
+        self.remove(agent_id)
+        label = agent_type_label(agent_type)
+        tags = tuple(set(tags))
+        self._agents[agent_id] = (label, tags)
+        self._by_type.setdefault(label, set()).add(agent_id)
+        for tag in tags:
+            self._by_tag.setdefault(tag, set()).add(agent_id)
+
+    def remove(self, agent_id: str) -> bool:
+        entry = self._agents.pop(agent_id, None)
+        if entry is None:
+            return False
+        label, tags = entry
+        self._discard(self._by_type, label, agent_id)
+        for tag in tags:
+            self._discard(self._by_tag, tag, agent_id)
+        return True
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], key: str, agent_id: str):
+        members = index.get(key)
+        if members is not None:
+            members.discard(agent_id)
+            if not members:
+                del index[key]
+
+    def resolve(self, target_types: Iterable[Union[AgentType, int, str]] = (),
+                target_tags: Iterable[str] = ()) -> Set[str]:
+        """
+        Agents addressed by a broadcast
+
+        An agent matches if its type is any of ``target_types`` and it carries
+        every tag in ``target_tags``. An empty list does not constrain; with
+        both empty every agent is addressed.
+        """
+        types = {agent_type_label(t) for t in target_types}
+        tags = set(target_tags)
+
+        sets: List[Set[str]] = []
+        if types:
+            type_sets = [self._by_type.get(t, set()) for t in types]
+            sets.append(type_sets[0] if len(type_sets) == 1 else set().union(*type_sets))
+        for tag in tags:
+            sets.append(self._by_tag.get(tag, set()))
+
+        if not sets:
+            return set(self._agents)
+        # Intersect smallest first so the work is bounded by the rarest set
+        sets.sort(key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            if not result:
+                break
+            result &= other
+        return result
+
+    def __len__(self) -> int:
+        return len(self._agents)
+
+
+class BroadcastEngine:
+    """
+    Fan a BroadcastMessage out to every addressed agent
+
+    The message is stored once; mailboxes hold references to it. Delivery
+    runs in batches of ``batch_size`` recipients, and the async variant
+    yields to the event loop between batches so a broadcast to thousands
+    of agents does not stall other RPCs.
+    """
+
+    def __init__(self, index: Optional[AgentIndex] = None, mailboxes: Optional[MailboxStore] = None,
+                 batch_size: int = 1024):
+        """
+        Initialize the broadcast engine
+
+        Args:
+            index: Agent type/tag index; a new one is created if omitted
+            mailboxes: Mailbox store delivered into; a default one is created if omitted
+            batch_size: Recipients delivered per batch
+        """
+        self.index = index or AgentIndex()
+        self.mailboxes = mailboxes if mailboxes is not None else MailboxStore()
+        self.batch_size = batch_size
+
+    def _recipients(self, message: SharedMessage, target_types, target_tags) -> List[str]:
+        recipients = self.index.resolve(target_types, target_tags)
+        recipients.discard(message.from_agent_id)
+        return list(recipients)
+
+    def broadcast(self, message: SharedMessage, target_types=(), target_tags=()) -> int:
+        """Deliver synchronously; returns the number of mailboxes that accepted it"""
+        recipients = self._recipients(message, target_types, target_tags)
+        delivered = 0
+        for start in range(0, len(recipients), self.batch_size):
+            delivered += self.mailboxes.deliver_many(recipients[start:start + self.batch_size], message)
+        return delivered
+
+    async def broadcast_async(self, message: SharedMessage, target_types=(), target_tags=()) -> int:
+        """Deliver in batches, yielding to the event loop between them"""
+        recipients = self._recipients(message, target_types, target_tags)
+        delivered = 0
+        for start in range(0, len(recipients), self.batch_size):
+            delivered += self.mailboxes.deliver_many(recipients[start:start + self.batch_size], message)
+            await asyncio.sleep(0)
+        return delivered
+
+    async def handle_request(self, request: Any) -> int:
+        """Serve a BroadcastMessageRequest"""
+        message = SharedMessage.from_request(request)
+        return await self.broadcast_async(message, request.target_agent_types, request.target_tags)
+
+
+# Benchmark
+def main():
+    """Benchmark a broadcast to 10k agents and event-loop responsiveness during it"""
+    n_agents = 10_000
+    engine = BroadcastEngine()
+    types = list(AgentType)[1:]
+    for i in range(n_agents):
+        tags = ["hipaa"] if i % 4 == 0 else []
+        engine.index.add(f"agent-{i}", types[i % len(types)], tags + [f"team-{i % 20}"])
+        engine.mailboxes.open(f"agent-{i}")
+
+    scenarios = [
+        ("all agents", (), ()),
+        ("two types", ("coding", "AGENT_TYPE_TESTING"), ()),
+        ("type + tag", ("coding",), ("hipaa",)),
+    ]
+    for name, target_types, target_tags in scenarios:
+        message = SharedMessage("orchestrator", subject="policy update", content="x" * 4096)
+        start = time.perf_counter()
+        delivered = engine.broadcast(message, target_types, target_tags)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>10}: {delivered} recipients in {elapsed * 1000:.2f} ms")
+
+    async def responsiveness():
+        # Measure how late a 1ms ticker fires while a full broadcast runs
+        lags = []
+
+        async def ticker():
+            loop = asyncio.get_running_loop()
+            for _ in itertools.count():
+                expected = loop.time() + 0.001
+                await asyncio.sleep(0.001)
+                lags.append(loop.time() - expected)
+
+        tick = asyncio.create_task(ticker())
+        await asyncio.sleep(0.01)
+        message = SharedMessage("orchestrator", subject="all hands", content="x" * 4096)
+        await engine.broadcast_async(message)
+        tick.cancel()
+        print(f"async broadcast: max event-loop lag {max(lags) * 1000:.2f} ms")
+
+    asyncio.run(responsiveness())
+
+
+if __name__ == "__main__":
+    main()
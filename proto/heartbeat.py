@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Heartbeat Aggregation and Failure Detection for the AI Agent Service
+Compact heartbeat table, hashed timing wheel and phi-accrual detector
+"""
+
+import logging
+import math
+import time
+from array import array
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from agent_enums import AgentStatus
+
+logger = logging.getLogger(__name__)
+
+# (agent_id, old status, new status, timestamp)
+Transition = Tuple[str, AgentStatus, AgentStatus, float]
+
+
+def phi(elapsed: float, mean: float, std: float) -> float:
+    """
+    Suspicion level for a silence of ``elapsed`` seconds
+
+    phi = -log10(P(next heartbeat arrives later than elapsed)) under a
+    normal model of inter-arrival times, using the logistic approximation
+    of the normal CDF. phi = 1 means a 10% chance the agent is alive and
+    merely late, phi = 8 one in 10^8.
+    """
+    y = (elapsed - mean) / std
+    # P = e / (1 + e) with e = exp(x); -ln P = ln(1 + e) - x, kept finite
+    # for large |y| where exp would underflow or overflow
+    x = -y * (1.5976 + 0.070566 * y * y)
+    if x > 0:
+        return math.log1p(math.exp(-x)) / math.log(10)
+    return (math.log1p(math.exp(x)) - x) / math.log(10)
+
+
+def _phi_deviations(threshold: float) -> float:
+    """Standard deviations past the mean at which phi reaches ``threshold``"""
+    low, high = 0.0, 40.0
+    for _ in range(60):
+        mid = (low + high) / 2
+        if phi(mid, 0.0, 1.0) < threshold:
+            low = mid
+        else:
+            high = mid
+    return high
+
+
+class _TimingWheel:
+    """
+    Hashed timing wheel of (slot, generation) entries
+
+    Scheduling and cancellation are O(1); cancelled entries are skipped
+    when their bucket fires because the generation no longer matches.
+    Deadlines further out than one rotation fire early and are re-armed by
+    the caller.
+    """
+
+    __slots__ = ("tick", "buckets", "cursor", "now")
+
+    def __init__(self, tick: float, size: int, now: float):
+        self.tick = tick
+        self.buckets: List[List[Tuple[int, int]]] = [[] for _ in range(size)]
+        self.cursor = int(now // tick)
+        self.now = now
+
+    def schedule(self, deadline: float, slot: int, generation: int):
+        target = max(int(deadline // self.tick), self.cursor + 1)
+        self.buckets[target % len(self.buckets)].append((slot, generation))
+
+    def advance(self, now: float) -> Iterable[Tuple[int, int]]:
+        """Yield entries of every bucket passed since the last call"""
+        end = int(now // self.tick)
+        size = len(self.buckets)
+        # After a long pause every bucket is due at most once
+        steps = min(end - self.cursor, size)
+        for _ in range(steps):
+            self.cursor += 1
+            bucket = self.buckets[self.cursor % size]
+            if bucket:
+                self.buckets[self.cursor % size] = []
+                yield from bucket
+        self.cursor = max(self.cursor, end)
+        self.now = now
+
+
+class HeartbeatMonitor:
+    """
+    In-memory heartbeat table for thousands of agents
+
+    Heartbeats, whether streamed or batched, only update array columns:
+    last arrival, an exponentially weighted mean and variance of the
+    inter-arrival time, reported status and load. Each agent has one entry
+    in a timing wheel at the time its phi would cross ``threshold``;
+    ``tick`` expires silent agents as OFFLINE. Nothing is written per
+    heartbeat: only status changes are queued, for ``drain_transitions``
+    to persist in one batch.
+    """
+
+    def __init__(self,
+                 expected_interval: float = 5.0,
+                 threshold: float = 8.0,
+                 suspect_threshold: float = 3.0,
+                 min_std: float = 0.5,
+                 alpha: float = 0.1,
+                 wheel_tick: float = 0.5,
+                 wheel_size: int = 512,
+                 clock: Callable[[], float] = time.time):
+        """
+        Initialize the heartbeat monitor
+
+        Args:
+            expected_interval: Heartbeat interval assumed for new agents
+            threshold: phi at which an agent is declared OFFLINE
+            suspect_threshold: phi at which health reports "degraded"
+            min_std: Floor on the inter-arrival standard deviation, so very
+                regular agents are not declared dead after one late beat
+            alpha: Weight of the newest interval in the running mean/variance
+            wheel_tick: Timing wheel resolution in seconds
+            wheel_size: Timing wheel buckets
+            clock: Time source, injectable for tests
+        """
+        self.expected_interval = expected_interval
+        self.threshold = threshold
+        self.suspect_threshold = suspect_threshold
+        self.min_std = min_std
+        self.alpha = alpha
+        self.clock = clock
+        self._deviations = _phi_deviations(threshold)
+
+        self._slots: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._last = array("d")
+        self._mean = array("d")
+        self._var = array("d")
+        self._cpu = array("f")
+        self._memory = array("f")
+        self._active = array("i")
+        self._status = array("b")
+        self._generation = array("L")
+        self._wheel = _TimingWheel(wheel_tick, wheel_size, clock())
+        self._transitions: List[Transition] = []
+
+    # Table maintenance
+
+    def register(self, agent_id: str, status: AgentStatus = AgentStatus.IDLE, now: Optional[float] = None):
+        """Start tracking an agent; its first heartbeat is due one interval from now"""
+        if agent_id in self._slots:
+            return
+        now = self.clock() if now is None else now
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = agent_id
+            self._last[slot] = now
+            self._mean[slot] = self.expected_interval
+            self._var[slot] = (self.expected_interval / 4) ** 2
+            self._cpu[slot] = self._memory[slot] = 0.0
+            self._active[slot] = 0
+            self._status[slot] = status
+            self._generation[slot] += 1
+        else:
+            slot = len(self._ids)
+            self._ids.append(agent_id)
+            self._last.append(now)
+            self._mean.append(self.expected_interval)
+            self._var.append((self.expected_interval / 4) ** 2)
+            self._cpu.append(0.0)
+            self._memory.append(0.0)
+            self._active.append(0)
+            self._status.append(status)
+            self._generation.append(0)
+        self._slots[agent_id] = slot
+        self._arm(slot)
+
+    def deregister(self, agent_id: str) -> bool:
+        """Stop tracking an agent"""
+        slot = self._slots.pop(agent_id, None)
+        if slot is None:
+            return False
+        self._ids[slot] = None
+        self._generation[slot] += 1
+        self._free.append(slot)
+        return True
+
+    def _deadline(self, slot: int) -> float:
+        std = max(math.sqrt(self._var[slot]), self.min_std)
+        return self._last[slot] + self._mean[slot] + self._deviations * std
+
+    def _arm(self, slot: int):
+        self._wheel.schedule(self._deadline(slot), slot, self._generation[slot])
+
+    def _transition(self, slot: int, status: AgentStatus, now: float):
+        old = AgentStatus(self._status[slot])
+        if old != status:
+            self._status[slot] = status
+            self._transitions.append((self._ids[slot], old, status, now))
+
+    # Ingest
+
+    def record(self,
+               agent_id: str,
+               status: Optional[AgentStatus] = None,
+               cpu_percent: Optional[float] = None,
+               memory_percent: Optional[float] = None,
+               active_tasks: Optional[int] = None,
+               now: Optional[float] = None):
+        """Apply one heartbeat; unknown agents are registered on first contact"""
+        now = self.clock() if now is None else now
+        slot = self._slots.get(agent_id)
+        if slot is None:
+            self.register(agent_id, status or AgentStatus.IDLE, now)
+            slot = self._slots[agent_id]
+        else:
+            interval = now - self._last[slot]
+            if interval <= 0:
+                # Coalesce duplicates that arrive in the same instant
+                interval = None
+            elif self._status[slot] == AgentStatus.OFFLINE:
+                # The silence that got the agent expired is not a sample
+                interval = None
+            if interval is not None:
+                delta = interval - self._mean[slot]
+                self._mean[slot] += self.alpha * delta
+                self._var[slot] = (1 - self.alpha) * (self._var[slot] + self.alpha * delta * delta)
+            self._last[slot] = max(now, self._last[slot])
+
+        if cpu_percent is not None:
+            self._cpu[slot] = cpu_percent
+        if memory_percent is not None:
+            self._memory[slot] = memory_percent
+        if active_tasks is not None:
+            self._active[slot] = active_tasks
+
+        was_offline = self._status[slot] == AgentStatus.OFFLINE
+        if status:
+            self._transition(slot, AgentStatus(status), now)
+        elif was_offline:
+            self._transition(slot, AgentStatus.IDLE, now)
+
+        # Otherwise the wheel entry is left in place; it re-arms itself when
+        # it fires before the new deadline, so a heartbeat costs no insert
+        if was_offline and self._status[slot] != AgentStatus.OFFLINE:
+            self._generation[slot] += 1
+            self._arm(slot)
+
+    def record_heartbeat(self, heartbeat: Any, now: Optional[float] = None):
+        """Apply a Heartbeat protobuf"""
+        resources = heartbeat.resources if heartbeat.HasField("resources") else None
+        self.record(
+            heartbeat.agent_id,
+            status=AgentStatus(heartbeat.status) or None,
+            cpu_percent=resources.cpu_usage_percent if resources else None,
+            memory_percent=resources.memory_usage_percent if resources else None,
+            active_tasks=heartbeat.active_tasks,
+            now=now,
+        )
+
+    def record_batch(self, batch: Any):
+        """Apply a HeartbeatBatch (ReportHeartbeats) under one clock reading"""
+        now = self.clock()
+        for heartbeat in batch.heartbeats:
+            self.record_heartbeat(heartbeat, now)
+
+    async def consume_stream(self, heartbeats: AsyncIterator[Any]):
+        """Apply heartbeats from a StreamHeartbeats call until the agent closes it"""
+        async for heartbeat in heartbeats:
+            self.record_heartbeat(heartbeat)
+
+    # Detection
+
+    def tick(self, now: Optional[float] = None) -> List[str]:
+        """
+        Expire agents whose phi crossed the threshold
+
+        Call periodically (every ``wheel_tick`` seconds). Returns the agents
+        declared OFFLINE by this call.
+        """
+        now = self.clock() if now is None else now
+        expired = []
+        rearm = []
+        for slot, generation in self._wheel.advance(now):
+            if self._generation[slot] != generation or self._ids[slot] is None:
+                continue
+            if self._status[slot] == AgentStatus.OFFLINE:
+                # Parked until the next heartbeat re-arms it
+                continue
+            if self._deadline(slot) > now:
+                rearm.append(slot)
+                continue
+            self._transition(slot, AgentStatus.OFFLINE, now)
+            expired.append(self._ids[slot])
+        for slot in rearm:
+            self._arm(slot)
+        return expired
+
+    def phi(self, agent_id: str, now: Optional[float] = None) -> float:
+        """Current suspicion level of an agent"""
+        slot = self._slots[agent_id]
+        now = self.clock() if now is None else now
+        std = max(math.sqrt(self._var[slot]), self.min_std)
+        return phi(now - self._last[slot], self._mean[slot], std)
+
+    def health(self, agent_id: str, now: Optional[float] = None) -> str:
+        """AgentHealth.status: "healthy", "degraded" or "unhealthy" """
+        value = self.phi(agent_id, now)
+        if value >= self.threshold:
+            return "unhealthy"
+        if value >= self.suspect_threshold:
+            return "degraded"
+        return "healthy"
+
+    def status(self, agent_id: str) -> AgentStatus:
+        return AgentStatus(self._status[self._slots[agent_id]])
+
+    def last_heartbeat(self, agent_id: str) -> float:
+        return self._last[self._slots[agent_id]]
+
+    def load(self, agent_id: str) -> Dict[str, float]:
+        slot = self._slots[agent_id]
+        return {"cpu_percent": self._cpu[slot], "memory_percent": self._memory[slot],
+                "active_tasks": self._active[slot]}
+
+    def drain_transitions(self) -> List[Transition]:
+        """Status changes since the last call, for one durable batch write"""
+        transitions, self._transitions = self._transitions, []
+        return transitions
+
+    def __contains__(self, agent_id: str) -> bool:
+        return agent_id in self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+
+# Benchmark
+def main():
+    """Simulate 10k agents heartbeating every 5s for 10 minutes with 1% failures"""
+    import random
+
+    n_agents = 10_000
+    interval = 5.0
+    duration = 600.0
+    clock = [0.0]
+    monitor = HeartbeatMonitor(expected_interval=interval, clock=lambda: clock[0])
+    for i in range(n_agents):
+        monitor.register(f"agent-{i}")
+
+    # Agents start out of phase; 1% die halfway through
+    next_beat = [random.uniform(0, interval) for _ in range(n_agents)]
+    dies_at = {i: duration / 2 for i in random.sample(range(n_agents), n_agents // 100)}
+    detected = {}
+
+    heartbeats = 0
+    ingest_time = tick_time = 0.0
+    step = 0.5
+    while clock[0] < duration:
+        clock[0] += step
+        start = time.perf_counter()
+        for i in range(n_agents):
+            while next_beat[i] <= clock[0]:
+                if dies_at.get(i, math.inf) > next_beat[i]:
+                    monitor.record(f"agent-{i}", cpu_percent=50.0, now=next_beat[i])
+                    heartbeats += 1
+                next_beat[i] += random.gauss(interval, 0.2)
+        ingest_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        for agent_id in monitor.tick():
+            detected.setdefault(agent_id, clock[0])
+        tick_time += time.perf_counter() - start
+
+    transitions = monitor.drain_transitions()
+    latencies = sorted(detected[f"agent-{i}"] - dies_at[i] for i in dies_at if f"agent-{i}" in detected)
+    false_positives = sum(1 for agent_id in detected if int(agent_id.split("-")[1]) not in dies_at)
+    print(f"{heartbeats} heartbeats: {ingest_time / heartbeats * 1e6:.2f} µs/heartbeat, "
+          f"wheel ticks {tick_time / (duration / step) * 1e3:.3f} ms/tick")
+    print(f"Detected {len(latencies)}/{len(dies_at)} failures, median detection "
+          f"{latencies[len(latencies) // 2]:.1f}s after death, {false_positives} false positives")
+    print(f"Durable writes: {len(transitions)} transitions instead of {heartbeats} heartbeat rows")
+
+
+if __name__ == "__main__":
+    main()
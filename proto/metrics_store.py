@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Metrics Rollup Store for GetMetrics
+Multi-resolution ring buffers, mergeable histograms and fleet-wide aggregates
+"""
+
+import bisect
+import logging
+import math
+import time
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+
+# (bucket seconds, buckets kept): 15 minutes at 10s, 2 hours at 1m, 1 day at 10m
+DEFAULT_RESOLUTIONS = ((10, 90), (60, 120), (600, 144))
+
+
+class HistogramAggregate:
+    """
+    Histogram with fixed upper bounds that merges by adding counts
+
+    ``counts[i]`` is the number of observations in (bounds[i-1], bounds[i]];
+    the last bucket is open-ended when the final bound is +Inf.
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float], counts: Optional[Sequence[int]] = None,
+                 total: float = 0.0, count: int = 0):
+        self.bounds = tuple(bounds)
+        self.counts = list(counts) if counts is not None else [0] * len(self.bounds)
+        self.sum = total
+        self.count = count
+
+    def merge(self, other: "HistogramAggregate") -> "HistogramAggregate":
+        """Add another histogram's observations in place"""
+        if other.bounds != self.bounds:
+            raise ValueError("Cannot merge histograms with different bucket bounds")
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.sum += other.sum
+        self.count += other.count
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        total = sum(self.counts)
+        if not total:
+            return math.nan
+        rank = q * total
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                upper = self.bounds[i]
+                lower = self.bounds[i - 1] if i else 0.0
+                if math.isinf(upper):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / c
+            seen += c
+        return self.bounds[-1]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Fields of the Histogram message"""
+        return {"buckets": list(self.bounds), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+
+class _Ring:
+    """
+    One resolution of one series
+
+    Slot ``i`` holds bucket number ``starts[i]`` (bucket start divided by the
+    step); a write to a slot still holding an older bucket resets it first.
+    Values are kept in flat arrays: ``width`` doubles per slot.
+    """
+
+    __slots__ = ("step", "size", "width", "starts", "values")
+
+    def __init__(self, step: int, size: int, width: int):
+        self.step = step
+        self.size = size
+        self.width = width
+        self.starts = array("q", [-1]) * size
+        self.values = array("d", [0.0]) * (size * width)
+
+    def slot(self, ts: float) -> int:
+        """Offset into ``values`` for the bucket holding ``ts``, reset if stale"""
+        bucket = int(ts // self.step)
+        index = bucket % self.size
+        offset = index * self.width
+        if self.starts[index] != bucket:
+            if self.starts[index] > bucket:
+                # Older than the ring's retention
+                return -1
+            self.starts[index] = bucket
+            for k in range(offset, offset + self.width):
+                self.values[k] = 0.0
+        return offset
+
+    def buckets(self, start: float, end: float) -> Iterable[Tuple[float, int]]:
+        """(bucket start time, value offset) for retained buckets in [start, end]"""
+        first = max(int(start // self.step), int(end // self.step) - self.size + 1)
+        for bucket in range(first, int(end // self.step) + 1):
+            index = bucket % self.size
+            if self.starts[index] == bucket:
+                yield bucket * self.step, index * self.width
+
+
+class _Series:
+    """
+    One metric of one agent (or of the whole fleet) at every resolution
+
+    Per-bucket layout: counters keep the increase; gauges keep count, sum,
+    min, max and last; histograms keep sum, count and one count per bound.
+    """
+
+    __slots__ = ("kind", "bounds", "rings", "previous")
+
+    def __init__(self, kind: str, resolutions: Sequence[Tuple[int, int]], bounds: Tuple[float, ...] = ()):
+        self.kind = kind
+        self.bounds = bounds
+        if kind == COUNTER:
+            width = 1
+        elif kind == GAUGE:
+            width = 5
+        else:
+            width = 2 + len(bounds)
+        self.rings = [_Ring(step, size, width) for step, size in resolutions]
+        # Last cumulative report, to turn counters and histograms into deltas
+        self.previous: Any = None
+
+    def add_counter(self, delta: float, ts: float):
+        for ring in self.rings:
+            offset = ring.slot(ts)
+            if offset >= 0:
+                ring.values[offset] += delta
+
+    def add_gauge(self, value: float, ts: float):
+        for ring in self.rings:
+            offset = ring.slot(ts)
+            if offset < 0:
+                continue
+            v = ring.values
+            if v[offset] == 0:
+                v[offset + 2] = v[offset + 3] = value
+            else:
+                v[offset + 2] = min(v[offset + 2], value)
+                v[offset + 3] = max(v[offset + 3], value)
+            v[offset] += 1
+            v[offset + 1] += value
+            v[offset + 4] = value
+
+    def add_histogram(self, counts: Sequence[float], total: float, count: float, ts: float):
+        for ring in self.rings:
+            offset = ring.slot(ts)
+            if offset < 0:
+                continue
+            v = ring.values
+            v[offset] += total
+            v[offset + 1] += count
+            for i, c in enumerate(counts, offset + 2):
+                v[i] += c
+
+
+class MetricsStore:
+    """
+    Time-series store behind GetMetrics
+
+    Every sample is folded into fixed-size ring buffers at each resolution
+    (10s, 1m and 10m by default) for its agent, and into a fleet-wide series
+    of the same metric. Counters and histograms are reported cumulatively
+    (as in the Metrics message) and stored as per-bucket increases, so any
+    range is a sum of buckets; histograms with equal bounds merge by adding
+    counts. Range queries read the finest resolution that still covers the
+    range, so cost depends on the number of buckets, never on raw samples.
+    """
+
+    def __init__(self,
+                 resolutions: Sequence[Tuple[int, int]] = DEFAULT_RESOLUTIONS,
+                 clock: Callable[[], float] = time.time):
+        """
+        Initialize the store
+
+        Args:
+            resolutions: (bucket seconds, buckets kept) per tier, finest first
+            clock: Wall-clock time source, injectable for tests
+        """
+        self.resolutions = tuple(sorted(resolutions))
+        self.clock = clock
+        # (agent_id, metric) -> series; agent_id None is the fleet rollup
+        self._series: Dict[Tuple[Optional[str], str], _Series] = {}
+
+    def _get_series(self, agent_id: Optional[str], name: str, kind: str,
+                    bounds: Tuple[float, ...] = ()) -> _Series:
+        series = self._series.get((agent_id, name))
+        if series is None:
+            series = self._series[(agent_id, name)] = _Series(kind, self.resolutions, bounds)
+        elif series.kind != kind:
+            raise ValueError(f"Metric {name} is a {series.kind}, not a {kind}")
+        elif kind == HISTOGRAM and series.bounds != bounds:
+            raise ValueError(f"Histogram {name} changed its bucket bounds")
+        return series
+
+    # Ingest
+
+    def record_counter(self, agent_id: str, name: str, value: float, ts: Optional[float] = None):
+        """Record a cumulative counter value"""
+        ts = self.clock() if ts is None else ts
+        series = self._get_series(agent_id, name, COUNTER)
+        previous = series.previous
+        series.previous = value
+        if previous is None:
+            return
+        # A drop means the agent restarted and the counter began again at 0
+        delta = value - previous if value >= previous else value
+        series.add_counter(delta, ts)
+        self._get_series(None, name, COUNTER).add_counter(delta, ts)
+
+    def record_gauge(self, agent_id: str, name: str, value: float, ts: Optional[float] = None):
+        ts = self.clock() if ts is None else ts
+        self._get_series(agent_id, name, GAUGE).add_gauge(value, ts)
+        self._get_series(None, name, GAUGE).add_gauge(value, ts)
+
+    def record_histogram(self, agent_id: str, name: str, bounds: Sequence[float], counts: Sequence[int],
+                         total: float, count: int, ts: Optional[float] = None):
+        """Record a cumulative histogram"""
+        ts = self.clock() if ts is None else ts
+        bounds = tuple(bounds)
+        series = self._get_series(agent_id, name, HISTOGRAM, bounds)
+        previous = series.previous
+        series.previous = (tuple(counts), total, count)
+        if previous is None:
+            return
+        deltas = [c - p for c, p in zip(counts, previous[0])]
+        if count < previous[2] or any(d < 0 for d in deltas):
+            deltas, d_sum, d_count = list(counts), total, count
+        else:
+            d_sum, d_count = total - previous[1], count - previous[2]
+        series.add_histogram(deltas, d_sum, d_count, ts)
+        self._get_series(None, name, HISTOGRAM, bounds).add_histogram(deltas, d_sum, d_count, ts)
+
+    def ingest(self, metrics: Any):
+        """Record every value of a Metrics protobuf"""
+        ts = metrics.timestamp.ToNanoseconds() / 1e9 if metrics.HasField("timestamp") else self.clock()
+        for name, value in metrics.counters.items():
+            self.record_counter(metrics.agent_id, name, value, ts)
+        for name, value in metrics.gauges.items():
+            self.record_gauge(metrics.agent_id, name, value, ts)
+        for name, histogram in metrics.histograms.items():
+            self.record_histogram(metrics.agent_id, name, histogram.buckets, histogram.counts,
+                                  histogram.sum, histogram.count, ts)
+
+    def forget_agent(self, agent_id: str) -> int:
+        """Drop an agent's series; its contribution to fleet rollups stays"""
+        keys = [key for key in self._series if key[0] == agent_id]
+        for key in keys:
+            del self._series[key]
+        return len(keys)
+
+    # Queries
+
+    def _ring_for(self, series: _Series, start: float, now: float) -> _Ring:
+        for ring in series.rings:
+            if now - start <= ring.step * ring.size:
+                return ring
+        return series.rings[-1]
+
+    def query(self, name: str, start: float, end: float, agent_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Points and a rollup for one metric over [start, end]
+
+        ``agent_id`` None queries the fleet-wide series. Returns None for
+        unknown series. Points are (bucket start, value): the increase for
+        counters, (min, avg, max, last) for gauges, a HistogramAggregate for
+        histograms. The rollup merges every point of the range.
+        """
+        series = self._series.get((agent_id, name))
+        if series is None:
+            return None
+        ring = self._ring_for(series, start, max(end, self.clock()))
+        v = ring.values
+        points: List[Tuple[float, Any]] = []
+
+        if series.kind == COUNTER:
+            for ts, offset in ring.buckets(start, end):
+                points.append((ts, v[offset]))
+            rollup: Dict[str, Any] = {"increase": sum(p[1] for p in points)}
+        elif series.kind == GAUGE:
+            count = total = 0.0
+            low, high, last = math.inf, -math.inf, math.nan
+            for ts, offset in ring.buckets(start, end):
+                n = v[offset]
+                if not n:
+                    continue
+                points.append((ts, (v[offset + 2], v[offset + 1] / n, v[offset + 3], v[offset + 4])))
+                count += n
+                total += v[offset + 1]
+                low = min(low, v[offset + 2])
+                high = max(high, v[offset + 3])
+                last = v[offset + 4]
+            rollup = {"min": low if count else math.nan, "max": high if count else math.nan,
+                      "avg": total / count if count else math.nan, "last": last, "samples": int(count)}
+        else:
+            merged = HistogramAggregate(series.bounds)
+            width = len(series.bounds)
+            for ts, offset in ring.buckets(start, end):
+                bucket = HistogramAggregate(series.bounds, [int(c) for c in v[offset + 2:offset + 2 + width]],
+                                            v[offset], int(v[offset + 1]))
+                points.append((ts, bucket))
+                merged.merge(bucket)
+            rollup = {"histogram": merged, "p50": merged.quantile(0.5), "p95": merged.quantile(0.95),
+                      "p99": merged.quantile(0.99)}
+
+        return {"kind": series.kind, "resolution": ring.step, "points": points, "rollup": rollup}
+
+    def get_metrics(self, agent_id: str, metric_names: Iterable[str] = (),
+                    start: Optional[float] = None, end: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Metrics message fields for one agent over a time range
+
+        An empty ``agent_id`` returns fleet-wide rollups. Counters report the
+        increase over the range, gauges the average, histograms the merged
+        distribution. Without ``metric_names`` every metric of the agent is
+        returned; without ``start`` the range is the last finest-tier window.
+        """
+        end = self.clock() if end is None else end
+        start = end - self.resolutions[0][0] * self.resolutions[0][1] if start is None else start
+        key = agent_id or None
+        names = list(metric_names) or sorted(name for owner, name in self._series if owner == key)
+
+        result: Dict[str, Any] = {"agent_id": agent_id, "timestamp": end, "counters": {}, "gauges": {},
+                                  "histograms": {}}
+        for name in names:
+            answer = self.query(name, start, end, key)
+            if answer is None:
+                continue
+            rollup = answer["rollup"]
+            if answer["kind"] == COUNTER:
+                result["counters"][name] = rollup["increase"]
+            elif answer["kind"] == GAUGE:
+                if rollup["samples"]:
+                    result["gauges"][name] = rollup["avg"]
+            else:
+                result["histograms"][name] = rollup["histogram"].to_dict()
+        return result
+
+    def get_metrics_request(self, request: Any) -> Dict[str, Any]:
+        """Serve a GetMetricsRequest"""
+        start = request.start_time.ToNanoseconds() / 1e9 if request.HasField("start_time") else None
+        end = request.end_time.ToNanoseconds() / 1e9 if request.HasField("end_time") else None
+        return self.get_metrics(request.agent_id, request.metric_names, start, end)
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+
+# Benchmark
+def main():
+    """Benchmark ingest and range queries for 200 agents reporting every 10s for 2 hours"""
+    import random
+
+    n_agents = 200
+    interval = 10
+    duration = 2 * 3600
+    bounds = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+    clock = [0.0]
+    store = MetricsStore(clock=lambda: clock[0])
+
+    counters = {a: {f"requests_{k}": 0.0 for k in range(4)} for a in range(n_agents)}
+    histograms = {a: [0] * len(bounds) for a in range(n_agents)}
+    writes = 0
+    start = time.perf_counter()
+    for ts in range(0, duration, interval):
+        clock[0] = float(ts)
+        for a in range(n_agents):
+            agent_id = f"agent-{a}"
+            for name in counters[a]:
+                counters[a][name] += random.randint(0, 20)
+                store.record_counter(agent_id, name, counters[a][name], clock[0])
+            for k in range(4):
+                store.record_gauge(agent_id, f"cpu_{k}", random.uniform(0, 100), clock[0])
+            for _ in range(5):
+                histograms[a][bisect.bisect_left(bounds, random.expovariate(10))] += 1
+            store.record_histogram(agent_id, "task_latency_seconds", bounds, histograms[a], 0.0,
+                                   sum(histograms[a]), clock[0])
+            writes += 9
+    ingest_time = time.perf_counter() - start
+    print(f"Ingest: {writes} samples, {ingest_time / writes * 1e6:.2f} µs/sample "
+          f"({len(store)} series incl. fleet rollups)")
+
+    now = clock[0]
+    queries = [
+        ("agent, last 10m", lambda: store.get_metrics("agent-7", (), now - 600, now)),
+        ("agent, last 2h", lambda: store.get_metrics("agent-7", (), now - 7200, now)),
+        ("fleet, last 10m", lambda: store.get_metrics("", (), now - 600, now)),
+        ("fleet, last 2h", lambda: store.get_metrics("", (), now - 7200, now)),
+    ]
+    for name, run in queries:
+        runs = 200
+        start = time.perf_counter()
+        for _ in range(runs):
+            result = run()
+        elapsed = (time.perf_counter() - start) / runs
+        p99 = HistogramAggregate(bounds, result["histograms"]["task_latency_seconds"]["counts"]).quantile(0.99)
+        print(f"{name:>16}: {elapsed * 1e3:.3f} ms, task latency p99 {p99 * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
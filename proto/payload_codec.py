@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Payload Compression and Chunking for the AI Agent Service
+Size-based codec selection, chunked TaskResult uploads and wire/CPU accounting
+"""
+
+import gzip
+import hashlib
+import logging
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+IDENTITY = "identity"
+GZIP = "gzip"
+ZSTD = "zstd"
+
+
+def available_encodings() -> List[str]:
+    """Encodings this process can produce and read, best first"""
+    return ([ZSTD] if zstandard is not None else []) + [GZIP, IDENTITY]
+
+
+def best_encoding() -> str:
+    return available_encodings()[0]
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == IDENTITY:
+        return data
+    if encoding == GZIP:
+        return gzip.compress(data, compresslevel=6 if level is None else level)
+    if encoding == ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd requested but the zstandard package is not installed")
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+    raise ValueError(f"Unknown encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: str, max_size: Optional[int] = None) -> bytes:
+    """Inverse of compress; refuses output larger than max_size"""
+    if encoding == IDENTITY:
+        out = data
+    elif encoding == GZIP:
+        # Bounded, so a small compressed bomb cannot expand without limit
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        out = inflater.decompress(data, 0 if max_size is None else max_size + 1)
+    elif encoding == ZSTD:
+        if zstandard is None:
+            raise ValueError("zstd payload but the zstandard package is not installed")
+        out = zstandard.ZstdDecompressor().decompress(data, max_output_size=max_size or 0)
+    else:
+        raise ValueError(f"Unknown encoding: {encoding}")
+    if max_size is not None and len(out) > max_size:
+        raise ValueError(f"Payload of {len(out)} bytes exceeds the {max_size} byte limit")
+    return out
+
+
+class WireStats:
+    """
+    Payload and wire byte counts plus compression CPU time
+
+    Unary calls are counted by serialized message size: when gRPC
+    compresses them the channel does not expose the frame size or CPU
+    spent. Chunked uploads are compressed here, so their wire bytes and
+    CPU time are exact.
+    """
+
+    __slots__ = ("payload_sent", "payload_received", "compressed_calls",
+                 "uploads", "upload_payload", "upload_wire", "compress_cpu")
+
+    def __init__(self):
+        self.payload_sent = 0
+        self.payload_received = 0
+        self.compressed_calls = 0
+        self.uploads = 0
+        self.upload_payload = 0
+        self.upload_wire = 0
+        self.compress_cpu = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "payload_bytes_sent": self.payload_sent,
+            "payload_bytes_received": self.payload_received,
+            "compressed_calls": self.compressed_calls,
+            "chunked_uploads": self.uploads,
+            "upload_payload_bytes": self.upload_payload,
+            "upload_wire_bytes": self.upload_wire,
+            "upload_compression_ratio": self.upload_wire / self.upload_payload if self.upload_payload else None,
+            "compression_cpu_seconds": self.compress_cpu,
+        }
+
+
+def encode_chunks(task_id: str,
+                  payload: bytes,
+                  chunk_size: int = 1 << 20,
+                  encoding: Optional[str] = None,
+                  stats: Optional[WireStats] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Fields of the TaskResultChunk messages carrying payload
+
+    The payload is compressed as a whole, then split; the first chunk
+    carries the encoding and uncompressed size, the last one the SHA-256
+    of the uncompressed payload.
+    """
+    encoding = encoding or best_encoding()
+    start = time.process_time()
+    body = compress(payload, encoding)
+    if len(body) >= len(payload):
+        # Incompressible (already compressed artifacts, binaries)
+        encoding, body = IDENTITY, payload
+    digest = hashlib.sha256(payload).digest()
+    if stats is not None:
+        stats.compress_cpu += time.process_time() - start
+        stats.uploads += 1
+        stats.upload_payload += len(payload)
+        stats.upload_wire += len(body)
+
+    count = max(1, -(-len(body) // chunk_size))
+    for sequence in range(count):
+        chunk = {"task_id": task_id, "sequence": sequence,
+                 "data": body[sequence * chunk_size:(sequence + 1) * chunk_size]}
+        if sequence == 0:
+            chunk["encoding"] = encoding
+            chunk["total_size"] = len(payload)
+        if sequence == count - 1:
+            chunk["sha256"] = digest
+            chunk["last"] = True
+        yield chunk
+
+
+class ChunkAssembler:
+    """
+    Server side of UploadTaskResult: reassembles and verifies one upload
+
+    Chunks must arrive in sequence for a single task; the declared size is
+    checked against max_size before any data is buffered, and the
+    decompressed payload against the declared size and digest.
+    """
+
+    def __init__(self, max_size: int = 256 << 20):
+        self.max_size = max_size
+        self.task_id: Optional[str] = None
+        self.encoding = IDENTITY
+        self.total_size = 0
+        self._parts: List[bytes] = []
+        self._received = 0
+        self._next = 0
+        self.payload: Optional[bytes] = None
+
+    def add(self, chunk: Any) -> Optional[bytes]:
+        """Feed one TaskResultChunk; returns the payload after the last one"""
+        if self.payload is not None:
+            raise ValueError("Chunk after the last chunk")
+        if chunk.sequence != self._next:
+            raise ValueError(f"Expected chunk {self._next}, got {chunk.sequence}")
+        if self._next == 0:
+            if chunk.total_size > self.max_size:
+                raise ValueError(f"Upload of {chunk.total_size} bytes exceeds the {self.max_size} byte limit")
+            self.task_id = chunk.task_id
+            self.encoding = chunk.encoding or IDENTITY
+            self.total_size = chunk.total_size
+        elif chunk.task_id != self.task_id:
+            raise ValueError("Chunks of one upload must share a task_id")
+
+        self._received += len(chunk.data)
+        if self._received > self.max_size:
+            raise ValueError(f"Upload exceeds the {self.max_size} byte limit")
+        self._parts.append(chunk.data)
+        self._next += 1
+        if not chunk.last:
+            return None
+
+        payload = decompress(b"".join(self._parts), self.encoding, max_size=self.total_size)
+        self._parts = []
+        if len(payload) != self.total_size:
+            raise ValueError(f"Upload is {len(payload)} bytes, {self.total_size} declared")
+        if hashlib.sha256(payload).digest() != chunk.sha256:
+            raise ValueError("Upload checksum mismatch")
+        self.payload = payload
+        return payload
+
+    async def consume(self, chunks) -> bytes:
+        """Reassemble a whole UploadTaskResult request stream"""
+        async for chunk in chunks:
+            payload = self.add(chunk)
+            if payload is not None:
+                return payload
+        raise ValueError("Upload ended before the last chunk")
+
+
+# Benchmark
+def main():
+    """Compression ratio and CPU per MB for a code-diff-like TaskResult payload"""
+    import random
+
+    lines = [f"+    result = process_{i}(payload, retries={i % 5})\n" for i in range(2000)]
+    payload = "".join(random.choice(lines) for _ in range(60_000)).encode()
+    print(f"payload {len(payload) / 1e6:.1f} MB")
+    for encoding in available_encodings():
+        stats = WireStats()
+        chunks = list(encode_chunks("task-1", payload, encoding=encoding, stats=stats))
+        print(f"{encoding:>8}: {stats.upload_wire / 1e6:6.2f} MB on the wire in {len(chunks)} chunks, "
+              f"{stats.compress_cpu / (len(payload) / 1e6) * 1e3:.1f} ms CPU per MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Request Coalescing for the AI Agent Client
+Single-flight deduplication and windowed batching of keyed lookups
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fetches many keys in one call; keys absent from the result do not exist
+BatchFetch = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class BatchLoader:
+    """
+    Coalesces concurrent lookups into batched calls
+
+    A key already waiting or in flight is never requested again: later
+    callers share the first caller's result (single-flight). Distinct keys
+    requested within ``window`` seconds of each other go out as one fetch,
+    split at ``max_batch`` keys. Results are not cached past the call that
+    produced them, so a lookup never sees data older than its own request.
+    """
+
+    def __init__(self, fetch: BatchFetch, window: float = 0.002, max_batch: int = 500):
+        """
+        Initialize the loader
+
+        Args:
+            fetch: Coroutine mapping a list of keys to {key: value}
+            window: Seconds to gather keys before fetching
+            max_batch: Most keys per fetch
+        """
+        self.fetch = fetch
+        self.window = window
+        self.max_batch = max_batch
+
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._pending: List[Hashable] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+        self.stats = {"requests": 0, "coalesced": 0, "batches": 0, "keys_fetched": 0}
+
+    async def load(self, key: Hashable) -> Any:
+        """Value for key; raises KeyError if the fetch did not return it"""
+        self.stats["requests"] += 1
+        future = self._futures.get(key)
+        if future is None:
+            future = self._enqueue(key)
+        else:
+            self.stats["coalesced"] += 1
+        # A cancelled caller must not cancel the lookup other callers share
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        """Values for keys in order; raises KeyError for the first missing key"""
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def _enqueue(self, key: Hashable) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Retrieve the exception even if every caller was cancelled
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._futures[key] = future
+        self._pending.append(key)
+
+        if len(self._pending) >= self.max_batch:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._dispatch)
+        return future
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        keys, self._pending = self._pending, []
+        for start in range(0, len(keys), self.max_batch):
+            task = asyncio.ensure_future(self._run(keys[start:start + self.max_batch]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, keys: List[Hashable]):
+        self.stats["batches"] += 1
+        self.stats["keys_fetched"] += len(keys)
+        try:
+            values = await self.fetch(keys)
+        except asyncio.CancelledError:
+            for key in keys:
+                self._futures.pop(key).cancel()
+            raise
+        except Exception as e:
+            for key in keys:
+                future = self._futures.pop(key)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key in keys:
+            future = self._futures.pop(key)
+            if future.done():
+                continue
+            if key in values:
+                future.set_result(values[key])
+            else:
+                future.set_exception(KeyError(key))
+
+
+# Benchmark
+def main():
+    """Round trips for 1000 concurrent lookups over 200 distinct ids"""
+    import random
+    import time
+
+    round_trip = 0.005
+    calls = []
+
+    async def fetch(keys):
+        calls.append(len(keys))
+        await asyncio.sleep(round_trip)
+        return {key: {"id": key} for key in keys}
+
+    async def individually(ids):
+        async def one(key):
+            calls.append(1)
+            await asyncio.sleep(round_trip)
+            return {"id": key}
+        return await asyncio.gather(*(one(key) for key in ids))
+
+    async def coalesced(ids):
+        loader = BatchLoader(fetch)
+        return await loader.load_many(ids)
+
+    ids = [f"agent-{random.randrange(200)}" for _ in range(1000)]
+    for label, run in (("individual", individually), ("coalesced", coalesced)):
+        calls.clear()
+        start = time.perf_counter()
+        asyncio.run(run(ids))
+        elapsed = time.perf_counter() - start
+        print(f"{label:>10}: {len(calls)} calls, {sum(calls)} keys fetched, {elapsed * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
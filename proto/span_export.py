@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Span Export Setup shared by the AI Agent Service and the CrewAI API
+Tracer provider installation with head sampling, JSON lines file and OTLP exporters
+
+proto/span_export.py is the source; infra/crewai/span_export.py is a
+vendored copy kept identical by tests/test_vendored_modules.py.
+"""
+
+import logging
+import os
+import threading
+from typing import Optional
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+    from opentelemetry.sdk.trace.sampling import ALWAYS_ON, ParentBased, TraceIdRatioBased
+except ImportError:
+    trace = None
+    SpanExporter = object
+
+logger = logging.getLogger(__name__)
+
+# Share of new traces recorded when spans only go to a file. Spans sent to
+# an OTLP collector are all recorded by default: the collector tail-samples
+# (errors, slow traces and a baseline share), and a head-sampled stream
+# would hide 90% of the errors and slow traces from those policies.
+# Requests carrying a sampled parent are always recorded, so traces
+# started upstream stay whole.
+DEFAULT_SAMPLE_RATIO = 0.1
+
+
+def tracing_available() -> bool:
+    """Whether the OpenTelemetry API and SDK are installed"""
+    return trace is not None
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a file, one JSON object per line, for offline analysis"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        # One write per batch, so processes sharing a file do not interleave lines
+        lines = "".join(span.to_json(indent=None) + "\n" for span in spans)
+        with self._lock:
+            if self._file.closed:
+                return SpanExportResult.FAILURE
+            self._file.write(lines)
+            self._file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+def configure_tracing(service_name: str,
+                      sample_ratio: Optional[float] = None,
+                      file_path: Optional[str] = None,
+                      otlp_endpoint: Optional[str] = None) -> Optional["TracerProvider"]:
+    """
+    Install the global tracer provider; None if OpenTelemetry is not installed
+
+    Args:
+        service_name: service.name resource attribute
+        sample_ratio: Share of new traces recorded (OTEL_TRACES_SAMPLER_ARG);
+            defaults to every trace with an OTLP endpoint, otherwise
+            DEFAULT_SAMPLE_RATIO
+        file_path: JSON lines file receiving every recorded span
+            (OTEL_TRACES_FILE); "{pid}" is replaced by the process id
+        otlp_endpoint: OTLP/gRPC collector address (OTEL_EXPORTER_OTLP_ENDPOINT)
+    """
+    if not tracing_available():
+        logger.warning("opentelemetry-sdk is not installed; tracing disabled")
+        return None
+    file_path = file_path or os.getenv("OTEL_TRACES_FILE")
+    otlp_endpoint = otlp_endpoint or os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+    if sample_ratio is None:
+        sample_ratio = float(os.getenv("OTEL_TRACES_SAMPLER_ARG", 1.0 if otlp_endpoint else DEFAULT_SAMPLE_RATIO))
+
+    root = ALWAYS_ON if sample_ratio >= 1.0 else TraceIdRatioBased(sample_ratio)
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}),
+                              sampler=ParentBased(root))
+    if file_path:
+        provider.add_span_processor(BatchSpanProcessor(JsonLinesSpanExporter(file_path.format(pid=os.getpid()))))
+    if otlp_endpoint:
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=otlp_endpoint, insecure=True)))
+    trace.set_tracer_provider(provider)
+    logger.info(f"Tracing {service_name} at sample ratio {sample_ratio}"
+                f"{f', file {file_path}' if file_path else ''}{f', OTLP {otlp_endpoint}' if otlp_endpoint else ''}")
+    return provider
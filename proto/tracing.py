@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Distributed Tracing for the AI Agent Service
+OpenTelemetry gRPC client and server interceptors propagating W3C trace context
+"""
+
+import asyncio
+import inspect
+import logging
+from typing import Any, Dict, Optional, Sequence
+
+import grpc
+from grpc import aio
+
+# Provider setup is shared with the CrewAI API and re-exported here
+from span_export import DEFAULT_SAMPLE_RATIO, JsonLinesSpanExporter, configure_tracing, tracing_available
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+
+def _method_name(method: Any) -> str:
+    """"/pkg.Service/Method" as "pkg.Service/Method" """
+    return (method.decode() if isinstance(method, bytes) else method).lstrip("/")
+
+
+def _rpc_attributes(name: str) -> Dict[str, str]:
+    service, _, method = name.partition("/")
+    return {"rpc.system": "grpc", "rpc.service": service, "rpc.method": method}
+
+
+def _end(span, code: "grpc.StatusCode", error: Optional[BaseException] = None):
+    if span.is_recording():
+        span.set_attribute("rpc.grpc.status_code", code.value[0])
+        if error is not None:
+            span.record_exception(error)
+        if code != grpc.StatusCode.OK:
+            span.set_status(Status(StatusCode.ERROR, code.name))
+    span.end()
+
+
+def _error_code(error: BaseException) -> "grpc.StatusCode":
+    if isinstance(error, aio.AioRpcError):
+        return error.code()
+    if isinstance(error, asyncio.CancelledError):
+        return grpc.StatusCode.CANCELLED
+    return grpc.StatusCode.UNKNOWN
+
+
+class TracingClientInterceptor(aio.UnaryUnaryClientInterceptor,
+                               aio.UnaryStreamClientInterceptor,
+                               aio.StreamUnaryClientInterceptor):
+    """
+    Client span per RPC attempt, with its context sent as traceparent metadata
+
+    Retries are separate spans under the caller's current span. The
+    context is propagated even for unsampled spans, so the service makes
+    the same sampling decision as the client. Streaming responses are
+    timed until the stream is drained.
+    """
+
+    def __init__(self, tracer_provider: Optional[Any] = None):
+        self.tracer = trace.get_tracer(__name__, tracer_provider=tracer_provider)
+
+    def _start(self, details: aio.ClientCallDetails):
+        name = _method_name(details.method)
+        span = self.tracer.start_span(name, kind=SpanKind.CLIENT, attributes=_rpc_attributes(name))
+        carrier: Dict[str, str] = {}
+        propagate.inject(carrier, context=trace.set_span_in_context(span))
+        metadata = aio.Metadata(*(details.metadata or ()), *carrier.items())
+        return span, details._replace(metadata=metadata)
+
+    async def _unary_response(self, continuation, details, request):
+        span, details = self._start(details)
+        try:
+            call = await continuation(details, request)
+            await call
+        except BaseException as e:
+            _end(span, _error_code(e), e)
+            raise
+        _end(span, grpc.StatusCode.OK)
+        return call
+
+    async def intercept_unary_unary(self, continuation, client_call_details, request):
+        return await self._unary_response(continuation, client_call_details, request)
+
+    async def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        return await self._unary_response(continuation, client_call_details, request_iterator)
+
+    async def intercept_unary_stream(self, continuation, client_call_details, request):
+        span, details = self._start(client_call_details)
+        try:
+            call = await continuation(details, request)
+        except BaseException as e:
+            _end(span, _error_code(e), e)
+            raise
+
+        async def responses():
+            try:
+                async for response in call:
+                    yield response
+            except BaseException as e:
+                _end(span, _error_code(e), e)
+                raise
+            _end(span, grpc.StatusCode.OK)
+
+        return responses()
+
+
+def client_interceptors() -> Sequence[aio.ClientInterceptor]:
+    """Interceptors for aio channels; empty when OpenTelemetry is not installed"""
+    return [TracingClientInterceptor()] if tracing_available() else []
+
+
+class TracingServerInterceptor(aio.ServerInterceptor):
+    """
+    Server span per RPC, continuing the trace in the traceparent metadata
+
+    Wraps the handlers of the AIAgentService implementation, so agent time
+    spent in a method shows up under the client's span for the call.
+    """
+
+    def __init__(self, tracer_provider: Optional[Any] = None):
+        self.tracer = trace.get_tracer(__name__, tracer_provider=tracer_provider)
+
+    def _span(self, details: grpc.HandlerCallDetails):
+        name = _method_name(details.method)
+        parent = propagate.extract({key: value for key, value in details.invocation_metadata or ()
+                                    if isinstance(value, str)})
+        return self.tracer.start_as_current_span(name, context=parent, kind=SpanKind.SERVER,
+                                                 attributes=_rpc_attributes(name))
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        kind = ("stream" if handler.request_streaming else "unary") + "_" + \
+               ("stream" if handler.response_streaming else "unary")
+        behavior = getattr(handler, kind)
+
+        if inspect.isasyncgenfunction(behavior):
+            async def traced(request, context):
+                with self._span(handler_call_details):
+                    async for response in behavior(request, context):
+                        yield response
+        else:
+            async def traced(request, context):
+                with self._span(handler_call_details):
+                    return await behavior(request, context)
+
+        return handler._replace(**{kind: traced})
+
+
+# Benchmark
+def main():
+    """Client interceptor cost per unary call, by sample ratio, against a no-op continuation"""
+    import time
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor, SpanExporter, SpanExportResult
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    class DiscardExporter(SpanExporter):
+        def export(self, spans):
+            return SpanExportResult.SUCCESS
+
+    class Call:
+        def __await__(self):
+            return iter(())
+
+    async def continuation(details, request):
+        return Call()
+
+    async def bench(interceptor, n):
+        details = aio.ClientCallDetails("/ai_agent.AIAgentService/GetAgent", 30.0, None, None, None)
+        start = time.perf_counter()
+        for _ in range(n):
+            if interceptor is None:
+                await (await continuation(details, None))
+            else:
+                await interceptor.intercept_unary_unary(continuation, details, None)
+        return (time.perf_counter() - start) / n
+
+    n = 50_000
+    bare = asyncio.run(bench(None, n))
+    print(f"    no interceptor: {bare * 1e6:6.2f} µs/call")
+    for ratio in (0.0, 0.1, 1.0):
+        provider = TracerProvider(sampler=ParentBased(TraceIdRatioBased(ratio)))
+        provider.add_span_processor(SimpleSpanProcessor(DiscardExporter()))
+        measured = asyncio.run(bench(TracingClientInterceptor(provider), n))
+        print(f"sample ratio {ratio:5}: {measured * 1e6:6.2f} µs/call, overhead {(measured - bare) * 1e6:6.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Client Saturation Monitor for AI Agents Scaling Tests
+Samples event-loop lag, client CPU, open sockets and pending tasks
+"""
+
+import asyncio
+import logging
+import os
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Verdicts
+HEALTHY = "HEALTHY"
+SATURATED = "SATURATED"  # Results usable but the client was under pressure
+INVALID = "INVALID"      # Client was the bottleneck; latencies are not trustworthy
+
+
+def _count_open_sockets() -> Optional[int]:
+    """Count sockets held by this process (Linux only)"""
+    fd_dir = "/proc/self/fd"
+    try:
+        count = 0
+        for fd in os.listdir(fd_dir):
+            try:
+                if os.readlink(os.path.join(fd_dir, fd)).startswith("socket:"):
+                    count += 1
+            except OSError:
+                continue
+        return count
+    except OSError:
+        return None
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(pct / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class ClientMonitor:
+    """
+    Periodically sample the health of the single-process asyncio load client
+
+    Event-loop lag is how late a periodic timer fires; when it grows, every
+    latency the harness measures includes the harness's own scheduling delay.
+    """
+
+    def __init__(self,
+                 interval: float = 0.1,
+                 lag_warn: float = 0.02,
+                 lag_invalid: float = 0.1,
+                 cpu_warn: float = 80.0,
+                 cpu_invalid: float = 95.0,
+                 latency_share_invalid: float = 0.25):
+        """
+        Args:
+            interval: Seconds between samples
+            lag_warn: p95 loop lag (s) above which the run is flagged saturated
+            lag_invalid: p95 loop lag (s) above which the run is invalidated
+            cpu_warn: Median client CPU percent flagged as saturated
+            cpu_invalid: Median client CPU percent that invalidates the run
+            latency_share_invalid: Invalidate when p95 loop lag exceeds this
+                share of the reported median request latency
+        """
+        self.interval = interval
+        self.lag_warn = lag_warn
+        self.lag_invalid = lag_invalid
+        self.cpu_warn = cpu_warn
+        self.cpu_invalid = cpu_invalid
+        self.latency_share_invalid = latency_share_invalid
+
+        self.samples: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._started_at = 0.0
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_wall = time.perf_counter()
+        last_cpu = time.process_time()
+
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - expected, 0.0)
+
+            wall = time.perf_counter()
+            cpu = time.process_time()
+            elapsed = wall - last_wall
+            self.samples.append({
+                "t": wall - self._started_at,
+                "loop_lag": lag,
+                "cpu_percent": 100.0 * (cpu - last_cpu) / elapsed if elapsed > 0 else 0.0,
+                "open_sockets": _count_open_sockets(),
+                "pending_tasks": len(asyncio.all_tasks(loop)),
+            })
+            last_wall, last_cpu = wall, cpu
+
+    def start(self):
+        """Start sampling on the running event loop"""
+        self._started_at = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop sampling"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def __aenter__(self) -> "ClientMonitor":
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregate the samples collected so far"""
+        lags = [s["loop_lag"] for s in self.samples]
+        cpus = [s["cpu_percent"] for s in self.samples]
+        sockets = [s["open_sockets"] for s in self.samples if s["open_sockets"] is not None]
+        tasks = [s["pending_tasks"] for s in self.samples]
+        return {
+            "sample_count": len(self.samples),
+            "loop_lag_mean": statistics.mean(lags) if lags else 0.0,
+            "loop_lag_p95": _percentile(lags, 95),
+            "loop_lag_max": max(lags) if lags else 0.0,
+            "cpu_percent_median": statistics.median(cpus) if cpus else 0.0,
+            "cpu_percent_max": max(cpus) if cpus else 0.0,
+            "open_sockets_max": max(sockets) if sockets else None,
+            "pending_tasks_max": max(tasks) if tasks else 0,
+        }
+
+    def verdict(self, median_latency: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Decide whether the client, not the server, limited the run
+
+        Args:
+            median_latency: Median request latency the test reported, if any
+        """
+        summary = self.summary()
+        reasons = []
+        verdict = HEALTHY
+
+        lag_p95 = summary["loop_lag_p95"]
+        cpu = summary["cpu_percent_median"]
+
+        if lag_p95 >= self.lag_invalid:
+            reasons.append(f"p95 event-loop lag {lag_p95 * 1000:.1f}ms")
+            verdict = INVALID
+        elif lag_p95 >= self.lag_warn:
+            reasons.append(f"p95 event-loop lag {lag_p95 * 1000:.1f}ms")
+            verdict = SATURATED
+
+        if cpu >= self.cpu_invalid:
+            reasons.append(f"client CPU {cpu:.0f}%")
+            verdict = INVALID
+        elif cpu >= self.cpu_warn:
+            reasons.append(f"client CPU {cpu:.0f}%")
+            if verdict == HEALTHY:
+                verdict = SATURATED
+
+        if median_latency and lag_p95 >= self.lag_warn \
+                and lag_p95 > self.latency_share_invalid * median_latency:
+            reasons.append(
+                f"loop lag is {100 * lag_p95 / median_latency:.0f}% of median latency"
+            )
+            verdict = INVALID
+
+        return {"verdict": verdict, "reasons": reasons, **summary}
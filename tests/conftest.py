@@ -0,0 +1,8 @@
+"""
+Make the AI Agent Service modules in proto/ importable from the tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "proto"))
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Phase Scheduler for AI Agents Scaling Tests
+Runs test phases in dependency order with isolation, warm-up and cool-down
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from client_monitor import INVALID, SATURATED, ClientMonitor
+
+logger = logging.getLogger(__name__)
+
+# Isolation levels
+EXCLUSIVE = "exclusive"  # Nothing else runs while this phase runs
+SHARED = "shared"        # May overlap with other shared phases
+
+
+class Phase:
+    """A named test phase and its scheduling constraints"""
+
+    def __init__(self,
+                 name: str,
+                 run: Callable[[], Awaitable[Dict[str, Any]]],
+                 depends_on: Optional[List[str]] = None,
+                 isolation: str = EXCLUSIVE,
+                 warmup: float = 0.0,
+                 cooldown: float = 0.0):
+        """
+        Args:
+            name: Phase name, used for dependencies and in the results
+            run: Zero-argument coroutine function returning the test result
+            depends_on: Phases that must finish successfully first
+            isolation: EXCLUSIVE or SHARED
+            warmup: Idle seconds before the phase so the system under test settles
+            cooldown: Idle seconds after the phase so its load drains
+        """
+        if isolation not in (EXCLUSIVE, SHARED):
+            raise ValueError(f"Unknown isolation level: {isolation}")
+        self.name = name
+        self.run = run
+        self.depends_on = list(depends_on or [])
+        self.isolation = isolation
+        self.warmup = warmup
+        self.cooldown = cooldown
+
+
+class PhaseScheduler:
+    """
+    Run phases in waves
+
+    Each wave is either one exclusive phase or every ready shared phase.
+    A phase whose dependency failed is skipped rather than run against a
+    broken system.
+    """
+
+    def __init__(self, phases: List[Phase]):
+        names = [p.name for p in phases]
+        if len(set(names)) != len(names):
+            raise ValueError("Phase names must be unique")
+        for phase in phases:
+            missing = [d for d in phase.depends_on if d not in names]
+            if missing:
+                raise ValueError(f"Phase {phase.name} depends on unknown phases: {missing}")
+        self.phases = phases
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        by_name = {p.name: p for p in self.phases}
+        state: Dict[str, int] = {}
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == 1:
+                raise ValueError(f"Phase dependency cycle: {' -> '.join(path + [name])}")
+            if state.get(name) == 2:
+                return
+            state[name] = 1
+            for dep in by_name[name].depends_on:
+                visit(dep, path + [name])
+            state[name] = 2
+
+        for phase in self.phases:
+            visit(phase.name, [])
+
+    @staticmethod
+    def _failed(result: Dict[str, Any]) -> bool:
+        return "error" in result or result.get("status") in ("ERROR", "FAILED", "SKIPPED")
+
+    def _next_wave(self, pending: List[Phase], results: Dict[str, Dict[str, Any]]) -> List[Phase]:
+        ready = [p for p in pending if all(d in results for d in p.depends_on)]
+        if not ready:
+            return []
+        if ready[0].isolation == EXCLUSIVE:
+            return [ready[0]]
+        return [p for p in ready if p.isolation == SHARED]
+
+    async def _run_phase(self, phase: Phase) -> Dict[str, Any]:
+        try:
+            return await phase.run()
+        except Exception as e:
+            logger.error(f"Phase {phase.name} raised: {e}")
+            return {"test_name": phase.name, "status": "ERROR", "error": str(e)}
+
+    async def _run_wave(self, wave: List[Phase]) -> List[Dict[str, Any]]:
+        warmup = max(p.warmup for p in wave)
+        if warmup:
+            await asyncio.sleep(warmup)
+
+        monitor = ClientMonitor()
+        monitor.start()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+
+        wave_results = await asyncio.gather(*(self._run_phase(p) for p in wave))
+
+        cpu_time = time.process_time() - cpu_start
+        wall_time = time.perf_counter() - wall_start
+        await monitor.stop()
+
+        names = [p.name for p in wave]
+        for phase, result in zip(wave, wave_results):
+            client = monitor.verdict(
+                median_latency=result.get("p50_latency", result.get("avg_latency")))
+            result["phase"] = {
+                "isolation": phase.isolation,
+                "concurrent_with": [n for n in names if n != phase.name],
+                "wall_time": wall_time,
+                "client_cpu_time": cpu_time,
+                "client_cpu_percent": 100.0 * cpu_time / wall_time if wall_time > 0 else 0.0,
+                "loop_lag_max": client["loop_lag_max"],
+                "loop_lag_mean": client["loop_lag_mean"],
+            }
+            result["client_monitor"] = {**client, "samples": monitor.samples}
+
+            if client["verdict"] == INVALID:
+                logger.warning(f"Phase {phase.name} invalidated, client was the bottleneck: "
+                               f"{'; '.join(client['reasons'])}")
+                result["status"] = "INVALID"
+            elif client["verdict"] == SATURATED:
+                logger.warning(f"Phase {phase.name}: load client under pressure: "
+                               f"{'; '.join(client['reasons'])}")
+
+        cooldown = max(p.cooldown for p in wave)
+        if cooldown:
+            await asyncio.sleep(cooldown)
+        return wave_results
+
+    async def run(self) -> List[Dict[str, Any]]:
+        """Run every phase and return results in declaration order"""
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = list(self.phases)
+
+        while pending:
+            # Skip phases whose dependencies did not succeed
+            for phase in list(pending):
+                failed = [d for d in phase.depends_on if d in results and self._failed(results[d])]
+                if failed:
+                    logger.warning(f"Skipping phase {phase.name}: dependency failed ({', '.join(failed)})")
+                    results[phase.name] = {
+                        "test_name": phase.name,
+                        "status": "SKIPPED",
+                        "reason": f"dependency failed: {', '.join(failed)}",
+                    }
+                    pending.remove(phase)
+
+            wave = self._next_wave(pending, results)
+            if not wave:
+                break
+
+            logger.info(f"Running phase(s): {', '.join(p.name for p in wave)}")
+            for phase, result in zip(wave, await self._run_wave(wave)):
+                results[phase.name] = result
+                pending.remove(phase)
+
+        return [results[p.name] for p in self.phases]
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Probe Executor for AI Agents Scaling Tests
+Runs bounded, concurrent HTTP probes over a shared connection pool
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeExecutor:
+    """
+    Concurrent HTTP prober with a shared connection pool
+
+    All probes go through one aiohttp session, so connections and DNS answers
+    are reused across probes. A semaphore caps the number of probes in flight
+    and every probe gets its own deadline. DNS resolution and connection setup
+    are timed separately from the HTTP exchange using aiohttp trace hooks.
+    """
+
+    def __init__(self,
+                 concurrency: int = 32,
+                 timeout: float = 10.0,
+                 connection_limit: int = 100,
+                 dns_cache_ttl: int = 10):
+        """
+        Initialize the probe executor
+
+        Args:
+            concurrency: Maximum number of probes in flight
+            timeout: Default per-probe deadline in seconds
+            connection_limit: Size of the shared connection pool
+            dns_cache_ttl: Seconds to cache DNS answers inside the pool
+        """
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.connection_limit = connection_limit
+        self.dns_cache_ttl = dns_cache_ttl
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Build trace hooks that timestamp DNS, connect and request phases"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_dns_start(session, ctx, params):
+            ctx.trace_request_ctx["dns_start"] = time.perf_counter()
+
+        async def on_dns_end(session, ctx, params):
+            ctx.trace_request_ctx["dns_end"] = time.perf_counter()
+
+        async def on_dns_cache_hit(session, ctx, params):
+            ctx.trace_request_ctx["dns_cached"] = True
+
+        async def on_connect_start(session, ctx, params):
+            ctx.trace_request_ctx["connect_start"] = time.perf_counter()
+
+        async def on_connect_end(session, ctx, params):
+            ctx.trace_request_ctx["connect_end"] = time.perf_counter()
+
+        async def on_connection_reused(session, ctx, params):
+            ctx.trace_request_ctx["connection_reused"] = True
+
+        trace_config.on_dns_resolvehost_start.append(on_dns_start)
+        trace_config.on_dns_resolvehost_end.append(on_dns_end)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_connection_create_start.append(on_connect_start)
+        trace_config.on_connection_create_end.append(on_connect_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reused)
+        return trace_config
+
+    async def __aenter__(self) -> "ProbeExecutor":
+        connector = aiohttp.TCPConnector(
+            limit=self.connection_limit,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            trace_configs=[self._trace_config()],
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """Close the shared session and its connection pool"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def probe(self,
+                    url: str,
+                    method: str = "GET",
+                    json: Optional[Dict[str, Any]] = None,
+                    timeout: Optional[float] = None,
+                    read_body: bool = False,
+                    read_text: bool = False) -> Dict[str, Any]:
+        """
+        Run a single probe
+
+        Returns a dict with the status code, a DNS verdict and the time spent
+        queueing, resolving, connecting and in the HTTP exchange.
+        """
+        if self._session is None:
+            raise RuntimeError("ProbeExecutor must be used as an async context manager")
+
+        deadline = timeout if timeout is not None else self.timeout
+        trace_ctx: Dict[str, Any] = {}
+        queued_at = time.perf_counter()
+
+        async with self._semaphore:
+            started_at = time.perf_counter()
+            result: Dict[str, Any] = {
+                "url": url,
+                "queue_time": started_at - queued_at,
+            }
+            try:
+                async with self._session.request(
+                    method,
+                    url,
+                    json=json,
+                    timeout=aiohttp.ClientTimeout(total=deadline),
+                    trace_request_ctx=trace_ctx,
+                ) as response:
+                    if read_body:
+                        result["body"] = await response.json(content_type=None)
+                    elif read_text:
+                        result["text"] = await response.text()
+                    else:
+                        await response.read()
+                    result["status_code"] = response.status
+            except asyncio.TimeoutError:
+                result["error"] = f"deadline of {deadline}s exceeded"
+            except Exception as e:
+                result["error"] = str(e)
+
+            finished_at = time.perf_counter()
+
+        result.update(self._phase_timings(trace_ctx, started_at, finished_at))
+        return result
+
+    @staticmethod
+    def _phase_timings(trace_ctx: Dict[str, Any], started_at: float, finished_at: float) -> Dict[str, Any]:
+        """Split total probe time into DNS, connect and HTTP phases"""
+        dns_time = 0.0
+        connect_time = 0.0
+
+        if "dns_start" in trace_ctx:
+            if "dns_end" in trace_ctx:
+                dns_time = trace_ctx["dns_end"] - trace_ctx["dns_start"]
+                dns_resolution = "PASS"
+            else:
+                # Resolution started but never finished: the name did not resolve
+                dns_time = finished_at - trace_ctx["dns_start"]
+                dns_resolution = "FAIL"
+        elif trace_ctx.get("dns_cached") or trace_ctx.get("connection_reused"):
+            dns_resolution = "CACHED"
+        else:
+            dns_resolution = "SKIPPED"
+
+        if "connect_start" in trace_ctx and "connect_end" in trace_ctx:
+            # aiohttp resolves DNS inside connection creation
+            connect_time = max(trace_ctx["connect_end"] - trace_ctx["connect_start"] - dns_time, 0.0)
+
+        total_time = finished_at - started_at
+        return {
+            "dns_resolution": dns_resolution,
+            "dns_time": dns_time,
+            "connect_time": connect_time,
+            "http_time": max(total_time - dns_time - connect_time, 0.0),
+            "total_time": total_time,
+            "connection_reused": bool(trace_ctx.get("connection_reused")),
+        }
+
+    async def probe_all(self, targets: List[Tuple[str, str]], **kwargs) -> Dict[str, Dict[str, Any]]:
+        """Probe every (name, url) pair concurrently and key results by name"""
+        results = await asyncio.gather(*(self.probe(url, **kwargs) for _, url in targets))
+        return {name: result for (name, _), result in zip(targets, results)}
+
+    async def repeat(self, url: str, count: int, **kwargs) -> List[Dict[str, Any]]:
+        """Probe the same URL ``count`` times, bounded by the concurrency limit"""
+        return list(await asyncio.gather(*(self.probe(url, **kwargs) for _ in range(count))))
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Replica Watch Tracker for KEDA Autoscaling Tests
+Timestamps every replica and ready-pod change from a Kubernetes watch stream
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+import yaml
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCALERS_FILE = Path(__file__).resolve().parent.parent / "infra" / "keda" / "ai-agent-scalers.yaml"
+
+
+def load_scale_targets(path: Path = DEFAULT_SCALERS_FILE) -> Dict[str, Dict[str, Any]]:
+    """
+    Read KEDA ScaledObjects and return their scale targets
+
+    Keyed by the deployment named in ``scaleTargetRef`` so the tracker watches
+    exactly what KEDA scales. ``rps_per_replica`` is the threshold of the
+    scaler's request-rate trigger, the load KEDA lets one replica take, or
+    None if the deployment does not scale on request rate.
+    """
+    targets = {}
+    with open(path) as f:
+        for doc in yaml.safe_load_all(f):
+            if not doc or doc.get("kind") != "ScaledObject":
+                continue
+            spec = doc.get("spec", {})
+            deployment = spec.get("scaleTargetRef", {}).get("name")
+            if not deployment:
+                continue
+            targets[deployment] = {
+                "scaler": doc["metadata"]["name"],
+                "min_replicas": spec.get("minReplicaCount", 0),
+                "max_replicas": spec.get("maxReplicaCount"),
+                "polling_interval": spec.get("pollingInterval", 30),
+                "rps_per_replica": _rps_threshold(spec.get("triggers", [])),
+            }
+    return targets
+
+
+def _rps_threshold(triggers: List[Dict[str, Any]]) -> Optional[float]:
+    for trigger in triggers:
+        metadata = trigger.get("metadata", {})
+        if metadata.get("metricName", "").endswith("requests_per_second") and "threshold" in metadata:
+            return float(metadata["threshold"])
+    return None
+
+
+def _deployment_state(obj: Any) -> Tuple[str, int, int]:
+    """Extract (name, desired replicas, ready replicas) from a V1Deployment or dict"""
+    if isinstance(obj, dict):
+        metadata = obj.get("metadata", {})
+        spec = obj.get("spec", {})
+        status = obj.get("status", {})
+        return (
+            metadata.get("name"),
+            spec.get("replicas") or 0,
+            status.get("readyReplicas", status.get("ready_replicas")) or 0,
+        )
+    return obj.metadata.name, obj.spec.replicas or 0, obj.status.ready_replicas or 0
+
+
+class ReplicaWatchTracker:
+    """
+    Record replica changes for a set of deployments and score KEDA's reaction
+
+    Feed it watch events with ``observe`` (or let ``watch`` drain a watch
+    source), mark when load starts with ``mark_load``, then call ``summary``.
+    """
+
+    def __init__(self, deployments: Iterable[str], clock: Callable[[], float] = time.monotonic):
+        self.deployments = set(deployments)
+        self.clock = clock
+        # deployment -> [(timestamp, desired, ready)], only when something changed
+        self.timeline: Dict[str, List[Tuple[float, int, int]]] = {d: [] for d in self.deployments}
+        self.load_curve: List[Tuple[float, float]] = []
+
+    def observe(self, event: Dict[str, Any], timestamp: Optional[float] = None) -> bool:
+        """Record one watch event; returns True if it changed a tracked deployment"""
+        if event.get("type") == "DELETED":
+            return False
+
+        name, desired, ready = _deployment_state(event["object"])
+        if name not in self.deployments:
+            return False
+
+        samples = self.timeline[name]
+        if samples and samples[-1][1:] == (desired, ready):
+            return False
+
+        samples.append((self.clock() if timestamp is None else timestamp, desired, ready))
+        return True
+
+    def mark_load(self, rps: float, timestamp: Optional[float] = None):
+        """Record the offered load from this point on"""
+        self.load_curve.append((self.clock() if timestamp is None else timestamp, rps))
+
+    def _load_at(self, timestamp: float) -> float:
+        rps = 0.0
+        for t, value in self.load_curve:
+            if t > timestamp:
+                break
+            rps = value
+        return rps
+
+    async def watch(self, source: Iterable[Dict[str, Any]], stop: asyncio.Event):
+        """
+        Drain a blocking watch source on a worker thread until ``stop`` is set
+
+        Events are timestamped as they arrive on the thread, so event-loop
+        delays in the load generator do not skew the reaction times.
+        """
+        loop = asyncio.get_running_loop()
+        finished = threading.Event()
+
+        def pump():
+            try:
+                for event in source:
+                    if stop.is_set():
+                        break
+                    timestamp = self.clock()
+                    loop.call_soon_threadsafe(self.observe, event, timestamp)
+            except Exception as e:
+                logger.warning(f"Replica watch stopped: {e}")
+            finally:
+                finished.set()
+
+        thread = threading.Thread(target=pump, name="replica-watch", daemon=True)
+        thread.start()
+        while not stop.is_set() and not finished.is_set():
+            await asyncio.sleep(0.1)
+        # Otherwise the thread keeps the watch open until its next event
+        # or the server-side timeout
+        if not finished.is_set() and hasattr(source, "stop"):
+            source.stop()
+
+    def summary(self,
+                load_start: Optional[float] = None,
+                rps_per_replica: Union[float, Dict[str, Optional[float]], None] = None,
+                max_replicas: Optional[Dict[str, int]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Score the scaling reaction of every tracked deployment
+
+        Args:
+            load_start: When load began; defaults to the first load mark
+            rps_per_replica: Load one replica is expected to absorb, for all
+                deployments or per deployment. When set, the target replica
+                count follows the load curve; otherwise the target is the
+                highest desired count KEDA asked for.
+            max_replicas: Per-deployment cap on the target (maxReplicaCount)
+        """
+        if load_start is None:
+            load_start = self.load_curve[0][0] if self.load_curve else 0.0
+        max_replicas = max_replicas or {}
+        per_replica = rps_per_replica if isinstance(rps_per_replica, dict) else None
+
+        results = {}
+        for name in sorted(self.deployments):
+            if per_replica is not None:
+                rps_per_replica = per_replica.get(name)
+            samples = self.timeline[name]
+            if not samples:
+                results[name] = {"observed": False}
+                continue
+
+            before = [s for s in samples if s[0] <= load_start]
+            initial_desired, initial_ready = (before[-1][1:] if before else samples[0][1:])
+            during = [s for s in samples if s[0] > load_start]
+
+            if rps_per_replica:
+                peak_rps = max((rps for _, rps in self.load_curve), default=0.0)
+                target = max(math.ceil(peak_rps / rps_per_replica), initial_desired)
+            else:
+                target = max((s[1] for s in samples), default=initial_desired)
+            if name in max_replicas and max_replicas[name] is not None:
+                target = min(target, max_replicas[name])
+
+            first_scale = next((s[0] for s in during if s[1] != initial_desired), None)
+            if initial_ready >= target:
+                reached = load_start
+            else:
+                reached = next((s[0] for s in during if s[2] >= target), None)
+
+            # Overshoot: ready pods above what the load at that moment called for
+            overshoot = 0
+            for t, _, ready in samples:
+                if rps_per_replica:
+                    expected = max(math.ceil(self._load_at(t) / rps_per_replica), initial_desired)
+                else:
+                    expected = target
+                overshoot = max(overshoot, ready - expected)
+
+            results[name] = {
+                "observed": True,
+                "initial_replicas": initial_desired,
+                "initial_ready": initial_ready,
+                "final_replicas": samples[-1][1],
+                "final_ready": samples[-1][2],
+                "peak_ready": max(s[2] for s in samples),
+                "target_replicas": target,
+                "scaled": first_scale is not None,
+                "time_to_first_scale": None if first_scale is None else first_scale - load_start,
+                "time_to_target": None if reached is None else reached - load_start,
+                "overshoot": overshoot,
+                "changes": len(during),
+            }
+        return results
+
+
+class _WatchStream:
+    """A Kubernetes watch stream that ``ReplicaWatchTracker.watch`` can stop"""
+
+    def __init__(self, watch: Any, stream: Iterable[Dict[str, Any]]):
+        self.watch = watch
+        self.stream = stream
+
+    def __iter__(self):
+        return iter(self.stream)
+
+    def stop(self):
+        self.watch.stop()
+
+
+def kubernetes_watch_source(apps_v1, namespace: str, timeout_seconds: int = 300) -> _WatchStream:
+    """Blocking watch stream over deployments in a namespace"""
+    from kubernetes import watch
+
+    w = watch.Watch()
+    return _WatchStream(w, w.stream(
+        apps_v1.list_namespaced_deployment,
+        namespace=namespace,
+        timeout_seconds=timeout_seconds,
+    ))
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Soak/Endurance Test for the CrewAI API
+Runs a steady mixed workload for hours and flags memory, connection and latency leaks
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from client_monitor import ClientMonitor
+from probe_executor import ProbeExecutor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Series a soak must have sampled to pass; the rest are optional
+REQUIRED_SERIES = ("target_rss_bytes", "target_open_fds")
+
+# (weight, method, path) – read-heavy mix matching dashboard traffic
+DEFAULT_WORKLOAD = [
+    (50, "GET", "/health"),
+    (20, "GET", "/agents"),
+    (20, "GET", "/crews"),
+    (10, "GET", "/"),
+]
+
+
+def linear_trend(points: List[Tuple[float, float]]) -> Dict[str, float]:
+    """
+    Least-squares fit of value over time
+
+    Returns the slope (units per hour), R² of the fit and the growth over the
+    run relative to the fitted starting value.
+    """
+    if len(points) < 3:
+        return {"slope_per_hour": 0.0, "r2": 0.0, "relative_growth": 0.0}
+
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    mean_x = statistics.mean(xs)
+    mean_y = statistics.mean(ys)
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    if sxx == 0:
+        return {"slope_per_hour": 0.0, "r2": 0.0, "relative_growth": 0.0}
+
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / sxx
+    intercept = mean_y - slope * mean_x
+    ss_tot = sum((y - mean_y) ** 2 for y in ys)
+    ss_res = sum((y - (intercept + slope * x)) ** 2 for x, y in points)
+    r2 = 1.0 - ss_res / ss_tot if ss_tot > 0 else 0.0
+
+    start = intercept + slope * xs[0]
+    growth = slope * (xs[-1] - xs[0])
+    return {
+        "slope_per_hour": slope * 3600.0,
+        "r2": r2,
+        "relative_growth": growth / abs(start) if start else 0.0,
+    }
+
+
+def is_leaking(trend: Dict[str, float], min_r2: float = 0.8, min_growth: float = 0.1) -> bool:
+    """Linear growth: a steady upward fit that grew by a meaningful share"""
+    return trend["slope_per_hour"] > 0 and trend["r2"] >= min_r2 and trend["relative_growth"] >= min_growth
+
+
+def parse_prometheus_text(text: str, names: List[str]) -> Dict[str, float]:
+    """Pick unlabelled samples for the given metric names out of a /metrics page"""
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split()
+        if len(parts) >= 2 and parts[0] in names:
+            try:
+                values[parts[0]] = float(parts[1])
+            except ValueError:
+                continue
+    return values
+
+
+class SoakTest:
+    """
+    Steady mixed workload with periodic resource sampling
+
+    Every ``sample_interval`` seconds the target's RSS and open file
+    descriptors are read from its Prometheus endpoint (the process
+    collector, summed over the workers of a multi-worker server), Postgres
+    connections are counted from ``pg_stat_activity``, and the latency of
+    the last window is summarised. A soak that never sampled RSS or open
+    descriptors fails rather than passing unchecked.
+    """
+
+    def __init__(self,
+                 base_url: str = "http://localhost:8000",
+                 metrics_url: Optional[str] = None,
+                 database_url: Optional[str] = None,
+                 database_name: str = "crewai",
+                 rps: float = 20.0,
+                 duration: float = 4 * 3600,
+                 sample_interval: float = 60.0,
+                 workload: Optional[List[Tuple[int, str, str]]] = None):
+        self.base_url = base_url.rstrip("/")
+        self.metrics_url = metrics_url or f"{self.base_url}/metrics"
+        self.database_url = database_url
+        self.database_name = database_name
+        self.rps = rps
+        self.duration = duration
+        self.sample_interval = sample_interval
+        self.workload = workload or DEFAULT_WORKLOAD
+
+        self.samples: List[Dict[str, Any]] = []
+        self._window_latencies: List[float] = []
+        self._window_errors = 0
+
+    def _pick_request(self) -> Tuple[str, str]:
+        weights = [w for w, _, _ in self.workload]
+        _, method, path = random.choices(self.workload, weights=weights)[0]
+        return method, path
+
+    def _count_db_connections(self) -> Optional[int]:
+        if not self.database_url:
+            return None
+        import psycopg2
+
+        conn = psycopg2.connect(self.database_url)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT count(*) FROM pg_stat_activity WHERE datname = %s",
+                    (self.database_name,)
+                )
+                return cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    async def _request(self, probes: ProbeExecutor):
+        method, path = self._pick_request()
+        result = await probes.probe(f"{self.base_url}{path}", method=method)
+        if result.get("status_code") == 200:
+            self._window_latencies.append(result["total_time"])
+        else:
+            self._window_errors += 1
+
+    async def _sample(self, probes: ProbeExecutor, elapsed: float, monitor: ClientMonitor):
+        sample: Dict[str, Any] = {"t": elapsed}
+
+        result = await probes.probe(self.metrics_url, read_text=True)
+        if result.get("status_code") == 200:
+            values = parse_prometheus_text(result["text"], ["process_resident_memory_bytes", "process_open_fds"])
+            sample["target_rss_bytes"] = values.get("process_resident_memory_bytes")
+            sample["target_open_fds"] = values.get("process_open_fds")
+
+        try:
+            sample["db_connections"] = await asyncio.to_thread(self._count_db_connections)
+        except Exception as e:
+            logger.warning(f"Could not count database connections: {e}")
+
+        latencies, errors = self._window_latencies, self._window_errors
+        self._window_latencies, self._window_errors = [], 0
+        sample["requests"] = len(latencies) + errors
+        sample["errors"] = errors
+        if latencies:
+            sample["latency_p50"] = statistics.median(latencies)
+            sample["latency_p95"] = statistics.quantiles(latencies, n=20)[18] if len(latencies) >= 20 else max(latencies)
+
+        sample["client_loop_lag_p95"] = monitor.summary()["loop_lag_p95"]
+        self.samples.append(sample)
+        logger.info(f"Soak sample at {elapsed / 60:.1f}min: {json.dumps(sample)}")
+
+    def report(self) -> Dict[str, Any]:
+        """Trend slopes for every sampled series and the leak verdicts"""
+        series = ["target_rss_bytes", "target_open_fds", "db_connections", "latency_p50", "latency_p95"]
+        trends = {}
+        leaks = []
+        for name in series:
+            points = [(s["t"], s[name]) for s in self.samples if s.get(name) is not None]
+            trend = linear_trend(points)
+            trend["leaking"] = is_leaking(trend)
+            trends[name] = trend
+            if trend["leaking"]:
+                leaks.append(name)
+
+        # A leak check without its series proves nothing, e.g. a target
+        # whose /metrics lacks the process metrics
+        missing = [name for name in REQUIRED_SERIES if all(s.get(name) is None for s in self.samples)]
+        if missing:
+            logger.error(f"Soak sampled no values for {', '.join(missing)}")
+
+        return {
+            "test_name": "soak",
+            "duration": self.duration,
+            "rps": self.rps,
+            "samples": self.samples,
+            "trends": trends,
+            "leaks": leaks,
+            "missing": missing,
+            "status": "FAILED" if leaks or missing else "SUCCESS",
+            "timestamp": time.time(),
+        }
+
+    async def run(self) -> Dict[str, Any]:
+        """Run the soak for the configured duration"""
+        logger.info(f"Starting soak: {self.rps} RPS for {self.duration / 3600:.1f}h against {self.base_url}")
+
+        interval = 1.0 / self.rps
+        start = time.monotonic()
+        next_request = start
+        next_sample = start
+
+        async with ProbeExecutor(concurrency=64, timeout=10) as probes, ClientMonitor() as monitor:
+            in_flight = set()
+            while True:
+                now = time.monotonic()
+                if now - start >= self.duration:
+                    break
+
+                if now >= next_sample:
+                    await self._sample(probes, now - start, monitor)
+                    next_sample += self.sample_interval
+
+                # Open-loop arrivals: keep the schedule even if responses are slow
+                while next_request <= now:
+                    task = asyncio.create_task(self._request(probes))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                    next_request += interval
+
+                await asyncio.sleep(max(min(next_request, next_sample) - time.monotonic(), 0))
+
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            await self._sample(probes, time.monotonic() - start, monitor)
+
+        return self.report()
+
+
+def verdict(results: Dict[str, Any]) -> int:
+    """Print the outcome of a soak report; the exit code is 1 unless it passed"""
+    if results["leaks"]:
+        print(f"❌ Linear growth detected in: {', '.join(results['leaks'])}")
+    if results["missing"]:
+        print(f"❌ No samples for: {', '.join(results['missing'])}")
+    if results["status"] != "SUCCESS":
+        return 1
+    print("✅ No resource growth detected")
+    return 0
+
+
+async def main():
+    """Run a soak test from the command line"""
+    parser = argparse.ArgumentParser(description="CrewAI soak/endurance test")
+    parser.add_argument("--base-url", default=os.getenv("SOAK_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--metrics-url", default=os.getenv("SOAK_METRICS_URL"))
+    parser.add_argument("--database-url", default=os.getenv("SOAK_DATABASE_URL"),
+                        help="Postgres DSN used to count pg_stat_activity connections")
+    parser.add_argument("--duration", type=float, default=4 * 3600, help="Seconds to run")
+    parser.add_argument("--rps", type=float, default=20.0)
+    parser.add_argument("--sample-interval", type=float, default=60.0)
+    parser.add_argument("--output", default="soak_results.json")
+    args = parser.parse_args()
+
+    soak = SoakTest(
+        base_url=args.base_url,
+        metrics_url=args.metrics_url,
+        database_url=args.database_url,
+        rps=args.rps,
+        duration=args.duration,
+        sample_interval=args.sample_interval,
+    )
+    results = await soak.run()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    exit(verdict(results))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
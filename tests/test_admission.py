@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for CrewAI API admission control
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "infra", "crewai"))
+
+from prometheus_client import CollectorRegistry
+
+from admission import CRITICAL, AdmissionControlMiddleware, GradientLimit, Limiter, classify_route
+
+
+def test_limit_shrinks_when_latency_rises_and_grows_while_it_holds():
+    limit = GradientLimit(initial=20, max_limit=100)
+    for _ in range(200):
+        limit.update(0.01, inflight=20)
+    grown = limit.limit
+    assert grown > 20
+
+    for _ in range(200):
+        limit.update(0.05, inflight=int(limit.limit))
+    assert limit.limit < grown * 0.75
+    assert limit.limit >= limit.min_limit
+
+
+def test_idle_samples_do_not_raise_the_limit():
+    limit = GradientLimit(initial=20)
+    for _ in range(200):
+        limit.update(0.01, inflight=1)
+    assert limit.limit == 20
+
+
+async def _serve(middleware, method, path):
+    response = {}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = dict(message["headers"])
+
+    await middleware({"type": "http", "method": method, "path": path}, None, send)
+    return response
+
+
+def _middleware(app, **limits):
+    registry = CollectorRegistry()
+    limiters = {name: Limiter(name, limit) for name, limit in limits.items()}
+    return AdmissionControlMiddleware(app, limiters=limiters, registry=registry), registry
+
+
+def test_over_limit_requests_get_429_with_retry_after():
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    async def run():
+        middleware, registry = _middleware(app, read=1)
+        held = asyncio.create_task(_serve(middleware, "GET", "/agents"))
+        await asyncio.sleep(0)
+        shed = await _serve(middleware, "GET", "/agents")
+        release.set()
+        return await held, shed, registry
+
+    held, shed, registry = asyncio.run(run())
+    assert held["status"] == 200
+    assert shed["status"] == 429 and int(shed["headers"][b"retry-after"]) >= 1
+    assert registry.get_sample_value("crewai_admission_rejected_total", {"route_class": "read"}) == 1
+
+
+def test_critical_routes_are_never_shed():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    # A zero limit sheds every request of a limited class
+    middleware, _ = _middleware(app, read=0, write=0, launch=0)
+    for method, path in (("GET", "/health"), ("GET", "/ready"), ("GET", "/metrics"),
+                         ("POST", "/debug/profile"), ("GET", "/processes/42")):
+        assert classify_route(method, path) == CRITICAL
+        assert asyncio.run(_serve(middleware, method, path))["status"] == 200
+    assert asyncio.run(_serve(middleware, "GET", "/agents"))["status"] == 429
+
+
+def test_limit_gauge_follows_the_adaptive_limit():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 503, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware, registry = _middleware(app, write=GradientLimit(initial=16))
+    assert registry.get_sample_value("crewai_admission_limit", {"route_class": "write"}) == 16
+    for _ in range(5):
+        asyncio.run(_serve(middleware, "POST", "/crews"))
+    limit = middleware.limiters["write"].limit
+    assert limit < 16
+    assert registry.get_sample_value("crewai_admission_limit", {"route_class": "write"}) == limit
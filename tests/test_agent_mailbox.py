@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for bounded per-agent mailboxes
+"""
+
+import pytest
+from google.protobuf import any_pb2, timestamp_pb2
+
+import agent_mailbox
+from agent_enums import MessageType
+from agent_mailbox import MailboxFullError, MailboxStore, OverflowPolicy, SharedMessage
+
+
+def _msg(subject, message_type=MessageType.INFO, urgent=False, content=""):
+    return SharedMessage("sender", subject=subject, content=content, message_type=message_type, urgent=urgent)
+
+
+def _subjects(messages):
+    return [m.subject for m in messages]
+
+
+def test_urgent_lane_is_received_first():
+    store = MailboxStore()
+    store.send("a", _msg("n1"))
+    store.send("a", _msg("u1", urgent=True))
+    store.send("a", _msg("n2"))
+    assert _subjects(store.receive("a")) == ["u1", "n1", "n2"]
+    assert _subjects(store.receive("a", urgent_only=True)) == []
+
+
+def test_type_filter_leaves_other_messages_in_order():
+    store = MailboxStore(capacity=4)
+    for i, message_type in enumerate([MessageType.INFO, MessageType.COMMAND, MessageType.INFO, MessageType.COMMAND]):
+        store.send("a", _msg(f"m{i}", message_type))
+
+    assert _subjects(store.receive("a", message_type=MessageType.COMMAND)) == ["m1", "m3"]
+    # Tombstoned slots are reused without losing order
+    store.send("a", _msg("m4"))
+    store.send("a", _msg("m5"))
+    assert _subjects(store.receive("a", max_messages=3)) == ["m0", "m2", "m4"]
+    assert _subjects(store.receive("a")) == ["m5"]
+
+
+def test_drop_oldest_and_reject_policies():
+    store = MailboxStore(capacity=2, overflow=OverflowPolicy.DROP_OLDEST)
+    for i in range(4):
+        store.send("a", _msg(f"m{i}"))
+    assert store.usage("a")["dropped"] == 2
+    assert _subjects(store.receive("a")) == ["m2", "m3"]
+
+    store = MailboxStore(capacity=2, overflow=OverflowPolicy.REJECT)
+    store.send("a", _msg("m0"))
+    store.send("a", _msg("m1"))
+    with pytest.raises(MailboxFullError):
+        store.send("a", _msg("m2"))
+    assert store.usage("a")["rejected"] == 1
+
+
+def test_byte_cap_applies_across_lanes():
+    store = MailboxStore(max_bytes=100, overflow=OverflowPolicy.REJECT)
+    store.send("a", _msg("", content="x" * 60, urgent=True))
+    with pytest.raises(MailboxFullError):
+        store.send("a", _msg("", content="x" * 60))
+    assert store.usage("a")["bytes"] == 60
+
+
+def test_spill_preserves_order(tmp_path):
+    store = MailboxStore(capacity=2, overflow=OverflowPolicy.SPILL, spill_dir=str(tmp_path))
+    for i in range(7):
+        store.send("a", _msg(f"m{i}"))
+    assert store.usage("a") == {"messages": 2, "urgent": 0, "bytes": 4, "spilled": 5, "dropped": 0, "rejected": 0}
+
+    assert _subjects(store.receive("a", max_messages=3)) == ["m0", "m1", "m2"]
+    store.send("a", _msg("m7"))
+    assert _subjects(store.receive("a")) == ["m3", "m4", "m5", "m6", "m7"]
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spill_round_trips_messages_under_a_safe_name(tmp_path):
+    spill_dir = tmp_path / "spill"
+    store = MailboxStore(capacity=1, overflow=OverflowPolicy.SPILL, spill_dir=str(spill_dir))
+    payload = any_pb2.Any()
+    payload.Pack(timestamp_pb2.Timestamp(seconds=42))
+    first = SharedMessage("sender", subject="s0")
+    spilled = [SharedMessage("sender", subject="s1", message_type=MessageType.COMMAND, headers={"k": "v"},
+                             payload=payload),
+               SharedMessage("sender", subject="s2", payload=b"\x00raw")]
+    for message in [first] + spilled:
+        store.send("../../escape", message)
+    (path,) = spill_dir.iterdir()
+    assert ".." not in path.name and list(tmp_path.iterdir()) == [spill_dir]
+
+    received = store.receive("../../escape")
+    assert received[0] is first
+    for original, restored in zip(spilled, received[1:]):
+        assert (restored.message_id, restored.subject, restored.type, restored.headers, restored.payload,
+                restored.timestamp) == (original.message_id, original.subject, original.type, original.headers,
+                                        original.payload, pytest.approx(original.timestamp))
+
+
+def test_drained_spill_restores_the_fast_path(tmp_path):
+    store = MailboxStore(capacity=1, overflow=OverflowPolicy.SPILL, spill_dir=str(tmp_path))
+    store.send("a", _msg("m0"))
+    store.send("a", _msg("m1"))
+    assert _subjects(store.receive("a")) == ["m0", "m1"]
+    assert store._mailboxes["a"].normal.spill is None
+
+    shared = _msg("fan-out")
+    assert store.deliver_many(["a"], shared) == 1 and shared.pending == 1
+
+
+def test_consumed_spill_prefix_is_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(agent_mailbox, "COMPACT_BYTES", 256)
+    store = MailboxStore(capacity=1, overflow=OverflowPolicy.SPILL, spill_dir=str(tmp_path))
+    for i in range(40):
+        store.send("a", _msg(f"m{i}", content="x" * 32))
+    (path,) = tmp_path.iterdir()
+    full = path.stat().st_size
+
+    assert _subjects(store.receive("a", max_messages=30)) == [f"m{i}" for i in range(30)]
+    assert path.stat().st_size < full / 2
+    assert _subjects(store.receive("a")) == [f"m{i}" for i in range(30, 40)]
+    assert list(tmp_path.iterdir()) == []
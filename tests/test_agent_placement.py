@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for capability- and load-aware agent placement
+"""
+
+import random
+
+from agent_enums import AgentStatus, AgentType
+from agent_placement import AgentPlacement
+
+
+def _placement():
+    return AgentPlacement(rng=random.Random(7))
+
+
+def test_only_eligible_agents_are_chosen():
+    placement = _placement()
+    placement.register("py", AgentType.CODING, capabilities={"language": "python"}, tags=["gpu"])
+    placement.register("go", AgentType.CODING, capabilities={"language": "go"}, tags=["gpu"])
+    placement.register("offline", AgentType.CODING, AgentStatus.OFFLINE,
+                       capabilities={"language": "python"}, tags=["gpu"])
+    placement.register("tester", AgentType.TESTING, capabilities={"language": "python"}, tags=["gpu"])
+
+    for _ in range(20):
+        agent_id = placement.place(AgentType.CODING, capabilities={"language": "python"}, tags=["gpu"])
+        assert agent_id == "py"
+        placement.task_finished(agent_id)
+    assert placement.place(AgentType.SECURITY) is None
+
+
+def test_power_of_two_choices_prefers_less_loaded():
+    placement = _placement()
+    placement.register("busy", AgentType.CODING)
+    placement.register("quiet", AgentType.CODING)
+    placement.update_load("busy", cpu_percent=90, active_tasks=5)
+    assert placement.place(AgentType.CODING) == "quiet"
+
+
+def test_affinity_is_sticky_until_overloaded():
+    placement = AgentPlacement(affinity_slack=2.0, rng=random.Random(1))
+    for i in range(20):
+        placement.register(f"agent-{i}", AgentType.CODING)
+
+    owner = placement.place(AgentType.CODING, affinity_key="medinovai/ai-platform")
+    placement.task_finished(owner)
+    for _ in range(5):
+        agent_id = placement.place(AgentType.CODING, affinity_key="medinovai/ai-platform")
+        assert agent_id == owner
+        placement.task_finished(agent_id)
+
+    placement.update_load(owner, active_tasks=10)
+    assert placement.place(AgentType.CODING, affinity_key="medinovai/ai-platform") != owner
+
+
+def test_status_changes_and_deregistration_update_pools():
+    placement = _placement()
+    placement.register("a", AgentType.CODING)
+    placement.register("b", AgentType.CODING)
+    placement.set_status("a", AgentStatus.TERMINATING)
+    assert {placement.place(AgentType.CODING) for _ in range(10)} == {"b"}
+    placement.deregister("b")
+    assert placement.place(AgentType.CODING) is None
+    placement.set_status("a", AgentStatus.BUSY)
+    assert placement.place(AgentType.CODING) == "a"
+
+
+def test_ring_stays_consistent_under_churn():
+    placement = AgentPlacement(ring_replicas=4)
+    for i in range(20):
+        placement.register(f"a{i}", AgentType.CODING)
+    owner = placement._affinity_agent(AgentType.CODING, "repo", {}, set())
+
+    ring = placement._rings[AgentType.CODING]
+    before = (list(ring._points), list(ring._owners))
+    # A refresh with the same type leaves the ring untouched
+    placement.register(owner.agent_id, AgentType.CODING, status=AgentStatus.BUSY)
+    assert (ring._points, ring._owners) == before
+
+    placement.register("extra", AgentType.CODING)
+    placement.deregister("extra")
+    assert (ring._points, ring._owners) == before
+    placement.register(owner.agent_id, AgentType.TESTING)
+    assert owner.agent_id not in ring._owners and ring._points == sorted(ring._points)
+    assert len(ring._points) == 19 * 4
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the columnar agent registry
+"""
+
+import pytest
+
+from agent_enums import AgentStatus, AgentType
+from agent_registry import AgentRegistry, InvalidPageToken
+
+
+def _ids(rows):
+    return [row["id"] for row in rows]
+
+
+def _registry(n=10):
+    registry = AgentRegistry()
+    for i in range(n):
+        registry.upsert(f"a{i}", AgentType.CODING if i % 2 else AgentType.TESTING,
+                        AgentStatus.IDLE if i % 3 else AgentStatus.BUSY,
+                        tags=["gpu"] if i % 4 == 0 else ["cpu"], now=float(i))
+    return registry
+
+
+def test_filters_combine_type_status_and_tags():
+    registry = _registry()
+    rows, token, total = registry.list(agent_type=AgentType.CODING, status=AgentStatus.IDLE)
+    assert _ids(rows) == ["a1", "a5", "a7"] and total == 3 and token == ""
+    assert _ids(registry.list(tags=["gpu"])[0]) == ["a0", "a4", "a8"]
+    assert registry.list(tags=["gpu", "unknown"]) == ([], "", 0)
+
+    registry.set_status("a5", AgentStatus.OFFLINE)
+    registry.upsert("a7", AgentType.CODING, AgentStatus.IDLE, tags=["gpu"])
+    assert _ids(registry.list(agent_type=AgentType.CODING, status=AgentStatus.IDLE)[0]) == ["a1", "a7"]
+    assert _ids(registry.list(tags=["gpu"])[0]) == ["a0", "a4", "a7", "a8"]
+    assert registry.get("a7")["tags"] == ["gpu"]
+
+
+def test_pages_are_stable_while_agents_come_and_go():
+    registry = _registry(10)
+    page, token, total = registry.list(page_size=4)
+    assert _ids(page) == ["a0", "a1", "a2", "a3"] and total == 10
+
+    # a5 leaves; its slot is reused by a newcomer that must not appear
+    registry.remove("a5")
+    registry.upsert("late", AgentType.CODING, AgentStatus.IDLE)
+    page, token, _ = registry.list(page_size=4, page_token=token)
+    assert _ids(page) == ["a4", "a6", "a7", "a8"]
+    page, token, _ = registry.list(page_size=4, page_token=token)
+    assert _ids(page) == ["a9"] and token == ""
+
+    assert "late" in _ids(registry.list(page_size=100)[0])
+
+
+def test_page_token_is_tied_to_filters():
+    registry = _registry()
+    _, token, _ = registry.list(agent_type=AgentType.CODING, page_size=1)
+    with pytest.raises(InvalidPageToken):
+        registry.list(agent_type=AgentType.TESTING, page_size=1, page_token=token)
+    with pytest.raises(InvalidPageToken):
+        registry.list(page_token="not-a-token")
+
+
+def test_segments_cover_large_slot_numbers():
+    registry = AgentRegistry()
+    for i in range(10_000):
+        registry.upsert(f"a{i}", AgentType.SECURITY if i % 5000 == 4999 else AgentType.CODING, AgentStatus.IDLE)
+    rows, token, total = registry.list(agent_type=AgentType.SECURITY, page_size=1)
+    assert _ids(rows) == ["a4999"] and total == 2
+    assert _ids(registry.list(agent_type=AgentType.SECURITY, page_size=1, page_token=token)[0]) == ["a9999"]
+
+
+def test_batch_get_keeps_request_order_and_reports_missing():
+    registry = _registry(5)
+    rows, missing = registry.batch_get(["a3", "nope", "a0", "a3"])
+    assert _ids(rows) == ["a3", "a0", "a3"] and missing == ["nope"]
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for AIAgentClient request building, against stand-in message classes
+"""
+
+import asyncio
+import importlib
+import json
+import sys
+import types
+
+import pytest
+
+pytest.importorskip("grpc")
+
+
+class _Message:
+    """Keyword-constructed message; the serialized form is the JSON of its fields"""
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def SerializeToString(self) -> bytes:
+        return json.dumps(self.__dict__, default=lambda message: message.__dict__).encode()
+
+    def ByteSize(self) -> int:
+        return len(self.SerializeToString())
+
+
+class _GeneratedModule(types.ModuleType):
+    """Stand-in for a generated module: every attribute is a message class"""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        message = type(name, (_Message,), {})
+        setattr(self, name, message)
+        return message
+
+
+@pytest.fixture
+def client_module(monkeypatch):
+    """ai_agent_client, with stand-ins for the generated modules if they are not built"""
+    try:
+        importlib.import_module("ai_agent_service_pb2")
+    except ImportError:
+        for name in ("ai_agent_service_pb2", "ai_agent_service_pb2_grpc"):
+            monkeypatch.setitem(sys.modules, name, _GeneratedModule(name))
+    sys.modules.pop("ai_agent_client", None)
+    yield importlib.import_module("ai_agent_client")
+    # Bound to the stand-ins; a later import must load it afresh
+    sys.modules.pop("ai_agent_client", None)
+
+
+class _Recorder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, name):
+        async def record(*args, **kwargs):
+            self.calls.append((name, args))
+            return "ok"
+        return record
+
+
+def _client(module, recorder, threshold):
+    client = module.AIAgentClient(use_xds=False, tracing=False, chunked_upload_threshold=threshold)
+    stub = types.SimpleNamespace(CompleteTask=recorder("CompleteTask"))
+
+    async def get_stub():
+        return stub
+
+    client._get_stub = get_stub
+    client.upload_task_result = recorder("upload_task_result")
+    return client
+
+
+def test_complete_task_builds_a_task_result(client_module):
+    recorder = _Recorder()
+    client = _client(client_module, recorder, threshold=1 << 20)
+    asyncio.run(client.complete_task("t1", {"message": "done", "errors": [], "files": ["a.py"], "note": "x"}))
+
+    ((name, (request,)),) = recorder.calls
+    assert name == "CompleteTask" and request.task_id == "t1"
+    assert request.result.success and request.result.message == "done"
+    assert dict(request.result.data) == {"files": '["a.py"]', "note": "x"}
+
+
+def test_large_result_goes_through_chunked_upload(client_module):
+    recorder = _Recorder()
+    client = _client(client_module, recorder, threshold=1024)
+    asyncio.run(client.complete_task("t1", {"diff": "+ changed line\n" * 1000}))
+
+    ((name, (task_id, payload)),) = recorder.calls
+    assert name == "upload_task_result" and task_id == "t1"
+    assert len(payload) > 1024 and b"changed line" in payload
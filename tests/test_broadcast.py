@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Tests for broadcast fan-out over the capability index
+"""
+
+from agent_enums import AgentType, MessageType
+from agent_mailbox import SharedMessage
+from broadcast import BroadcastEngine
+
+
+def _msg(subject):
+    return SharedMessage("sender", subject=subject, message_type=MessageType.INFO)
+
+
+def test_broadcast_shares_one_message():
+    engine = BroadcastEngine(batch_size=2)
+    engine.index.add("c1", AgentType.CODING, ["hipaa"])
+    engine.index.add("c2", AgentType.CODING)
+    engine.index.add("t1", "AGENT_TYPE_TESTING", ["hipaa"])
+    engine.index.add("s1", AgentType.SECURITY, ["hipaa"])
+
+    message = _msg("policy")
+    assert engine.broadcast(message, ["coding", AgentType.TESTING], ["hipaa"]) == 2
+    assert message.pending == 2
+
+    received = engine.mailboxes.receive("c1") + engine.mailboxes.receive("t1")
+    assert all(m is message for m in received)
+    assert message.pending == 0
+    assert engine.mailboxes.receive("c2") == []
+    assert engine.broadcast(_msg("all")) == 4
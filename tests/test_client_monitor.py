@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the load client saturation verdicts
+"""
+
+import asyncio
+import time
+
+from client_monitor import HEALTHY, INVALID, SATURATED, ClientMonitor
+from phase_scheduler import Phase, PhaseScheduler
+
+
+def _monitor(lag, cpu, samples=20):
+    monitor = ClientMonitor()
+    monitor.samples = [{"t": i * 0.1, "loop_lag": lag, "cpu_percent": cpu, "open_sockets": None,
+                        "pending_tasks": 1} for i in range(samples)]
+    return monitor
+
+
+def test_quiet_client_is_healthy():
+    result = _monitor(lag=0.001, cpu=20.0).verdict(median_latency=0.05)
+    assert result["verdict"] == HEALTHY and result["reasons"] == []
+
+
+def test_warning_thresholds_mark_the_run_saturated():
+    assert _monitor(lag=0.03, cpu=20.0).verdict()["verdict"] == SATURATED
+    result = _monitor(lag=0.001, cpu=85.0).verdict()
+    assert result["verdict"] == SATURATED and result["reasons"] == ["client CPU 85%"]
+
+
+def test_invalid_thresholds_invalidate_the_run():
+    assert _monitor(lag=0.1, cpu=20.0).verdict()["verdict"] == INVALID
+    assert _monitor(lag=0.001, cpu=96.0).verdict()["verdict"] == INVALID
+    # Lag invalidates whichever CPU threshold was crossed
+    assert _monitor(lag=0.15, cpu=85.0).verdict()["verdict"] == INVALID
+
+
+def test_lag_large_against_latency_invalidates_the_run():
+    # 30 ms of lag is only a warning alone, but exceeds 25% of a 100 ms median
+    assert _monitor(lag=0.03, cpu=20.0).verdict(median_latency=1.0)["verdict"] == SATURATED
+    result = _monitor(lag=0.03, cpu=20.0).verdict(median_latency=0.1)
+    assert result["verdict"] == INVALID
+    assert result["reasons"][-1] == "loop lag is 30% of median latency"
+    # Below the warning level the share is not checked
+    assert _monitor(lag=0.01, cpu=20.0).verdict(median_latency=0.001)["verdict"] == HEALTHY
+
+
+def test_phase_blocking_the_loop_is_invalid():
+    async def blocking():
+        deadline = time.perf_counter() + 0.8
+        while time.perf_counter() < deadline:
+            time.sleep(0.15)
+            await asyncio.sleep(0)
+        return {"test_name": "blocking"}
+
+    (result,) = asyncio.run(PhaseScheduler([Phase("blocking", blocking)]).run())
+    assert result["status"] == "INVALID"
+    assert result["client_monitor"]["verdict"] == INVALID
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests for crew search query building
+"""
+
+import os
+import re
+import sys
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "infra", "crewai"))
+
+from crew_search import CREW_COLUMNS, TASK_TEXT, crew_search_query
+
+
+def _adapted(params):
+    # Json parameters wrap the value that is sent as JSONB
+    return [getattr(param, "adapted", param) for param in params]
+
+
+def test_tool_and_role_are_containment_tests():
+    sql, params = crew_search_query(tool="web_search", role="QA Engineer", limit=10)
+    assert sql == (f"SELECT {CREW_COLUMNS} FROM crews WHERE agents @> %s AND agents @> %s "
+                   f"ORDER BY created_at DESC LIMIT %s")
+    assert _adapted(params) == [[{"tools": ["web_search"]}], [{"role": "QA Engineer"}], 10]
+
+
+def test_task_text_uses_the_indexed_expression():
+    sql, params = crew_search_query(task="imaging pipeline", table="bench_crews")
+    assert f"FROM bench_crews WHERE {TASK_TEXT} @@ plainto_tsquery('english', %s) " in sql
+    assert params == ["imaging pipeline", 100]
+
+
+def test_all_criteria_are_combined():
+    sql, params = crew_search_query(tool="t", role="r", task="x")
+    assert sql.count(" AND ") == 2
+    assert _adapted(params) == [[{"tools": ["t"]}], [{"role": "r"}], "x", 100]
+
+
+@pytest.mark.parametrize("criteria", [{}, {"tool": "", "role": None, "task": ""}])
+def test_a_criterion_is_required(criteria):
+    with pytest.raises(ValueError):
+        crew_search_query(**criteria)
+
+
+def test_task_text_matches_the_index_definition():
+    with open(os.path.join(ROOT, "infra", "crewai", "postgresql.yaml")) as f:
+        match = re.search(r"idx_crews_task_text ON crews\s+USING GIN \((.+)\);", f.read())
+    assert match and match.group(1) == TASK_TEXT
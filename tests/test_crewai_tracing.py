@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for CrewAI API request and database spans
+"""
+
+import asyncio
+import importlib.util
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("opentelemetry.sdk")
+pytest.importorskip("prometheus_client")
+
+CREWAI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "infra", "crewai")
+sys.path.append(CREWAI_DIR)
+
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, StatusCode
+
+# Loaded under its own name: proto/tracing.py is the module called tracing here
+_spec = importlib.util.spec_from_file_location("crewai_tracing", os.path.join(CREWAI_DIR, "tracing.py"))
+crewai_tracing = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(crewai_tracing)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def exporter(request, monkeypatch):
+    ratio = getattr(request, "param", 1.0)
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider(sampler=ParentBased(TraceIdRatioBased(ratio)))
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(crewai_tracing, "tracer", provider.get_tracer(__name__))
+    return exporter
+
+
+class _Cursor:
+    def execute(self, query, vars=None):
+        return "executed"
+
+    def executemany(self, query, vars_list):
+        return "executed"
+
+
+def _app(status=200):
+    cursor = crewai_tracing.traced_cursor(_Cursor)()
+
+    async def app(scope, receive, send):
+        cursor.execute("SELECT * FROM processes WHERE id = %s", (1,))
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    return crewai_tracing.TracingMiddleware(app, route_resolver=lambda scope: "/processes/{process_id}")
+
+
+def _serve(middleware, path="/processes/1", headers=()):
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": path,
+             "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers]}
+    asyncio.run(middleware(scope, None, send))
+
+
+def test_request_continues_the_incoming_trace(exporter):
+    _serve(_app(), headers=[("traceparent", f"00-{TRACE_ID}-{PARENT_ID}-01")])
+
+    db, server = exporter.get_finished_spans()
+    assert server.name == "GET /processes/{process_id}" and server.kind == SpanKind.SERVER
+    assert format(server.context.trace_id, "032x") == TRACE_ID
+    assert format(server.parent.span_id, "016x") == PARENT_ID
+    assert server.attributes["http.route"] == "/processes/{process_id}"
+    assert server.attributes["http.response.status_code"] == 200
+    assert server.status.status_code == StatusCode.UNSET
+
+    assert db.name == "postgresql SELECT" and db.kind == SpanKind.CLIENT
+    assert db.parent.span_id == server.context.span_id
+    assert db.attributes["db.query.text"] == "SELECT * FROM processes WHERE id = %s"
+
+
+def test_excluded_paths_have_no_span(exporter):
+    middleware = _app()
+    for path in ("/health", "/ready", "/metrics", "/debug/profile"):
+        _serve(middleware, path=path)
+    assert exporter.get_finished_spans() == ()
+
+
+def test_server_errors_mark_the_span(exporter):
+    _serve(_app(status=503))
+    server = exporter.get_finished_spans()[-1]
+    assert server.attributes["http.response.status_code"] == 503
+    assert server.status.status_code == StatusCode.ERROR
+
+
+@pytest.mark.parametrize("exporter", [0.0], indirect=True)
+def test_unsampled_request_opens_no_db_span(exporter):
+    opened = []
+
+    async def app(scope, receive, send):
+        with crewai_tracing.db_span("SELECT", "SELECT 1") as span:
+            opened.append(span)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    _serve(crewai_tracing.TracingMiddleware(app, route_resolver=lambda scope: "/processes/{process_id}"))
+    assert opened == [None]
+    assert exporter.get_finished_spans() == ()
+
+
+def test_unsampled_parent_is_followed_whatever_the_ratio(exporter):
+    _serve(_app(), headers=[("traceparent", f"00-{TRACE_ID}-{PARENT_ID}-00")])
+    assert exporter.get_finished_spans() == ()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for heartbeat aggregation and phi-accrual failure detection
+"""
+
+from agent_enums import AgentStatus
+from heartbeat import HeartbeatMonitor, phi
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _run(monitor, clock, until, beating=(), interval=1.0):
+    """Advance in 0.1s steps, heartbeating ``beating`` agents every ``interval``"""
+    expired = []
+    next_beat = clock.now + interval
+    while clock.now < until:
+        clock.now = round(clock.now + 0.1, 6)
+        if clock.now >= next_beat:
+            for agent_id in beating:
+                monitor.record(agent_id)
+            next_beat += interval
+        expired.extend(monitor.tick())
+    return expired
+
+
+def test_phi_grows_with_silence():
+    values = [phi(t, 1.0, 0.2) for t in (0.5, 1.0, 1.5, 2.0, 3.0)]
+    assert values == sorted(values)
+    assert values[1] < 0.5 < values[3]
+
+
+def test_silent_agent_expires_and_recovers():
+    clock = FakeClock()
+    monitor = HeartbeatMonitor(expected_interval=1.0, min_std=0.1, wheel_tick=0.1, clock=clock)
+    monitor.register("alive")
+    monitor.register("dead")
+
+    assert _run(monitor, clock, 10.0, beating=["alive", "dead"]) == []
+    assert monitor.health("dead") == "healthy"
+
+    expired = _run(monitor, clock, 20.0, beating=["alive"])
+    assert expired == ["dead"]
+    assert monitor.status("dead") == AgentStatus.OFFLINE
+    assert monitor.status("alive") == AgentStatus.IDLE
+    assert monitor.health("dead") == "unhealthy"
+
+    monitor.record("dead", status=AgentStatus.BUSY)
+    assert monitor.status("dead") == AgentStatus.BUSY
+    assert _run(monitor, clock, 30.0, beating=["alive", "dead"]) == []
+
+
+def test_only_transitions_are_drained():
+    clock = FakeClock()
+    monitor = HeartbeatMonitor(expected_interval=1.0, wheel_tick=0.1, clock=clock)
+    for _ in range(5):
+        clock.now += 1.0
+        monitor.record("a", status=AgentStatus.IDLE, cpu_percent=10.0)
+    monitor.record("a", status=AgentStatus.BUSY, active_tasks=2)
+
+    assert [(t[0], t[1], t[2]) for t in monitor.drain_transitions()] == [
+        ("a", AgentStatus.IDLE, AgentStatus.BUSY)]
+    assert monitor.drain_transitions() == []
+    assert monitor.load("a") == {"cpu_percent": 10.0, "memory_percent": 0.0, "active_tasks": 2}
+
+
+def test_deregistered_slot_is_reused_without_stale_expiry():
+    clock = FakeClock()
+    monitor = HeartbeatMonitor(expected_interval=1.0, wheel_tick=0.1, clock=clock)
+    monitor.register("old")
+    monitor.deregister("old")
+    monitor.register("new")
+    clock.now = 1.5
+    assert monitor.tick() == []
+    assert "old" not in monitor and len(monitor) == 1
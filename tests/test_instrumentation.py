@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Tests for the CrewAI API's HTTP instrumentation and multi-worker process metrics
+"""
+
+import asyncio
+import contextvars
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+pytest.importorskip("prometheus_client")
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "infra", "crewai"))
+
+from prometheus_client import CollectorRegistry, Counter, ProcessCollector, generate_latest
+
+from instrumentation import (UNMATCHED_ROUTE, HTTPMetricsMiddleware, WorkerProcessCollector,
+                             starlette_route_resolver, timed_cursor, track_db)
+
+
+def _resolver(scope):
+    return "/processes/{process_id}" if scope["path"].startswith("/processes/") else UNMATCHED_ROUTE
+
+
+def _middleware(app):
+    registry = CollectorRegistry()
+    counter = Counter("crewai_requests_total", "Total requests", ["method", "endpoint"], registry=registry)
+    middleware = HTTPMetricsMiddleware(app, registry=registry, request_counter=counter, route_resolver=_resolver)
+    return middleware, registry
+
+
+async def _serve(middleware, method, path, body_chunks=(b"",)):
+    chunks = list(body_chunks)
+    sent = []
+
+    async def receive():
+        body = chunks.pop(0)
+        return {"type": "http.request", "body": body, "more_body": bool(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware({"type": "http", "method": method, "path": path}, receive, send)
+    return sent
+
+
+def _latency_count(registry, method, route, status):
+    return registry.get_sample_value("crewai_http_request_duration_seconds_count",
+                                     {"method": method, "route": route, "status": status})
+
+
+def test_requests_are_labelled_by_route_template_and_status():
+    async def app(scope, receive, send):
+        status = 200 if scope["path"].startswith("/processes/") else 404
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    middleware, registry = _middleware(app)
+    for path in ("/processes/1", "/processes/2", "/nope"):
+        asyncio.run(_serve(middleware, "GET", path))
+
+    assert _latency_count(registry, "GET", "/processes/{process_id}", "200") == 2
+    assert _latency_count(registry, "GET", UNMATCHED_ROUTE, "404") == 1
+    assert registry.get_sample_value("crewai_requests_total",
+                                     {"method": "GET", "endpoint": "/processes/{process_id}"}) == 2
+    assert "/processes/1" not in generate_latest(registry).decode()
+
+
+def test_in_flight_is_balanced_when_the_app_raises():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(registry.get_sample_value("crewai_http_requests_in_flight", labels))
+        if scope["path"] == "/processes/late":
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+        raise RuntimeError("boom")
+
+    labels = {"method": "POST", "route": "/processes/{process_id}"}
+    middleware, registry = _middleware(app)
+    for path in ("/processes/early", "/processes/late"):
+        with pytest.raises(RuntimeError):
+            asyncio.run(_serve(middleware, "POST", path))
+
+    assert seen == [1, 1]
+    assert registry.get_sample_value("crewai_http_requests_in_flight", labels) == 0
+    # Failing before the response counts as a 500; after it, as the status sent
+    assert _latency_count(registry, "POST", "/processes/{process_id}", "500") == 1
+    assert _latency_count(registry, "POST", "/processes/{process_id}", "200") == 1
+
+
+def test_request_and_response_bytes_are_counted_over_chunks():
+    async def app(scope, receive, send):
+        while (await receive())["more_body"]:
+            pass
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b"x" * 100, "more_body": True})
+        await send({"type": "http.response.body", "body": b"y" * 28})
+
+    middleware, registry = _middleware(app)
+    asyncio.run(_serve(middleware, "POST", "/processes/new", body_chunks=(b"a" * 300, b"b" * 12)))
+
+    labels = {"method": "POST", "route": "/processes/{process_id}"}
+    assert registry.get_sample_value("crewai_http_request_size_bytes_sum", labels) == 312
+    assert registry.get_sample_value("crewai_http_response_size_bytes_sum", dict(labels, status="201")) == 128
+
+
+def test_db_time_accumulates_over_tracked_blocks_and_timed_cursors():
+    class SlowCursor:
+        def execute(self, query, vars=None):
+            time.sleep(0.02)
+
+        def executemany(self, query, vars_list):
+            time.sleep(0.02)
+
+    cursor = timed_cursor(SlowCursor)()
+
+    async def app(scope, receive, send):
+        with track_db():
+            time.sleep(0.02)
+        cursor.execute("SELECT 1")
+        # Threadpool endpoints run with a copy of the request's context
+        await asyncio.get_running_loop().run_in_executor(None, contextvars.copy_context().run,
+                                                         cursor.executemany, "INSERT", [])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+        # Work after the last body chunk is not charged to the request
+        with track_db():
+            time.sleep(0.2)
+
+    middleware, registry = _middleware(app)
+    asyncio.run(_serve(middleware, "GET", "/processes/1"))
+
+    labels = {"method": "GET", "route": "/processes/{process_id}"}
+    db = registry.get_sample_value("crewai_http_db_duration_seconds_sum", labels)
+    assert 0.06 <= db < 0.2
+    assert type(cursor).__name__ == "TimedSlowCursor"
+    # Outside a request nothing is recorded and nothing fails
+    cursor.execute("SELECT 3")
+
+
+def test_starlette_route_resolver():
+    pytest.importorskip("starlette")
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+
+    async def endpoint(request):
+        pass
+
+    app = Starlette(routes=[Route("/processes/{process_id}", endpoint, methods=["GET"])])
+
+    def resolve(method, path):
+        return starlette_route_resolver({"type": "http", "method": method, "path": path, "root_path": "", "app": app})
+
+    assert resolve("GET", "/processes/7") == "/processes/{process_id}"
+    # Right path, wrong method: still the template
+    assert resolve("DELETE", "/processes/7") == "/processes/{process_id}"
+    assert resolve("GET", "/processes/7/extra") == UNMATCHED_ROUTE
+
+
+def _open_fds(pid):
+    (family,) = [f for f in ProcessCollector(pid=lambda: pid, registry=None).collect() if f.name == "process_open_fds"]
+    return family.samples[0].value
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_process_metrics_are_summed_over_workers(tmp_path):
+    worker = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        # Metric files of a live worker and of one that has exited
+        (tmp_path / f"counter_{worker.pid}.db").touch()
+        (tmp_path / "gauge_livesum_999999999.db").touch()
+        collector = WorkerProcessCollector(path=str(tmp_path))
+        pids = collector.pids()
+        assert worker.pid in pids and os.getpid() in pids and 999999999 not in pids
+
+        registry = CollectorRegistry()
+        registry.register(collector)
+        text = generate_latest(registry).decode()
+        assert "process_resident_memory_bytes " in text
+        summed = registry.get_sample_value("process_open_fds")
+        assert summed == sum(_open_fds(pid) for pid in pids)
+        assert registry.get_sample_value("process_cpu_seconds_total") is not None
+    finally:
+        worker.kill()
+        worker.wait()
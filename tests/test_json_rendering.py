@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for list endpoints rendered to JSON by Postgres
+"""
+
+import importlib
+import importlib.util
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("fastapi")
+pytest.importorskip("opentelemetry.sdk")
+
+CREWAI_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "infra", "crewai")
+sys.path.append(CREWAI_DIR)
+
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+
+
+@pytest.fixture
+def json_rendering(monkeypatch):
+    """json_rendering, bound to the CrewAI tracing module rather than proto/tracing.py"""
+    spec = importlib.util.spec_from_file_location("tracing", os.path.join(CREWAI_DIR, "tracing.py"))
+    tracing = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tracing)
+    monkeypatch.setitem(sys.modules, "tracing", tracing)
+    sys.modules.pop("json_rendering", None)
+    yield importlib.import_module("json_rendering")
+    sys.modules.pop("json_rendering", None)
+
+
+class FakeConnection:
+    """Opens cursors with RealDictCursor unless told otherwise, like the API's connections"""
+
+    def __init__(self, text):
+        self.text = text
+        self.factories = []
+
+    def cursor(self, cursor_factory=RealDictCursor):
+        self.factories.append(cursor_factory)
+        return FakeCursor(self.text, cursor_factory)
+
+
+class FakeCursor:
+    def __init__(self, text, factory):
+        self.text = text
+        self.factory = factory
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        pass
+
+    def fetchone(self):
+        return {"coalesce": self.text} if self.factory is RealDictCursor else (self.text,)
+
+
+def test_json_array_query(json_rendering):
+    assert json_rendering.json_array_query("agents", "created_at DESC") == (
+        "SELECT COALESCE(json_agg(t ORDER BY t.created_at DESC), '[]')::text FROM agents t")
+
+
+def test_fetch_json_array_returns_utf8_bytes_from_a_plain_cursor(json_rendering):
+    conn = FakeConnection('[{"name": "Ärztin", "tools": ["web_search"]}]')
+    body = json_rendering.fetch_json_array(conn, json_rendering.json_array_query("agents", "id"))
+    assert body == '[{"name": "Ärztin", "tools": ["web_search"]}]'.encode("utf-8")
+    assert conn.factories == [psycopg2.extensions.cursor]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Tests for the GetMetrics rollup store
+"""
+
+import math
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from metrics_store import HistogramAggregate, MetricsStore
+
+BOUNDS = (0.1, 1.0, math.inf)
+
+
+def _store():
+    clock = [0.0]
+    return MetricsStore(resolutions=((10, 6), (60, 10)), clock=lambda: clock[0]), clock
+
+
+def test_counter_increase_survives_restarts_and_rolls_up_fleet():
+    store, clock = _store()
+    for ts, a, b in [(0, 100, 5), (10, 110, 7), (20, 4, 9), (30, 10, 10)]:
+        clock[0] = ts
+        store.record_counter("a", "requests", a, ts)
+        store.record_counter("b", "requests", b, ts)
+
+    # 10 + 4 (restart) + 6 for a, 2 + 2 + 1 for b
+    assert store.get_metrics("a", ["requests"], 0, 30)["counters"] == {"requests": 20}
+    assert store.get_metrics("", ["requests"], 0, 30)["counters"] == {"requests": 25}
+
+
+def test_gauge_rollup_and_resolution_choice():
+    store, clock = _store()
+    for ts in range(0, 300, 5):
+        store.record_gauge("a", "cpu", float(ts), ts)
+    clock[0] = 300
+
+    recent = store.query("cpu", 250, 300, "a")
+    assert recent["resolution"] == 10
+    assert recent["rollup"]["min"] == 250 and recent["rollup"]["max"] == 295
+    assert recent["rollup"]["last"] == 295
+
+    # Older than the 10s tier keeps, so the 1m tier answers
+    whole = store.query("cpu", 0, 300, "a")
+    assert whole["resolution"] == 60
+    assert whole["rollup"]["samples"] == 60
+    assert whole["rollup"]["avg"] == pytest.approx(147.5)
+
+
+def test_histograms_merge_across_time_and_agents():
+    store, clock = _store()
+    store.record_histogram("a", "latency", BOUNDS, [0, 0, 0], 0.0, 0, 0)
+    store.record_histogram("b", "latency", BOUNDS, [0, 0, 0], 0.0, 0, 0)
+    store.record_histogram("a", "latency", BOUNDS, [8, 2, 0], 1.0, 10, 10)
+    store.record_histogram("b", "latency", BOUNDS, [0, 9, 1], 9.0, 10, 20)
+    clock[0] = 30
+
+    fleet = store.query("latency", 0, 30)["rollup"]["histogram"]
+    assert fleet.counts == [8, 11, 1] and fleet.count == 20 and fleet.sum == 10.0
+    assert store.get_metrics("a", ["latency"], 0, 30)["histograms"]["latency"]["counts"] == [8, 2, 0]
+
+    with pytest.raises(ValueError):
+        store.record_histogram("a", "latency", (1.0, math.inf), [1, 1], 1.0, 2, 40)
+
+
+def test_histogram_quantile_interpolates():
+    histogram = HistogramAggregate((1.0, 2.0, math.inf), [50, 50, 0])
+    assert histogram.quantile(0.5) == pytest.approx(1.0)
+    assert histogram.quantile(0.75) == pytest.approx(1.5)
+    with pytest.raises(ValueError):
+        histogram.merge(HistogramAggregate((1.0, math.inf)))
+
+
+def _timestamp(seconds):
+    ts = Timestamp()
+    ts.FromSeconds(seconds)
+    return ts
+
+
+def test_proto_timestamps_are_utc_whatever_the_local_zone(monkeypatch):
+    if not hasattr(time, "tzset"):
+        pytest.skip("needs time.tzset")
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        store, clock = _store()
+        clock[0] = 1000
+        has_field = lambda field: True
+        store.ingest(SimpleNamespace(agent_id="a", timestamp=_timestamp(995), counters={}, gauges={"cpu": 40.0},
+                                     histograms={}, HasField=has_field))
+        assert store.get_metrics("a", ["cpu"], 990, 1000)["gauges"] == {"cpu": 40.0}
+
+        store.record_gauge("a", "memory", 70.0, 998)
+        request = SimpleNamespace(agent_id="a", metric_names=["memory"], start_time=_timestamp(990),
+                                  end_time=_timestamp(1000), HasField=has_field)
+        assert store.get_metrics_request(request)["gauges"] == {"memory": 70.0}
+    finally:
+        monkeypatch.undo()
+        time.tzset()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for chunked TaskResult payload encoding
+"""
+
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from payload_codec import GZIP, IDENTITY, ChunkAssembler, WireStats, encode_chunks
+
+
+def _chunks(payload, **kwargs):
+    return [SimpleNamespace(**{"encoding": "", "total_size": 0, "sha256": b"", "last": False, **fields})
+            for fields in encode_chunks("t1", payload, **kwargs)]
+
+
+def test_compressible_payload_round_trips_through_chunks():
+    payload = b"+ line of a large code diff\n" * 50_000
+    stats = WireStats()
+    chunks = _chunks(payload, chunk_size=256, encoding=GZIP, stats=stats)
+    assert chunks[0].encoding == GZIP and chunks[-1].last and len(chunks) > 1
+    assert stats.upload_wire < stats.upload_payload / 10
+
+    assembler = ChunkAssembler()
+    results = [assembler.add(chunk) for chunk in chunks]
+    assert results[:-1] == [None] * (len(chunks) - 1) and results[-1] == payload
+
+
+def test_incompressible_payload_is_sent_as_is():
+    payload = os.urandom(10_000)
+    chunks = _chunks(payload, chunk_size=4096, encoding=GZIP)
+    assert chunks[0].encoding == IDENTITY and len(chunks) == 3
+
+
+def test_assembler_rejects_bad_uploads():
+    payload = b"x" * 10_000
+    chunks = _chunks(payload, chunk_size=1000, encoding=IDENTITY)
+
+    with pytest.raises(ValueError, match="Expected chunk 1"):
+        assembler = ChunkAssembler()
+        assembler.add(chunks[0])
+        assembler.add(chunks[2])
+
+    with pytest.raises(ValueError, match="exceeds"):
+        ChunkAssembler(max_size=5_000).add(chunks[0])
+
+    chunks[-1].sha256 = b"0" * 32
+    assembler = ChunkAssembler()
+    with pytest.raises(ValueError, match="checksum"):
+        for chunk in chunks:
+            assembler.add(chunk)
+
+
+def test_gzip_bomb_is_bounded_by_declared_size():
+    chunks = _chunks(b"\0" * 1_000_000, encoding=GZIP)
+    chunks[0].total_size = 1000
+    with pytest.raises(ValueError, match="exceeds"):
+        ChunkAssembler().add(chunks[0])
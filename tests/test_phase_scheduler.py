@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for the scaling test phase scheduler
+"""
+
+import asyncio
+
+import pytest
+
+from phase_scheduler import EXCLUSIVE, SHARED, Phase, PhaseScheduler
+
+
+def _recorder(name, log, delay=0.01, result=None):
+    async def run():
+        log.append(("start", name))
+        await asyncio.sleep(delay)
+        log.append(("end", name))
+        return dict(result or {"test_name": name})
+    return run
+
+
+def test_exclusive_phases_never_overlap():
+    log = []
+    scheduler = PhaseScheduler([
+        Phase("discovery", _recorder("discovery", log), isolation=SHARED),
+        Phase("observability", _recorder("observability", log), isolation=SHARED),
+        Phase("load", _recorder("load", log), depends_on=["discovery"], isolation=EXCLUSIVE),
+        Phase("resilience", _recorder("resilience", log), depends_on=["discovery"], isolation=EXCLUSIVE),
+    ])
+    results = asyncio.run(scheduler.run())
+
+    assert [r["test_name"] for r in results] == ["discovery", "observability", "load", "resilience"]
+    # Shared phases ran together, exclusive ones strictly one after another
+    assert log[:2] == [("start", "discovery"), ("start", "observability")]
+    assert log[4:] == [("start", "load"), ("end", "load"), ("start", "resilience"), ("end", "resilience")]
+    assert results[0]["phase"]["concurrent_with"] == ["observability"]
+    assert results[2]["phase"]["concurrent_with"] == []
+    assert results[2]["phase"]["wall_time"] > 0
+
+
+def test_failed_dependency_skips_dependents():
+    log = []
+    scheduler = PhaseScheduler([
+        Phase("discovery", _recorder("discovery", log, result={"error": "no DNS"})),
+        Phase("load", _recorder("load", log), depends_on=["discovery"]),
+    ])
+    results = asyncio.run(scheduler.run())
+
+    assert results[1]["status"] == "SKIPPED"
+    assert ("start", "load") not in log
+
+
+def test_failed_status_skips_dependents():
+    log = []
+    scheduler = PhaseScheduler([
+        Phase("discovery", _recorder("discovery", log, result={"test_name": "discovery", "status": "FAILED"}),
+              isolation=SHARED),
+        Phase("load", _recorder("load", log), depends_on=["discovery"]),
+    ])
+    results = asyncio.run(scheduler.run())
+    assert results[1]["status"] == "SKIPPED"
+    assert ("start", "load") not in log
+
+
+def test_exceptions_become_error_results():
+    async def boom():
+        raise RuntimeError("boom")
+
+    results = asyncio.run(PhaseScheduler([Phase("boom", boom)]).run())
+    assert results[0]["status"] == "ERROR"
+    assert results[0]["error"] == "boom"
+
+
+def test_rejects_cycles_and_unknown_dependencies():
+    noop = _recorder("noop", [])
+    with pytest.raises(ValueError):
+        PhaseScheduler([Phase("a", noop, depends_on=["b"]), Phase("b", noop, depends_on=["a"])])
+    with pytest.raises(ValueError):
+        PhaseScheduler([Phase("a", noop, depends_on=["missing"])])
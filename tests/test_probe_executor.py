@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for probe phase timings and the shared-pool prober
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from aiohttp import web
+
+from probe_executor import ProbeExecutor
+
+phase_timings = ProbeExecutor._phase_timings
+
+
+def test_fresh_connection_splits_dns_connect_and_http():
+    ctx = {"dns_start": 10.1, "dns_end": 10.3, "connect_start": 10.0, "connect_end": 10.5}
+    timings = phase_timings(ctx, started_at=10.0, finished_at=11.0)
+    assert timings["dns_resolution"] == "PASS" and not timings["connection_reused"]
+    assert timings["dns_time"] == pytest.approx(0.2)
+    # Connection creation includes the lookup, which is only counted once
+    assert timings["connect_time"] == pytest.approx(0.3)
+    assert timings["http_time"] == pytest.approx(0.5) and timings["total_time"] == pytest.approx(1.0)
+
+
+def test_reused_connection_is_all_http():
+    timings = phase_timings({"connection_reused": True}, started_at=5.0, finished_at=5.25)
+    assert timings["dns_resolution"] == "CACHED" and timings["connection_reused"]
+    assert timings["dns_time"] == timings["connect_time"] == 0.0
+    assert timings["http_time"] == pytest.approx(0.25)
+
+
+def test_dns_cache_hit_still_times_the_connect():
+    ctx = {"dns_cached": True, "connect_start": 1.0, "connect_end": 1.1}
+    timings = phase_timings(ctx, started_at=1.0, finished_at=1.4)
+    assert timings["dns_resolution"] == "CACHED" and timings["dns_time"] == 0.0
+    assert timings["connect_time"] == pytest.approx(0.1) and timings["http_time"] == pytest.approx(0.3)
+
+
+def test_missing_timestamps():
+    # The lookup never finished: it runs until the probe gave up
+    failed = phase_timings({"dns_start": 2.0, "connect_start": 2.0}, started_at=2.0, finished_at=7.0)
+    assert failed["dns_resolution"] == "FAIL" and failed["dns_time"] == pytest.approx(5.0)
+    assert failed["connect_time"] == 0.0 and failed["http_time"] == 0.0
+
+    # No hooks fired, e.g. the request failed before connecting
+    skipped = phase_timings({}, started_at=0.0, finished_at=0.5)
+    assert skipped["dns_resolution"] == "SKIPPED"
+    assert skipped["dns_time"] == skipped["connect_time"] == 0.0 and skipped["http_time"] == 0.5
+
+
+def test_probes_share_the_connection_pool():
+    async def health(request):
+        return web.json_response({"status": "healthy"})
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/health", health)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            async with ProbeExecutor(concurrency=1) as probes:
+                first = await probes.probe(f"http://127.0.0.1:{port}/health", read_body=True)
+                second = await probes.probe(f"http://127.0.0.1:{port}/health")
+                missing = await probes.probe(f"http://127.0.0.1:{port}/nope")
+        finally:
+            await runner.cleanup()
+        return first, second, missing
+
+    first, second, missing = asyncio.run(run())
+    assert first["status_code"] == 200 and first["body"] == {"status": "healthy"}
+    assert not first["connection_reused"] and second["connection_reused"]
+    assert missing["status_code"] == 404 and "error" not in missing
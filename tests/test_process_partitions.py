@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for processes partition maintenance, against a scripted cursor
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "infra", "crewai"))
+
+from process_partitions import _parse_bound, archive_expired_partitions, ensure_partitions, process_lookup
+
+NOW = datetime(2026, 10, 19, 15, 30)
+
+
+class FakeConnection:
+    """Returns scripted fetch results in order and records every statement"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.executed = []
+        self.commits = 0
+        self.autocommit = False
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.executed.append((query, params))
+
+    def fetchone(self):
+        return self.conn.results.pop(0)
+
+    def fetchall(self):
+        return self.conn.results.pop(0)
+
+
+def _bound(lower, upper):
+    return f"FOR VALUES FROM ({lower}) TO ({upper})"
+
+
+def test_parse_bound():
+    assert _parse_bound("MINVALUE") is None and _parse_bound("MAXVALUE") is None
+    assert _parse_bound("'2026-10-19 00:00:00'") == datetime(2026, 10, 19)
+
+
+def test_lookup_in_a_closed_partition_is_bounded_on_both_sides():
+    conn = FakeConnection((1, datetime(2026, 10, 18), datetime(2026, 10, 19)))
+    where, params = process_lookup(conn, 42)
+    assert where == "id = %s AND created_at >= %s AND created_at < %s"
+    assert params == [42, datetime(2026, 10, 18), datetime(2026, 10, 19)]
+
+
+def test_lookup_in_the_legacy_partition_has_no_lower_bound():
+    conn = FakeConnection((2, None, datetime(2026, 10, 19)))
+    assert process_lookup(conn, 7) == ("id = %s AND created_at < %s", [7, datetime(2026, 10, 19)])
+
+
+def test_unknown_id_can_only_be_in_an_open_partition():
+    conn = FakeConnection((0, None, None), (datetime(2026, 10, 19),))
+    assert process_lookup(conn, 99) == ("id = %s AND created_at >= %s", [99, datetime(2026, 10, 19)])
+
+
+def test_lookup_without_closed_partitions_is_by_id_only():
+    conn = FakeConnection((0, None, None), (None,))
+    assert process_lookup(conn, 1) == ("id = %s", [1])
+
+
+def _created(conn):
+    return [params for query, params in conn.executed if params]
+
+
+def test_ensure_partitions_creates_today_and_the_days_ahead():
+    conn = FakeConnection([])
+    assert ensure_partitions(conn, days_ahead=2, now=NOW) == [
+        "processes_p20261019", "processes_p20261020", "processes_p20261021"]
+    assert _created(conn)[0] == (datetime(2026, 10, 19), datetime(2026, 10, 20))
+    assert conn.commits == 1
+
+
+def test_ensure_partitions_skips_days_any_partition_overlaps():
+    conn = FakeConnection([
+        ("processes_legacy", _bound("MINVALUE", "'2026-10-20 00:00:00'")),
+        ("processes_p20261021", _bound("'2026-10-21 00:00:00'", "'2026-10-22 00:00:00'")),
+        # Covers the second half of the 22nd, so a daily partition there would overlap it
+        ("processes_odd", _bound("'2026-10-22 12:00:00'", "'2026-10-23 00:00:00'")),
+    ])
+    assert ensure_partitions(conn, days_ahead=4, now=NOW) == ["processes_p20261020", "processes_p20261023"]
+
+
+def test_ensure_partitions_stops_at_an_open_ended_partition():
+    conn = FakeConnection([("processes_rest", _bound("'2026-10-20 00:00:00'", "MAXVALUE"))])
+    assert ensure_partitions(conn, days_ahead=3, now=NOW) == ["processes_p20261019"]
+
+
+def test_partition_left_pending_detach_is_finalized(tmp_path):
+    conn = FakeConnection(
+        [("processes_p20261001",)],
+        [
+            ("processes_p20261001", _bound("'2026-10-01 00:00:00'", "'2026-10-02 00:00:00'")),
+            ("processes_p20261002", _bound("'2026-10-02 00:00:00'", "'2026-10-03 00:00:00'")),
+            ("processes_p20261019", _bound("'2026-10-19 00:00:00'", "'2026-10-20 00:00:00'")),
+        ],
+        # Nothing is left detached, so nothing is exported
+        [],
+    )
+    assert archive_expired_partitions(conn, retention_days=7, archive_dir=str(tmp_path), now=NOW) == []
+    detaches = [repr(query) for query, _ in conn.executed if "DETACH" in repr(query)]
+    assert len(detaches) == 2
+    assert "processes_p20261001" in detaches[0] and "FINALIZE" in detaches[0]
+    assert "processes_p20261002" in detaches[1] and "CONCURRENTLY" in detaches[1]
+    assert conn.autocommit is False
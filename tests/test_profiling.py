@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the on-demand sampling profiler
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from profiling import ProfilerBusy, StackSampler, profile, token_matches
+
+
+def busy_worker(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_collapses_stacks_of_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_worker, args=(stop,), name="busy")
+    worker.start()
+    sampler = StackSampler(interval=0.002)
+    sampler.start()
+    time.sleep(0.2)
+    sampler.stop()
+    stop.set()
+    worker.join()
+
+    lines = sampler.collapsed().splitlines()
+    assert sampler.samples > 10
+    busy = [line for line in lines if line.startswith("busy;")]
+    assert busy and all("busy_worker (" in line for line in busy)
+    # Every line ends in a sample count, and the sampler never samples itself
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert not any(line.startswith("stack-sampler;") for line in lines)
+
+
+def test_distinct_stacks_are_capped():
+    sampler = StackSampler(max_stacks=0)
+    sampler._sample(own_ident=-1)
+    assert {stack for _, stack in sampler.counts} == {"[truncated]"}
+
+
+def test_profile_reports_loop_lag_and_pending_tasks():
+    async def blocking():
+        while True:
+            time.sleep(0.02)
+            await asyncio.sleep(0)
+
+    async def run():
+        task = asyncio.create_task(blocking(), name="blocking")
+        try:
+            return await profile(seconds=0.3)
+        finally:
+            task.cancel()
+
+    result = asyncio.run(run())
+    assert result["samples"] > 0 and "blocking (" in result["collapsed"]
+    assert result["event_loop_lag"]["max"] >= 0.005
+    assert [task["name"] for task in result["tasks"]["tasks"]] == ["blocking"]
+
+
+def test_only_one_profile_runs_at_a_time():
+    async def run():
+        first = asyncio.ensure_future(profile(seconds=0.2))
+        await asyncio.sleep(0)
+        with pytest.raises(ProfilerBusy):
+            await profile(seconds=0.1)
+        return await first
+
+    assert asyncio.run(run())["samples"] > 0
+
+
+def test_token_matches_only_the_configured_token():
+    assert token_matches("s3cret", "s3cret")
+    assert not token_matches("s3cret", "s3cre")
+    assert not token_matches("s3cret", None)
+    # No token configured: the endpoint stays closed, even to an empty header
+    assert not token_matches(None, None)
+    assert not token_matches("", "")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Tests for the replica watch tracker using a fake watch source
+"""
+
+import asyncio
+import threading
+
+from replica_watch import ReplicaWatchTracker, load_scale_targets
+
+
+def _event(name, replicas, ready, event_type="MODIFIED"):
+    return {
+        "type": event_type,
+        "object": {
+            "metadata": {"name": name},
+            "spec": {"replicas": replicas},
+            "status": {"readyReplicas": ready},
+        },
+    }
+
+
+def test_scale_targets_match_keda_scalers():
+    targets = load_scale_targets()
+    assert "ai-agent-coding-deployment" in targets
+    assert targets["ai-agent-coding-deployment"]["min_replicas"] == 5
+    assert targets["ai-agent-coding-deployment"]["max_replicas"] == 100
+    assert all(name.endswith("-deployment") for name in targets)
+    # Only the coding scaler has a request-rate trigger
+    assert targets["ai-agent-coding-deployment"]["rps_per_replica"] == 10.0
+    assert targets["ai-agent-testing-deployment"]["rps_per_replica"] is None
+
+
+def test_reaction_times_and_overshoot():
+    tracker = ReplicaWatchTracker(["coding"])
+    tracker.observe(_event("coding", 5, 5, "ADDED"), timestamp=0.0)
+    tracker.mark_load(500, timestamp=10.0)
+    tracker.observe(_event("coding", 5, 5), timestamp=12.0)  # no change, ignored
+    tracker.observe(_event("coding", 10, 5), timestamp=40.0)
+    tracker.observe(_event("coding", 10, 8), timestamp=55.0)
+    tracker.observe(_event("coding", 10, 10), timestamp=70.0)
+    tracker.observe(_event("other", 3, 3), timestamp=71.0)  # untracked
+
+    result = tracker.summary()["coding"]
+    assert result["initial_replicas"] == 5
+    assert result["target_replicas"] == 10
+    assert result["time_to_first_scale"] == 30.0
+    assert result["time_to_target"] == 60.0
+    assert result["overshoot"] == 0
+    assert result["changes"] == 3
+
+
+def test_overshoot_against_load_curve():
+    tracker = ReplicaWatchTracker(["coding"])
+    tracker.observe(_event("coding", 2, 2), timestamp=0.0)
+    tracker.mark_load(100, timestamp=1.0)
+    tracker.observe(_event("coding", 6, 6), timestamp=20.0)
+    tracker.mark_load(0, timestamp=30.0)
+    tracker.observe(_event("coding", 6, 6, "ADDED"), timestamp=35.0)
+    tracker.observe(_event("coding", 6, 5), timestamp=36.0)
+
+    result = tracker.summary(rps_per_replica=25)["coding"]
+    assert result["target_replicas"] == 4
+    assert result["time_to_target"] == 19.0
+    # 5 ready after load dropped to 0 against a baseline of 2
+    assert result["overshoot"] == 3
+
+
+def test_rps_per_replica_per_deployment():
+    tracker = ReplicaWatchTracker(["coding", "testing"])
+    tracker.observe(_event("coding", 2, 2), timestamp=0.0)
+    tracker.observe(_event("testing", 3, 3), timestamp=0.0)
+    tracker.mark_load(100, timestamp=1.0)
+    tracker.observe(_event("coding", 10, 10), timestamp=20.0)
+    tracker.observe(_event("testing", 7, 7), timestamp=20.0)
+
+    result = tracker.summary(rps_per_replica={"coding": 25, "testing": None})
+    assert result["coding"]["target_replicas"] == 4 and result["coding"]["overshoot"] == 6
+    # No request-rate threshold: the target is what KEDA asked for
+    assert result["testing"]["target_replicas"] == 7 and result["testing"]["overshoot"] == 0
+
+
+def test_unobserved_deployment():
+    tracker = ReplicaWatchTracker(["coding", "testing"])
+    tracker.observe(_event("coding", 1, 1), timestamp=0.0)
+    assert tracker.summary(load_start=0.0)["testing"] == {"observed": False}
+
+
+def test_watch_drains_fake_source():
+    tracker = ReplicaWatchTracker(["coding"])
+    events = [_event("coding", 1, 1), _event("coding", 2, 1), _event("coding", 2, 2)]
+
+    async def run():
+        stop = asyncio.Event()
+        await asyncio.wait_for(tracker.watch(iter(events), stop), timeout=5)
+        # Let callbacks scheduled from the watch thread run
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert [s[1:] for s in tracker.timeline["coding"]] == [(1, 1), (2, 1), (2, 2)]
+
+
+def test_stop_closes_a_blocked_watch():
+    class BlockingSource:
+        def __init__(self):
+            self.stopped = threading.Event()
+
+        def __iter__(self):
+            yield _event("coding", 1, 1)
+            self.stopped.wait(5)
+
+        def stop(self):
+            self.stopped.set()
+
+    tracker = ReplicaWatchTracker(["coding"])
+    source = BlockingSource()
+
+    async def run():
+        stop = asyncio.Event()
+        watching = asyncio.create_task(tracker.watch(source, stop))
+        await asyncio.sleep(0.2)
+        stop.set()
+        await asyncio.wait_for(watching, timeout=1)
+
+    asyncio.run(run())
+    assert source.stopped.is_set()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for single-flight request coalescing
+"""
+
+import asyncio
+
+import pytest
+
+from request_coalescing import BatchLoader
+
+
+class RecordingFetch:
+    def __init__(self, missing=(), fail=False):
+        self.calls = []
+        self.missing = set(missing)
+        self.fail = fail
+
+    async def __call__(self, keys):
+        self.calls.append(list(keys))
+        await asyncio.sleep(0.001)
+        if self.fail:
+            raise ConnectionError("unavailable")
+        return {key: f"value-{key}" for key in keys if key not in self.missing}
+
+
+def test_duplicate_and_distinct_keys_share_one_fetch():
+    fetch = RecordingFetch()
+
+    async def run():
+        loader = BatchLoader(fetch)
+        results = await asyncio.gather(*(loader.load(key) for key in ["a", "b", "a", "c", "a"]))
+        return loader, results
+
+    loader, results = asyncio.run(run())
+    assert results == ["value-a", "value-b", "value-a", "value-c", "value-a"]
+    assert fetch.calls == [["a", "b", "c"]]
+    assert loader.stats["coalesced"] == 2 and loader.stats["batches"] == 1
+
+
+def test_batches_split_at_max_batch():
+    fetch = RecordingFetch()
+
+    async def run():
+        loader = BatchLoader(fetch, max_batch=2)
+        return await loader.load_many(["a", "b", "c", "d", "e"])
+
+    assert asyncio.run(run()) == [f"value-{key}" for key in "abcde"]
+    assert fetch.calls == [["a", "b"], ["c", "d"], ["e"]]
+
+
+def test_missing_keys_and_failures_reach_every_waiter():
+    async def run(fetch, keys):
+        loader = BatchLoader(fetch)
+        return await asyncio.gather(*(loader.load(key) for key in keys), return_exceptions=True)
+
+    results = asyncio.run(run(RecordingFetch(missing={"b"}), ["a", "b", "b"]))
+    assert results[0] == "value-a"
+    assert all(isinstance(result, KeyError) for result in results[1:])
+
+    results = asyncio.run(run(RecordingFetch(fail=True), ["a", "a"]))
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+def test_cancelled_caller_does_not_cancel_shared_lookup():
+    fetch = RecordingFetch()
+
+    async def run():
+        loader = BatchLoader(fetch)
+        first = asyncio.ensure_future(loader.load("a"))
+        second = asyncio.ensure_future(loader.load("a"))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(run()) == "value-a"
+    assert fetch.calls == [["a"]]
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the bin-packing resource allocator
+"""
+
+import random
+
+from resource_allocator import ResourceAllocator, Resources
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _allocator(clock=None):
+    allocator = ResourceAllocator(clock=clock or FakeClock())
+    allocator.add_node("small", Resources(4, 8192, 100))
+    allocator.add_node("large", Resources(32, 65536, 1000, custom_resources={"zone": "a", "nvme": "4"}))
+    return allocator
+
+
+def test_best_fit_uses_tightest_node():
+    allocator = _allocator()
+    assert allocator.allocate("agent-1", Resources(2, 4096)).node_id == "small"
+    assert allocator.allocate("agent-2", Resources(8, 16384)).node_id == "large"
+    assert allocator.allocate("agent-3", Resources(64, 1024)) is None
+
+
+def test_custom_resources_and_labels():
+    allocator = _allocator()
+    req = Resources(1, 1024, custom_resources={"zone": "a", "nvme": "3"})
+    assert allocator.allocate("agent-1", req).node_id == "large"
+    assert allocator.allocate("agent-2", req) is None  # only 1 nvme left
+    assert allocator.allocate("agent-3", Resources(1, 1024, custom_resources={"zone": "b"})) is None
+
+
+def test_release_and_ttl_expiry_return_capacity():
+    clock = FakeClock()
+    allocator = _allocator(clock)
+    lease = allocator.allocate("agent-1", Resources(4, 8192), ttl=30)
+    assert lease.expires_at == clock.now + 30
+    assert not allocator.release(lease.allocation_id, agent_id="someone-else")
+
+    clock.now += 31
+    assert allocator.expire() == [lease.allocation_id]
+    assert allocator.agent_allocations("agent-1") == []
+
+    lease = allocator.allocate("agent-1", Resources(4, 8192), ttl=30)
+    clock.now += 20
+    assert allocator.renew(lease.allocation_id, 30)
+    clock.now += 20
+    assert allocator.expire() == []
+    assert allocator.release(lease.allocation_id, agent_id="agent-1")
+    assert allocator.usage()["cpu_usage_percent"] == 0.0
+
+
+def test_expired_lease_is_not_renewed():
+    clock = FakeClock()
+    allocator = _allocator(clock)
+    lease = allocator.allocate("agent-1", Resources(4, 8192), ttl=30)
+    clock.now += 30
+    # Not collected yet, but already past its expiry
+    assert not allocator.renew(lease.allocation_id, 30)
+    assert allocator.expire() == [lease.allocation_id]
+
+
+def test_agent_usage_is_share_of_capacity():
+    allocator = _allocator()
+    allocator.allocate("agent-1", Resources(18, 36864, 110))
+    usage = allocator.usage("agent-1")
+    assert usage["cpu_usage_percent"] == 50.0
+    assert usage["memory_usage_percent"] == 50.0
+    assert usage["storage_usage_percent"] == 10.0
+
+
+def test_batch_is_placed_largest_first():
+    allocator = _allocator()
+    results = allocator.allocate_batch([
+        ("a", Resources(2, 4096), None),
+        ("b", Resources(30, 60000), None),
+        ("c", Resources(4, 8192), None),
+    ])
+    assert [r.node_id for r in results] == ["large", "large", "small"]
+
+
+def test_batch_places_at_least_as_much_as_arrival_order():
+    shapes = [Resources(0.5, 512), Resources(2, 4096), Resources(4, 8192), Resources(12, 4096),
+              Resources(1, 24576), Resources(6, 30000), Resources(20, 16384)]
+    for seed in range(50):
+        rng = random.Random(seed)
+        batch = [(f"agent-{i}", rng.choice(shapes), None) for i in range(rng.randrange(60, 160))]
+        placed = {}
+        for label in ("arrival", "batch"):
+            allocator = ResourceAllocator()
+            for i in range(20):
+                allocator.add_node(f"node-{i}", Resources(32, 65536))
+            if label == "batch":
+                results = allocator.allocate_batch(batch)
+            else:
+                results = [allocator.allocate(agent_id, req, ttl) for agent_id, req, ttl in batch]
+            placed[label] = sum(1 for r in results if r is not None)
+            assert len(allocator) == placed[label]
+        assert placed["batch"] >= placed["arrival"], seed
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for soak test trend analysis
+"""
+
+from soak import SoakTest, is_leaking, linear_trend, parse_prometheus_text, verdict
+
+
+def test_linear_growth_is_flagged():
+    # 50 MB/hour on top of 200 MB, sampled every minute for 4 hours
+    points = [(t * 60.0, 200e6 + 50e6 * t / 60.0) for t in range(240)]
+    trend = linear_trend(points)
+    assert abs(trend["slope_per_hour"] - 50e6) < 1.0
+    assert trend["r2"] > 0.99
+    assert is_leaking(trend)
+
+
+def test_flat_noisy_series_is_not_flagged():
+    points = [(t * 60.0, 100.0 + (3 if t % 2 else -3)) for t in range(240)]
+    assert not is_leaking(linear_trend(points))
+
+
+def test_plateau_after_warmup_is_not_flagged():
+    # Caches fill during the first 10 minutes and then hold steady
+    points = [(t * 60.0, 100.0 + min(t, 10) * 5) for t in range(240)]
+    assert not is_leaking(linear_trend(points))
+
+
+def test_parse_process_metrics():
+    text = "\n".join([
+        "# HELP process_resident_memory_bytes Resident memory size in bytes.",
+        "# TYPE process_resident_memory_bytes gauge",
+        "process_resident_memory_bytes 1.2345e+08",
+        "process_open_fds 42.0",
+        'crewai_requests_total{method="GET",endpoint="/agents"} 7.0',
+    ])
+    values = parse_prometheus_text(text, ["process_resident_memory_bytes", "process_open_fds"])
+    assert values == {"process_resident_memory_bytes": 1.2345e8, "process_open_fds": 42.0}
+
+
+def test_soak_without_process_series_fails(capsys):
+    # What a multi-worker target served before its /metrics summed the workers
+    soak = SoakTest(duration=600)
+    soak.samples = [{"t": t * 60.0, "db_connections": 5, "latency_p50": 0.01, "latency_p95": 0.02} for t in range(10)]
+    report = soak.report()
+    assert report["leaks"] == [] and report["missing"] == ["target_rss_bytes", "target_open_fds"]
+    assert report["status"] == "FAILED"
+    assert verdict(report) == 1
+    out = capsys.readouterr().out
+    assert "No samples for: target_rss_bytes, target_open_fds" in out and "No resource growth" not in out
+
+
+def test_clean_soak_passes(capsys):
+    soak = SoakTest(duration=600)
+    soak.samples = [{"t": t * 60.0, "target_rss_bytes": 1e8, "target_open_fds": 40} for t in range(10)]
+    assert verdict(soak.report()) == 0
+    assert "No resource growth detected" in capsys.readouterr().out
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for tracer provider setup and head sampling defaults
+"""
+
+import os
+
+import pytest
+
+pytest.importorskip("opentelemetry.sdk")
+
+from opentelemetry import trace
+
+from span_export import DEFAULT_SAMPLE_RATIO, configure_tracing
+
+
+@pytest.fixture(autouse=True)
+def keep_global_provider(monkeypatch):
+    monkeypatch.setattr(trace, "set_tracer_provider", lambda provider: None)
+    for name in ("OTEL_TRACES_SAMPLER_ARG", "OTEL_TRACES_FILE", "OTEL_EXPORTER_OTLP_ENDPOINT"):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_file_only_tracing_head_samples(tmp_path):
+    provider = configure_tracing("svc", file_path=str(tmp_path / "spans-{pid}.jsonl"))
+    try:
+        assert f"TraceIdRatioBased{{{DEFAULT_SAMPLE_RATIO}}}" in provider.sampler.get_description()
+        with provider.get_tracer(__name__).start_as_current_span("root", context=None):
+            pass
+    finally:
+        provider.shutdown()
+    assert os.listdir(tmp_path) == [f"spans-{os.getpid()}.jsonl"]
+
+
+def test_collector_export_records_every_trace(monkeypatch):
+    pytest.importorskip("opentelemetry.exporter.otlp.proto.grpc")
+    provider = configure_tracing("svc", otlp_endpoint="localhost:4317")
+    try:
+        # The collector tail-samples; its policies must see every trace
+        assert provider.sampler.get_description() == "ParentBased{root:AlwaysOnSampler,remoteParentSampled:AlwaysOnSampler,remoteParentNotSampled:AlwaysOffSampler,localParentSampled:AlwaysOnSampler,localParentNotSampled:AlwaysOffSampler}"
+    finally:
+        provider.shutdown()
+
+
+def test_explicit_ratio_wins(monkeypatch):
+    monkeypatch.setenv("OTEL_TRACES_SAMPLER_ARG", "0.25")
+    provider = configure_tracing("svc")
+    assert "TraceIdRatioBased{0.25}" in provider.sampler.get_description()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the task dependency graph
+"""
+
+import pytest
+
+from agent_enums import TaskStatus
+from task_graph import DependencyCycleError, TaskDependencyGraph
+
+
+def test_complete_releases_dependents_once_all_dependencies_finish():
+    graph = TaskDependencyGraph()
+    assert graph.submit("build")
+    assert graph.submit("lint")
+    assert not graph.submit("test", ["build", "lint"])
+    assert not graph.submit("deploy", ["test"])
+
+    assert graph.complete("build") == []
+    assert graph.complete("lint") == ["test"]
+    assert graph.is_ready("test")
+    graph.start("test")
+    assert graph.complete("test") == ["deploy"]
+
+
+def test_dependency_on_completed_task_is_satisfied():
+    graph = TaskDependencyGraph()
+    graph.submit("a")
+    graph.complete("a")
+    assert graph.submit("b", ["a"])
+
+
+def test_forward_reference_waits_for_placeholder():
+    graph = TaskDependencyGraph()
+    assert not graph.submit("b", ["a"])
+    assert graph.status("a") is None
+    assert graph.submit("a")
+    assert graph.complete("a") == ["b"]
+
+
+def test_cycles_rejected_at_submit():
+    graph = TaskDependencyGraph()
+    with pytest.raises(DependencyCycleError):
+        graph.submit("a", ["a"])
+
+    graph.submit("b", ["a"])
+    graph.submit("c", ["b"])
+    with pytest.raises(DependencyCycleError):
+        graph.submit("a", ["c"])
+    # The rejected submission left the graph usable
+    assert graph.submit("a")
+
+
+def test_cancel_cascades_through_dependents():
+    graph = TaskDependencyGraph()
+    graph.submit("a")
+    graph.submit("b", ["a"])
+    graph.submit("c", ["b"])
+    graph.submit("d", ["a", "c"])
+    graph.submit("other")
+
+    assert graph.cancel("a") == ["a", "b", "d", "c"]
+    assert graph.status("c") == TaskStatus.CANCELLED
+    assert graph.status("other") == TaskStatus.PENDING
+    # New work that depends on a cancelled task is cancelled on arrival
+    assert not graph.submit("e", ["b"])
+    assert graph.status("e") == TaskStatus.CANCELLED
+
+
+def test_failure_cascades_as_cancellation():
+    graph = TaskDependencyGraph()
+    graph.submit("a")
+    graph.submit("b", ["a"])
+    graph.fail("a")
+    assert graph.status("a") == TaskStatus.FAILED
+    assert graph.status("b") == TaskStatus.CANCELLED
+
+
+def test_forgotten_cancelled_dependent_is_unlinked():
+    graph = TaskDependencyGraph()
+    graph.submit("a")
+    graph.submit("b", ["a"])
+    graph.cancel("b")
+    assert graph.forget("b")
+    assert graph.complete("a") == []
+
+    # A placeholder kept alive only by the forgotten task goes with it
+    graph.submit("d", ["c"])
+    graph.cancel("d")
+    graph.forget("d")
+    assert len(graph) == 1
+
+
+def test_blocked_task_cannot_complete():
+    graph = TaskDependencyGraph()
+    graph.submit("a")
+    graph.submit("b", ["a"])
+    graph.submit("c", ["b"])
+    with pytest.raises(ValueError):
+        graph.complete("b")
+    assert graph.status("b") == TaskStatus.PENDING and not graph.is_ready("c")
+    assert graph.complete("a") == ["b"]
+    assert graph.complete("b") == ["c"]
+
+
+def test_cancelled_placeholder_cannot_be_submitted():
+    graph = TaskDependencyGraph()
+    graph.submit("b", ["a"])
+    assert graph.cancel("a") == ["a", "b"]
+    with pytest.raises(ValueError):
+        graph.submit("a")
+    assert graph.status("b") == TaskStatus.CANCELLED
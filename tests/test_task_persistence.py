@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for write-behind task persistence
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from agent_enums import TaskStatus
+from task_persistence import WriteBehindTaskStore
+
+
+class RecordingSink:
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def __call__(self, rows):
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        self.batches.append(rows)
+
+    @property
+    def rows(self):
+        return {row["id"]: row for batch in self.batches for row in batch}
+
+
+def test_transitions_coalesce_into_one_row(tmp_path):
+    sink = RecordingSink()
+    clock = [100.0]
+    store = WriteBehindTaskStore(sink, str(tmp_path), clock=lambda: clock[0])
+    store.record("t1", TaskStatus.PENDING, agent_id="a1", metadata={"repo": "x"})
+    clock[0] = 101.0
+    store.record("t1", TaskStatus.RUNNING, metadata={"step": "1"})
+    clock[0] = 102.0
+    store.record("t1", TaskStatus.COMPLETED, result={"success": True})
+    store.record("t2", TaskStatus.PENDING)
+
+    assert asyncio.run(store.flush()) == 2
+    assert len(sink.batches) == 1
+    row = sink.rows["t1"]
+    assert row["status"] == "completed" and row["agent_id"] == "a1"
+    assert row["metadata"] == {"repo": "x", "step": "1"}
+    assert row["started_at"] == 101.0 and row["completed_at"] == 102.0
+    assert row["result"] == {"success": True}
+    assert store.stats["last_flush_lag"] == 2.0
+
+
+def test_wal_is_replayed_after_a_crash(tmp_path):
+    store = WriteBehindTaskStore(RecordingSink(), str(tmp_path))
+    store.record("t1", TaskStatus.RUNNING, agent_id="a1")
+    store.record("t2", TaskStatus.FAILED, message="boom")
+    store.sync()
+    # Crash: the process dies without flushing
+
+    sink = RecordingSink()
+    recovered = WriteBehindTaskStore(sink, str(tmp_path))
+    assert recovered.pending() == 2
+    recovered.record("t1", TaskStatus.COMPLETED)
+    asyncio.run(recovered.close())
+
+    assert sink.rows["t1"]["status"] == "completed" and sink.rows["t1"]["agent_id"] == "a1"
+    assert sink.rows["t2"]["message"] == "boom"
+    assert sink.rows["t1"]["version"] > sink.rows["t2"]["version"]
+    assert os.listdir(tmp_path) == []
+
+
+def test_failed_flush_keeps_rows_and_wal(tmp_path):
+    sink = RecordingSink()
+    store = WriteBehindTaskStore(sink, str(tmp_path))
+    store.record("t1", TaskStatus.RUNNING, agent_id="a1")
+    sink.fail = True
+    assert asyncio.run(store.flush()) == 0
+    assert store.stats["flush_errors"] == 1 and store.pending() == 1
+
+    store.record("t1", TaskStatus.COMPLETED)
+    sink.fail = False
+    assert asyncio.run(store.flush()) == 1
+    assert sink.rows["t1"]["status"] == "completed" and sink.rows["t1"]["agent_id"] == "a1"
+    # Only the live segment is left
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_group_commit_fsyncs_off_the_event_loop(tmp_path, monkeypatch):
+    fsync_threads = []
+    real_fsync = os.fsync
+
+    def fsync(fd):
+        fsync_threads.append(threading.get_ident())
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+    store = WriteBehindTaskStore(RecordingSink(), str(tmp_path), window=0.001)
+
+    async def run():
+        flusher = asyncio.create_task(store.run())
+        await asyncio.sleep(0)
+        for i in range(5):
+            store.record(f"t{i}", TaskStatus.RUNNING)
+            await store.commit()
+        await store.close()
+        await flusher
+
+    asyncio.run(run())
+    assert fsync_threads and threading.get_ident() not in fsync_threads
+
+
+def test_close_waits_for_a_running_flush(tmp_path):
+    class SlowSink(RecordingSink):
+        active = peak = 0
+
+        def __call__(self, rows):
+            SlowSink.active += 1
+            SlowSink.peak = max(SlowSink.peak, SlowSink.active)
+            time.sleep(0.05)
+            super().__call__(rows)
+            SlowSink.active -= 1
+
+    sink = SlowSink()
+    store = WriteBehindTaskStore(sink, str(tmp_path))
+
+    async def run():
+        store.record("t1", TaskStatus.RUNNING)
+        running = asyncio.create_task(store.flush())
+        await asyncio.sleep(0.01)
+        store.record("t2", TaskStatus.RUNNING)
+        await store.close()
+        await running
+
+    asyncio.run(run())
+    assert SlowSink.peak == 1
+    assert set(sink.rows) == {"t1", "t2"}
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for the AssignTask scheduler and the proto enum mirror
+"""
+
+import os
+import re
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from agent_enums import AgentStatus, AgentType, MessageType, TaskPriority, TaskStatus, TaskType
+from task_scheduler import TaskScheduler
+
+PROTO_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "proto", "ai_agent_service.proto")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("enum_cls, prefix", [
+    (AgentType, "AGENT_TYPE_"),
+    (AgentStatus, "AGENT_STATUS_"),
+    (TaskType, "TASK_TYPE_"),
+    (TaskStatus, "TASK_STATUS_"),
+    (TaskPriority, "TASK_PRIORITY_"),
+    (MessageType, "MESSAGE_TYPE_"),
+])
+def test_enums_match_proto(enum_cls, prefix):
+    with open(PROTO_FILE) as f:
+        proto = f.read()
+    values = {m.group(1): int(m.group(2)) for m in re.finditer(rf"{prefix}(\w+) = (\d+);", proto)}
+    assert values == {member.name: member.value for member in enum_cls}
+
+
+def test_priority_then_earliest_deadline():
+    scheduler = TaskScheduler(clock=FakeClock())
+    scheduler.enqueue("low", AgentType.CODING, TaskPriority.LOW, deadline=1.0)
+    scheduler.enqueue("normal-late", AgentType.CODING, TaskPriority.NORMAL, deadline=50.0)
+    scheduler.enqueue("normal-none", AgentType.CODING, TaskPriority.NORMAL)
+    scheduler.enqueue("normal-soon", AgentType.CODING, TaskPriority.NORMAL, deadline=10.0)
+    scheduler.enqueue("critical", AgentType.CODING, TaskPriority.CRITICAL)
+
+    order = [scheduler.dequeue(AgentType.CODING) for _ in range(5)]
+    assert order == ["critical", "normal-soon", "normal-late", "normal-none", "low"]
+    assert scheduler.dequeue(AgentType.CODING) is None
+
+
+def test_aging_prevents_starvation():
+    clock = FakeClock()
+    scheduler = TaskScheduler(aging_interval=10.0, clock=clock)
+    scheduler.enqueue("old-low", AgentType.TESTING, TaskPriority.LOW)
+    clock.now = 25.0  # LOW + 2 levels = HIGH
+    scheduler.enqueue("new-normal", AgentType.TESTING, TaskPriority.NORMAL)
+    scheduler.enqueue("new-critical", AgentType.TESTING, TaskPriority.CRITICAL)
+
+    assert scheduler.dequeue(AgentType.TESTING) == "new-critical"
+    assert scheduler.dequeue(AgentType.TESTING) == "old-low"
+    assert scheduler.dequeue(AgentType.TESTING) == "new-normal"
+
+
+def test_aged_task_is_served_under_a_critical_backlog():
+    clock = FakeClock()
+    scheduler = TaskScheduler(aging_interval=10.0, clock=clock)
+    scheduler.enqueue("old-low", AgentType.TESTING, TaskPriority.LOW)
+    served = []
+    for i in range(10):
+        clock.now = i * 5.0
+        scheduler.enqueue(f"critical-{i}", AgentType.TESTING, TaskPriority.CRITICAL)
+        served.append(scheduler.dequeue(AgentType.TESTING))
+        if served[-1] == "old-low":
+            break
+    # LOW reaches CRITICAL after 3 intervals and then waits longer than any fresh CRITICAL task
+    assert served[-1] == "old-low" and len(served) == 7
+
+
+def test_queues_are_per_agent_type_and_cancellable():
+    scheduler = TaskScheduler(clock=FakeClock())
+    scheduler.enqueue("c1", AgentType.CODING)
+    scheduler.enqueue("c2", AgentType.CODING)
+    scheduler.enqueue("s1", AgentType.SECURITY, TaskPriority.UNSPECIFIED)
+
+    assert scheduler.queue_lengths() == {"coding": 2, "security": 1}
+    assert scheduler.remove("c1")
+    assert not scheduler.remove("c1")
+    assert scheduler.queue_length(AgentType.CODING) == 1
+    assert scheduler.dequeue(AgentType.SECURITY) == "s1"
+    assert scheduler.dequeue(AgentType.CODING) == "c2"
+    assert len(scheduler) == 0
+
+
+def test_duplicate_task_rejected():
+    scheduler = TaskScheduler(clock=FakeClock())
+    scheduler.enqueue("t", AgentType.CODING)
+    with pytest.raises(ValueError):
+        scheduler.enqueue("t", AgentType.CODING)
+
+
+def test_compaction_keeps_order():
+    scheduler = TaskScheduler(clock=FakeClock())
+    for i in range(5000):
+        scheduler.enqueue(f"t{i}", AgentType.CODING, deadline=float(i))
+    for i in range(0, 5000, 2):
+        scheduler.remove(f"t{i}")
+    assert [scheduler.dequeue(AgentType.CODING) for _ in range(3)] == ["t1", "t3", "t5"]
+    assert scheduler.queue_length(AgentType.CODING) == 2497
+
+
+def test_request_deadline_is_utc_whatever_the_local_zone(monkeypatch):
+    if not hasattr(time, "tzset"):
+        pytest.skip("needs time.tzset")
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        deadline = Timestamp()
+        deadline.FromNanoseconds(int((time.time() + 600) * 1e9))
+        request = SimpleNamespace(type=TaskType.CODE_REVIEW.value, priority=TaskPriority.HIGH.value,
+                                  deadline=deadline, HasField=lambda field: field == "deadline")
+        scheduler = TaskScheduler(clock=FakeClock())
+        assert scheduler.enqueue_request("t", request) == AgentType.CODING
+        assert scheduler._tasks["t"].deadline == pytest.approx(600, abs=5)
+        assert scheduler._tasks["t"].priority == TaskPriority.HIGH
+    finally:
+        monkeypatch.undo()
+        time.tzset()
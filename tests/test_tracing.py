@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for gRPC trace context propagation
+"""
+
+import asyncio
+
+import pytest
+
+grpc = pytest.importorskip("grpc")
+pytest.importorskip("opentelemetry.sdk")
+
+from grpc import aio
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, StatusCode
+
+from tracing import TracingClientInterceptor, TracingServerInterceptor
+
+METHOD = "/test.Echo/Say"
+
+
+def _provider(ratio=1.0):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider(sampler=ParentBased(TraceIdRatioBased(ratio)))
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    return provider, exporter
+
+
+async def _call(client_provider, server_provider, request):
+    async def say(request, context):
+        if request == b"fail":
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "bad request")
+        return request
+
+    identity = lambda data: data
+    handler = grpc.method_handlers_generic_handler("test.Echo", {
+        "Say": grpc.unary_unary_rpc_method_handler(say, request_deserializer=identity, response_serializer=identity),
+    })
+    server = aio.server(interceptors=[TracingServerInterceptor(server_provider)])
+    server.add_generic_rpc_handlers((handler,))
+    port = server.add_insecure_port("127.0.0.1:0")
+    await server.start()
+    try:
+        async with aio.insecure_channel(f"127.0.0.1:{port}",
+                                        interceptors=[TracingClientInterceptor(client_provider)]) as channel:
+            return await channel.unary_unary(METHOD)(request, timeout=5)
+    finally:
+        await server.stop(None)
+
+
+def test_server_span_continues_the_client_trace():
+    client_provider, client_spans = _provider()
+    server_provider, server_spans = _provider(ratio=0.0)
+
+    assert asyncio.run(_call(client_provider, server_provider, b"hello")) == b"hello"
+    (client,), (server,) = client_spans.get_finished_spans(), server_spans.get_finished_spans()
+    assert client.kind == SpanKind.CLIENT and server.kind == SpanKind.SERVER
+    assert client.name == server.name == "test.Echo/Say"
+    # Recorded although the server samples no new traces: the parent was sampled
+    assert server.context.trace_id == client.context.trace_id
+    assert server.parent.span_id == client.context.span_id
+    assert client.attributes["rpc.grpc.status_code"] == grpc.StatusCode.OK.value[0]
+
+
+def test_failed_call_marks_the_client_span_as_error():
+    client_provider, client_spans = _provider()
+    server_provider, _ = _provider()
+
+    with pytest.raises(aio.AioRpcError):
+        asyncio.run(_call(client_provider, server_provider, b"fail"))
+    (client,) = client_spans.get_finished_spans()
+    assert client.status.status_code == StatusCode.ERROR
+    assert client.attributes["rpc.grpc.status_code"] == grpc.StatusCode.INVALID_ARGUMENT.value[0]
+
+
+def test_unsampled_client_propagates_the_decision():
+    client_provider, client_spans = _provider(ratio=0.0)
+    server_provider, server_spans = _provider(ratio=1.0)
+
+    asyncio.run(_call(client_provider, server_provider, b"hello"))
+    assert client_spans.get_finished_spans() == () and server_spans.get_finished_spans() == ()
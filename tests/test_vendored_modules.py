@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Vendored copies under infra/ must match their source in proto/
+"""
+
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+VENDORED = [
+    ("proto/profiling.py", "infra/crewai/profiling.py"),
+    ("proto/span_export.py", "infra/crewai/span_export.py"),
+]
+
+
+@pytest.mark.parametrize("source, copy", VENDORED)
+def test_vendored_copy_matches_source(source, copy):
+    with open(os.path.join(ROOT, source), "rb") as f:
+        expected = f.read()
+    with open(os.path.join(ROOT, copy), "rb") as f:
+        assert f.read() == expected, f"{copy} differs from {source}; copy the source over it"